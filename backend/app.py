@@ -9,21 +9,49 @@ Key requirements supported here:
 
 from __future__ import annotations
 
+import asyncio
+import base64
+import bisect
+import gzip
+import hashlib
+import heapq
+import hmac
+import itertools
 import json
 import logging
+import math
 import os
+import random
 import re
-from datetime import datetime, timezone
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 from enum import Enum
+from mimetypes import guess_type
 from pathlib import Path
-from typing import Optional
+from typing import Annotated, Any, Callable, NamedTuple, Optional
 
-from fastapi import Depends, FastAPI, Header, HTTPException, Query
+import anyio
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from sqlalchemy import or_
+from sqlalchemy import JSON, BigInteger, Column, Index, UniqueConstraint, event, func, literal_column, or_, text, tuple_
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field as SQLField
-from sqlmodel import Relationship, SQLModel, Session, create_engine, select
+from sqlmodel import Relationship, SQLModel, Session, select
+
+import catalog_embeddings
+import db_pool
+import image_store
+import metrics
+import profiling
 
 try:
     # Official Gemini SDK (recommended by Google docs).
@@ -31,6 +59,16 @@ try:
 except Exception:  # pragma: no cover
     genai = None
 
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None
+
+try:
+    import brotli  # type: ignore
+except Exception:  # pragma: no cover
+    brotli = None
+
 
 class ProfileMode(str, Enum):
     prototype = "prototype"
@@ -51,6 +89,79 @@ GEMINI_MODEL = _env("GEMINI_MODEL", "gemini-flash-latest")
 HWEIBO_API_KEY = _env("HWEIBO_API_KEY")  # required when HWEIBO_PROFILE=real for /ai/prompts
 HWEIBO_AI_CANDIDATE_LIMIT = int(_env("HWEIBO_AI_CANDIDATE_LIMIT", "60") or "60")
 HWEIBO_AI_CATALOG_FETCH_LIMIT = int(_env("HWEIBO_AI_CATALOG_FETCH_LIMIT", "200") or "200")
+HWEIBO_PRODUCT_SEARCH = (_env("HWEIBO_PRODUCT_SEARCH", "fts") or "fts").lower()  # fts | ilike
+# Tokenized products kept for AI candidate scoring; the least recently seen are evicted past this.
+HWEIBO_SEARCH_INDEX_MAX_PRODUCTS = int(_env("HWEIBO_SEARCH_INDEX_MAX_PRODUCTS", "20000") or "20000")
+HWEIBO_AI_CACHE_SIZE = int(_env("HWEIBO_AI_CACHE_SIZE", "512") or "512")  # 0 disables the prompt cache
+HWEIBO_AI_CACHE_TTL_SECONDS = float(_env("HWEIBO_AI_CACHE_TTL_SECONDS", "300") or "300")
+HWEIBO_AI_DEADLINE_SECONDS = float(_env("HWEIBO_AI_DEADLINE_SECONDS", "8") or "8")  # 0 = no deadline
+HWEIBO_AI_HEDGE_AFTER_SECONDS = float(_env("HWEIBO_AI_HEDGE_AFTER_SECONDS", "0") or "0")  # 0 = no hedging
+# Gemini circuit breaker: opens on the error rate or slow-call rate over a rolling window, then
+# skips the model entirely (keyword ranking) until half-open probe calls succeed again.
+HWEIBO_AI_BREAKER = (_env("HWEIBO_AI_BREAKER", "1") or "1").lower() in {"1", "true", "yes", "y"}
+HWEIBO_AI_BREAKER_WINDOW_SECONDS = float(_env("HWEIBO_AI_BREAKER_WINDOW_SECONDS", "60") or "60")
+HWEIBO_AI_BREAKER_MIN_CALLS = int(_env("HWEIBO_AI_BREAKER_MIN_CALLS", "10") or "10")
+HWEIBO_AI_BREAKER_ERROR_RATE = float(_env("HWEIBO_AI_BREAKER_ERROR_RATE", "0.5") or "0.5")
+# A call slower than this counts as slow; defaults to the deadline (its answer would be discarded anyway).
+HWEIBO_AI_BREAKER_SLOW_CALL_SECONDS = float(
+    _env("HWEIBO_AI_BREAKER_SLOW_CALL_SECONDS") or HWEIBO_AI_DEADLINE_SECONDS
+)  # 0 = latency is ignored
+HWEIBO_AI_BREAKER_SLOW_CALL_RATE = float(_env("HWEIBO_AI_BREAKER_SLOW_CALL_RATE", "0.8") or "0.8")
+HWEIBO_AI_BREAKER_OPEN_SECONDS = float(_env("HWEIBO_AI_BREAKER_OPEN_SECONDS", "30") or "30")
+HWEIBO_AI_BREAKER_PROBES = int(_env("HWEIBO_AI_BREAKER_PROBES", "3") or "3")
+# Vector retrieval over catalog_embeddings.py builds (used when numpy and a build are present).
+# Gemini gets at most this many candidates, best cosine first; 0 keeps keyword-only selection.
+HWEIBO_AI_VECTOR_TOP_K = int(_env("HWEIBO_AI_VECTOR_TOP_K", "30") or "30")
+HWEIBO_EMBEDDINGS_DIR = Path(_env("HWEIBO_EMBEDDINGS_DIR") or catalog_embeddings.default_dir())
+# Gemini input size: candidates are sent as a compact table (or legacy JSON), descriptions trimmed,
+# and as many candidates as fit the token budget (and, if set, the latency target) are included.
+HWEIBO_AI_PAYLOAD_FORMAT = (_env("HWEIBO_AI_PAYLOAD_FORMAT", "table") or "table").lower()  # table | json
+HWEIBO_AI_TOKEN_BUDGET = int(_env("HWEIBO_AI_TOKEN_BUDGET", "2500") or "2500")  # candidate rows; 0 = no limit
+HWEIBO_AI_DESCRIPTION_CHARS = int(_env("HWEIBO_AI_DESCRIPTION_CHARS", "160") or "160")  # 0 = full text
+HWEIBO_AI_LATENCY_TARGET_MS = float(_env("HWEIBO_AI_LATENCY_TARGET_MS", "0") or "0")  # 0 = token budget only
+# AI bulkhead (real mode): AI requests in progress per worker, how many may wait for a slot, and
+# for how long. Beyond that they are shed with 429/503 + Retry-After; waiters are served by plan tier.
+HWEIBO_AI_MAX_CONCURRENCY = int(_env("HWEIBO_AI_MAX_CONCURRENCY", "8") or "8")
+HWEIBO_AI_QUEUE_SIZE = int(_env("HWEIBO_AI_QUEUE_SIZE", "32") or "32")
+HWEIBO_AI_QUEUE_TIMEOUT_SECONDS = float(_env("HWEIBO_AI_QUEUE_TIMEOUT_SECONDS", "5") or "5")
+HWEIBO_AI_PLAN_CACHE_SECONDS = float(_env("HWEIBO_AI_PLAN_CACHE_SECONDS", "60") or "60")
+# /ai/prompts:batch: prompts per request, and Gemini calls in flight across all batches in a worker.
+HWEIBO_AI_BATCH_MAX_PROMPTS = int(_env("HWEIBO_AI_BATCH_MAX_PROMPTS", "100") or "100")
+HWEIBO_AI_BATCH_CONCURRENCY = int(_env("HWEIBO_AI_BATCH_CONCURRENCY", "4") or "4")
+
+# Connection pool settings live in db_pool.py (shared with the CLI scripts); connections opened at startup.
+HWEIBO_DB_POOL_PREWARM = int(_env("HWEIBO_DB_POOL_PREWARM", str(db_pool.HWEIBO_DB_POOL_SIZE)) or "0")
+
+# Seller dashboard rollups, refreshed by a background thread (the dashboard only reads them): how
+# often new orders are folded in, how many trailing days are always recomputed so status changes
+# (e.g. cancellations) on recent orders are picked up, and how often every day is rebuilt to catch
+# status changes on older orders.
+HWEIBO_ROLLUP_REFRESH_SECONDS = float(_env("HWEIBO_ROLLUP_REFRESH_SECONDS", "60") or "60")  # 0 = no refresh
+HWEIBO_ROLLUP_LOOKBACK_DAYS = int(_env("HWEIBO_ROLLUP_LOOKBACK_DAYS", "2") or "2")
+HWEIBO_ROLLUP_RECONCILE_HOURS = float(_env("HWEIBO_ROLLUP_RECONCILE_HOURS", "24") or "24")
+
+# Browser/proxy cache lifetime for path-addressed product images (content-addressed ones are immutable).
+HWEIBO_STATIC_MAX_AGE = int(_env("HWEIBO_STATIC_MAX_AGE", "3600") or "3600")
+
+# Catalog/dashboard responses: pre-shaped dicts are encoded directly (orjson when installed) and
+# gzip/brotli-compressed above the size threshold. Off = FastAPI's default validate + jsonable_encoder path.
+HWEIBO_FAST_JSON = (_env("HWEIBO_FAST_JSON", "0") or "0").lower() in {"1", "true", "yes", "y"}
+HWEIBO_COMPRESS_MIN_BYTES = int(_env("HWEIBO_COMPRESS_MIN_BYTES", "1024") or "1024")  # 0 disables compression
+
+# Latency diagnostics: a Server-Timing header (db, rank, ai, serialize phases) on every response, and
+# collapsed-stack profiles of requests that carry X-Hweibo-Profiler: <token> or win the sample-rate draw.
+HWEIBO_SERVER_TIMING = (_env("HWEIBO_SERVER_TIMING", "1") or "1").lower() in {"1", "true", "yes", "y"}
+HWEIBO_PROFILER_TOKEN = _env("HWEIBO_PROFILER_TOKEN")  # unset = header trigger disabled
+HWEIBO_PROFILER_SAMPLE_RATE = float(_env("HWEIBO_PROFILER_SAMPLE_RATE", "0") or "0")  # 0..1 of requests
+HWEIBO_PROFILER_INTERVAL_MS = float(_env("HWEIBO_PROFILER_INTERVAL_MS", "5") or "5")
+HWEIBO_PROFILER_DIR = Path(_env("HWEIBO_PROFILER_DIR") or Path(__file__).resolve().parent / "profiles")
+HWEIBO_PROFILER_MAX_FILES = int(_env("HWEIBO_PROFILER_MAX_FILES", "200") or "200")  # 0 = keep all
+
+# Optional in-memory copy of the active catalog (products + images + seller store info), kept current
+# by LISTEN/NOTIFY triggers. /products and AI candidates are served from it while it is fresh enough.
+HWEIBO_CATALOG_REPLICA = (_env("HWEIBO_CATALOG_REPLICA", "0") or "0").lower() in {"1", "true", "yes", "y"}
+HWEIBO_CATALOG_REPLICA_MAX_STALENESS_SECONDS = float(_env("HWEIBO_CATALOG_REPLICA_MAX_STALENESS_SECONDS", "30") or "30")
+HWEIBO_CATALOG_REPLICA_RESYNC_SECONDS = float(_env("HWEIBO_CATALOG_REPLICA_RESYNC_SECONDS", "900") or "900")  # 0 = never
 
 logger = logging.getLogger("hweibo")
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
@@ -70,10 +181,12 @@ class User(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
     email: str = SQLField(index=True, unique=True)
     password_hash: str
-    role: UserRole = SQLField(index=True)
+    role: UserRole
     is_active: bool = True
     created_at: datetime = SQLField(default_factory=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (Index("idx_user_role", "role"),)
+
     buyer_profile: Optional["BuyerProfile"] = Relationship(back_populates="user")
     seller_profile: Optional["SellerProfile"] = Relationship(back_populates="user")
 
@@ -106,10 +219,10 @@ class SellerProfile(SQLModel, table=True):
 
 class Product(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
-    seller_id: int = SQLField(foreign_key="user.id", index=True)
+    seller_id: int = SQLField(foreign_key="user.id")
     title: str = SQLField(index=True)
     description: str = ""
-    category: str = SQLField(default="", index=True)
+    category: str = ""
     price_cents: int = 0
     currency: str = "USD"
     is_active: bool = True
@@ -117,6 +230,15 @@ class Product(SQLModel, table=True):
 
     images: list["ProductImage"] = Relationship(back_populates="product")
 
+    # Index names match db/schema.sql, which owns index creation on existing databases.
+    __table_args__ = (
+        Index("idx_product_seller_id", "seller_id"),
+        Index("idx_product_category", "category"),
+        # Keyset pagination over the active catalog (see _PRODUCT_SORTS).
+        Index("idx_product_active_created", "created_at", "id", postgresql_where=text("is_active")),
+        Index("idx_product_active_price", "price_cents", "id", postgresql_where=text("is_active")),
+    )
+
 
 class ProductImage(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
@@ -124,6 +246,13 @@ class ProductImage(SQLModel, table=True):
     url: str
     alt_text: str = ""
     sort_order: int = 0
+    # Resized/re-encoded copies: {"thumb": {"width": 320, "webp": url, "avif": url}, ...}.
+    # NULL until image_derivatives.py has processed the image.
+    variants: Optional[dict] = SQLField(
+        default=None, sa_column=Column(JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql"))
+    )
+
+    __table_args__ = (Index("idx_productimage_url", "url"),)  # blob reference counts are looked up by URL
 
     product: Product = Relationship(back_populates="images")
 
@@ -155,12 +284,18 @@ class OrderStatus(str, Enum):
 
 class Order(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
-    buyer_id: int = SQLField(foreign_key="user.id", index=True)
-    status: OrderStatus = SQLField(default=OrderStatus.pending, index=True)
+    buyer_id: int = SQLField(foreign_key="user.id")
+    status: OrderStatus = SQLField(default=OrderStatus.pending)
     total_cents: int = 0
     currency: str = "USD"
     created_at: datetime = SQLField(default_factory=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index("idx_order_buyer_id", "buyer_id"),
+        Index("idx_order_status", "status"),
+        Index("idx_order_created_at", "created_at"),
+    )
+
     items: list["OrderItem"] = Relationship(back_populates="order")
 
 
@@ -183,11 +318,13 @@ class PaymentStatus(str, Enum):
 class Payment(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
     order_id: int = SQLField(foreign_key="order.id", index=True, unique=True)
-    status: PaymentStatus = SQLField(default=PaymentStatus.initiated, index=True)
+    status: PaymentStatus = SQLField(default=PaymentStatus.initiated)
     provider: str = "demo"
     provider_ref: str = ""
     created_at: datetime = SQLField(default_factory=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (Index("idx_payment_status", "status"),)
+
 
 class Plan(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
@@ -222,11 +359,13 @@ class Chat(SQLModel, table=True):
 
 class Message(SQLModel, table=True):
     id: Optional[int] = SQLField(default=None, primary_key=True)
-    chat_id: int = SQLField(foreign_key="chat.id", index=True)
+    chat_id: int = SQLField(foreign_key="chat.id")
     sender: str = SQLField(index=True)  # "buyer" | "assistant"
     content: str
     created_at: datetime = SQLField(default_factory=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (Index("idx_message_chat_id", "chat_id"),)
+
     chat: Chat = Relationship(back_populates="messages")
 
 
@@ -240,41 +379,358 @@ class AuditLog(SQLModel, table=True):
     created_at: datetime = SQLField(default_factory=lambda: datetime.now(timezone.utc))
 
 
-def _normalize_database_url(url: str) -> str:
+class SellerDailySales(SQLModel, table=True):
     """
-    Accept postgres URLs with or without an explicit driver.
+    Daily sales rollup per seller and product, maintained by _refresh_sales_rollups.
 
-    On Python versions where psycopg2 wheels may not exist (e.g. 3.14),
-    we allow `pg8000` as a pure-Python fallback by rewriting the URL if needed.
+    product_id=0 rows hold the seller-wide totals for the day (distinct orders across products).
     """
-    if url.startswith("postgres://"):
-        # SQLAlchemy expects postgresql://
-        url = "postgresql://" + url.removeprefix("postgres://")
 
-    # If the user already specified a driver, respect it.
-    if url.startswith("postgresql+"):
-        return url
+    id: Optional[int] = SQLField(default=None, primary_key=True)
+    seller_id: int = SQLField(foreign_key="user.id")
+    product_id: int = 0
+    day: date
+    sales_cents: int = SQLField(default=0, sa_type=BigInteger)
+    units: int = 0
+    orders: int = 0
+
+    __table_args__ = (UniqueConstraint("seller_id", "day", "product_id", name="uq_sellerdailysales_seller_day_product"),)
 
-    # No driver specified (postgresql://...). Choose a usable default.
-    try:
-        import psycopg2  # type: ignore  # noqa: F401
 
-        return "postgresql+psycopg2://" + url.removeprefix("postgresql://")
-    except Exception:
-        return "postgresql+pg8000://" + url.removeprefix("postgresql://")
+class RollupState(SQLModel, table=True):
+    name: str = SQLField(primary_key=True)
+    last_orderitem_id: int = SQLField(default=0, sa_type=BigInteger)
+    refreshed_at: datetime = SQLField(default_factory=lambda: datetime.now(timezone.utc))
+    full_refreshed_at: Optional[datetime] = None  # last rebuild of every day (see _refresh_sales_rollups)
+
+
+def _prewarm_pool(db_engine, connections: int) -> int:
+    """Open up to `connections` pooled connections now instead of on the first requests."""
+    opened = []
+    try:
+        for _ in range(max(0, min(connections, db_engine.pool.size()))):
+            opened.append(db_engine.connect())
+    except Exception as e:
+        logger.warning("Connection pool prewarm stopped early. opened=%d error=%r", len(opened), e)
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
 
 
 engine = (
-    create_engine(_normalize_database_url(DATABASE_URL))
+    db_pool.create_engine(DATABASE_URL)
     if (HWEIBO_PROFILE == ProfileMode.real and DATABASE_URL)
     else None
 )
 
 
+# ----------------------------
+# Metrics (Prometheus text format on /metrics)
+# ----------------------------
+_METRICS = metrics.Registry()
+_HTTP_REQUESTS = _METRICS.counter(
+    "hweibo_http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+)
+_HTTP_LATENCY = _METRICS.histogram(
+    "hweibo_http_request_duration_seconds",
+    "Time from request start to the last response byte.",
+    ("method", "route", "status"),
+)
+_DB_STATEMENT_LATENCY = _METRICS.histogram(
+    "hweibo_db_statement_duration_seconds", "SQL execution time per statement fingerprint.", ("fingerprint",)
+)
+_DB_STATEMENT_ERRORS = _METRICS.counter(
+    "hweibo_db_statement_errors_total", "SQL statements that raised, per fingerprint.", ("fingerprint",)
+)
+_DB_STATEMENT_INFO = _METRICS.gauge(
+    "hweibo_db_statement_info", "Normalized SQL text for each fingerprint (value is always 1).", ("fingerprint", "sql")
+)
+_GEMINI_LATENCY = _METRICS.histogram(
+    "hweibo_gemini_request_duration_seconds", "Gemini generate_content latency by outcome.", ("outcome",)
+)
+_GEMINI_TOKENS = _METRICS.histogram(
+    "hweibo_gemini_tokens",
+    "Tokens per Gemini call (usage metadata when reported, else ~4 chars/token).",
+    ("direction",),
+    buckets=metrics.TOKEN_BUCKETS,
+)
+_GEMINI_CANDIDATES = _METRICS.histogram(
+    "hweibo_gemini_candidates",
+    "Candidates sent per Gemini ranking call after the token budget.",
+    buckets=(5, 10, 15, 20, 30, 40, 60, 90, 120),
+)
+_AI_RANKING_OUTCOMES = _METRICS.counter(
+    "hweibo_ai_ranking_outcomes_total",
+    "/ai/prompts ranking results: success, invalid_ids, timeout, exception or circuit_open.",
+    ("outcome",),
+)
+_AI_PROMPT_RESPONSES = _METRICS.counter(
+    "hweibo_ai_prompt_responses_total", "/ai/prompts responses by fallback_used.", ("fallback_used",)
+)
+_METRICS.gauge(
+    "hweibo_db_pool_connections",
+    "Connection pool state (size, checked_in, checked_out, overflow).",
+    ("state",),
+    collect=lambda: {
+        (k,): v for k, v in db_pool.pool_stats(engine).items() if k in ("size", "checked_in", "checked_out", "overflow")
+    }
+    if engine is not None
+    else {},
+)
+_METRICS.counter(
+    "hweibo_db_pool_events_total",
+    "Connection pool checkouts, checkout timeouts and failed connection opens.",
+    ("event",),
+    collect=lambda: {
+        (k,): v for k, v in db_pool.pool_stats(engine).items() if k in ("checkouts", "timeouts", "connect_errors")
+    }
+    if engine is not None
+    else {},
+)
+_METRICS.counter(
+    "hweibo_ai_cache_events_total",
+    "Prompt result cache lookups (hits, misses, coalesced).",
+    ("event",),
+    collect=lambda: {(k,): _PROMPT_CACHE.stats()[k] for k in ("hits", "misses", "coalesced")},
+)
+_METRICS.gauge("hweibo_ai_cache_entries", "Prompt result cache size.", collect=lambda: {(): _PROMPT_CACHE.stats()["entries"]})
+_METRICS.counter(
+    "hweibo_ai_admission_total",
+    "AI requests by caller plan tier and admission outcome (admitted, queue_full, queue_timeout, evicted).",
+    ("tier", "outcome"),
+    collect=lambda: _AI_BULKHEAD.outcome_counts(),
+)
+_METRICS.gauge(
+    "hweibo_ai_bulkhead_requests",
+    "AI requests holding a bulkhead slot (active) or waiting for one (queued).",
+    ("state",),
+    collect=lambda: {("active",): _AI_BULKHEAD.active, ("queued",): len(_AI_BULKHEAD._waiters)},
+)
+_AI_QUEUE_WAIT = _METRICS.histogram(
+    "hweibo_ai_queue_wait_seconds", "Time admitted AI requests waited for a bulkhead slot.", ("tier",)
+)
+_METRICS.gauge(
+    "hweibo_ai_breaker_state",
+    "Gemini circuit breaker state (1 for the current one of closed, open, half_open).",
+    ("state",),
+    collect=lambda: {(s,): float(s == _GEMINI_BREAKER.state) for s in CircuitBreaker.STATES},
+)
+_METRICS.counter(
+    "hweibo_ai_breaker_transitions_total",
+    "Gemini circuit breaker state changes, by new state.",
+    ("state",),
+    collect=lambda: {(s,): n for s, n in _GEMINI_BREAKER.stats()["transition_counts"].items()},
+)
+_METRICS.counter(
+    "hweibo_ai_breaker_rejected_total",
+    "Rankings answered from keyword order without calling Gemini because the breaker was open.",
+    collect=lambda: {(): _GEMINI_BREAKER.stats()["rejected"]},
+)
+
+# Fingerprints group statements that differ only in literals, bind parameters or IN-list length.
+_SQL_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SQL_PARAM_RE = re.compile(r"%\(\w+\)s|%s|\?")
+_SQL_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SQL_TABLE_RE = re.compile(r"\b(?:from|into|update)\s+\"?(\w+)", re.IGNORECASE)
+_SQL_MAX_FINGERPRINTS = 500
+_sql_fingerprints: dict[str, str] = {}
+_sql_fingerprints_lock = threading.Lock()
+
+
+def _sql_fingerprint(statement: str) -> str:
+    """`<verb>:<table>:<hash>` for a statement; new shapes past the cap share "other"."""
+    cached = _sql_fingerprints.get(statement)
+    if cached is not None:
+        return cached
+    normalized = _SQL_PARAM_RE.sub("?", _SQL_LITERAL_RE.sub("?", " ".join(statement.split())))
+    normalized = _SQL_LIST_RE.sub("(?)", normalized)
+    verb = normalized.split(" ", 1)[0].lower() or "sql"
+    table = _SQL_TABLE_RE.search(normalized)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:8]
+    fingerprint = f"{verb}:{table.group(1).lower() if table else '-'}:{digest}"
+    with _sql_fingerprints_lock:
+        known = set(_sql_fingerprints.values())
+        if fingerprint not in known:
+            if len(known) >= _SQL_MAX_FINGERPRINTS:
+                fingerprint = "other"
+            else:
+                _DB_STATEMENT_INFO.set(1, fingerprint=fingerprint, sql=normalized[:300])
+        if len(_sql_fingerprints) < 4 * _SQL_MAX_FINGERPRINTS:
+            _sql_fingerprints[statement] = fingerprint
+    return fingerprint
+
+
+def _instrument_engine(db_engine) -> None:
+    """Time every cursor execution on `db_engine` (the start time rides on the execution context)."""
+
+    @event.listens_for(db_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context._hweibo_started = time.perf_counter()
+
+    @event.listens_for(db_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, "_hweibo_started", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            _DB_STATEMENT_LATENCY.observe(elapsed, fingerprint=_sql_fingerprint(statement))
+            profiling.add_phase("db", elapsed)
+
+    @event.listens_for(db_engine, "handle_error")
+    def _error(exception_context) -> None:
+        if exception_context.statement:
+            _DB_STATEMENT_ERRORS.inc(fingerprint=_sql_fingerprint(exception_context.statement))
+
+
+if engine is not None:
+    _instrument_engine(engine)
+
+
+def _route_label(scope: dict) -> str:
+    # Route templates (/seller/products/{product_id}) keep label cardinality bounded.
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if scope.get("path", "").startswith("/product_images/"):
+        return "/product_images"
+    return "unmatched"
+
+
+class _MetricsMiddleware:
+    """Pure ASGI so streaming and file responses are timed to their last byte without buffering."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            labels = {"method": scope["method"], "route": _route_label(scope), "status": status}
+            _HTTP_REQUESTS.inc(**labels)
+            _HTTP_LATENCY.observe(time.perf_counter() - started, **labels)
+
+
+def _profiler_requested(scope: dict) -> bool:
+    if HWEIBO_PROFILER_TOKEN:
+        supplied = Headers(scope=scope).get("x-hweibo-profiler")
+        if supplied and hmac.compare_digest(supplied.encode("utf-8"), HWEIBO_PROFILER_TOKEN.encode("utf-8")):
+            return True
+    return HWEIBO_PROFILER_SAMPLE_RATE > 0 and random.random() < HWEIBO_PROFILER_SAMPLE_RATE
+
+
+def _profile_filename(scope: dict) -> str:
+    route = re.sub(r"[^A-Za-z0-9]+", "_", _route_label(scope)).strip("_") or "root"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%f")
+    return f"{stamp}-{scope['method'].lower()}-{route}.folded"
+
+
+class _ServerTimingMiddleware:
+    """
+    Collects phase timings for the request (see profiling.phase) and adds them as Server-Timing.
+    Requests selected for profiling are sampled until the response finishes and written to
+    HWEIBO_PROFILER_DIR; the file name is returned in X-Hweibo-Profile.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        sampler = profiling.StackSampler.try_start(HWEIBO_PROFILER_INTERVAL_MS / 1000) if _profiler_requested(scope) else None
+        profile_name: Optional[str] = None
+        timings, token = profiling.begin_request()
+        started = time.perf_counter()
+
+        async def send_with_timing(message) -> None:
+            nonlocal profile_name
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if HWEIBO_SERVER_TIMING:
+                    headers.append("Server-Timing", timings.header_value(time.perf_counter() - started))
+                if sampler is not None:
+                    profile_name = _profile_filename(scope)
+                    headers.append("X-Hweibo-Profile", profile_name)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            profiling.end_request(token)
+            if sampler is not None:
+                path = HWEIBO_PROFILER_DIR / (profile_name or _profile_filename(scope))
+                await anyio.to_thread.run_sync(_finish_profile, sampler, path)
+
+
+def _finish_profile(sampler: profiling.StackSampler, path: Path) -> None:
+    sampler.stop()
+    try:
+        sampler.write(path, HWEIBO_PROFILER_MAX_FILES)
+    except OSError as e:
+        logger.warning("Could not write request profile. path=%s error=%r", path, e)
+        return
+    logger.info("Request profile written. path=%s samples=%d", path, sampler.samples)
+
+
+# Weighted full-text vector for catalog search (title > category > description).
+# Generated by Postgres, so it never drifts from the row; mirrored in db/schema.sql.
+_PRODUCT_SEARCH_DDL = (
+    "ALTER TABLE product ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(category, '')), 'B') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'C')"
+    ") STORED",
+    "CREATE INDEX IF NOT EXISTS idx_product_search_vector ON product USING GIN (search_vector)",
+)
+# Columns added after the first release; create_all does not alter existing tables.
+_SCHEMA_UPGRADES = (
+    "ALTER TABLE productimage ADD COLUMN IF NOT EXISTS variants JSONB",
+    "ALTER TABLE rollupstate ADD COLUMN IF NOT EXISTS full_refreshed_at TIMESTAMPTZ",
+)
+_SEARCH_VECTOR = literal_column("product.search_vector")
+_SEARCH_CONFIG = literal_column("'english'::regconfig")
+_product_fts_ready = False
+
+
+def _ensure_product_search_vector(db_engine) -> bool:
+    """Add the product.search_vector column + GIN index if missing. Safe to run repeatedly."""
+    try:
+        with db_engine.begin() as conn:
+            for stmt in _PRODUCT_SEARCH_DDL:
+                conn.exec_driver_sql(stmt)
+    except Exception as e:
+        logger.warning("Product full-text search unavailable; using ILIKE search. error=%r", e)
+        return False
+    return True
+
+
 def create_db_and_tables() -> None:
+    global _product_fts_ready
     if engine is None:
         return
+    # create_all only indexes tables it creates. Indexes added later come from db/schema.sql
+    # (db/README.md: build them CONCURRENTLY on a live database first).
     SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for stmt in _SCHEMA_UPGRADES:
+            conn.exec_driver_sql(stmt)
+    if HWEIBO_PRODUCT_SEARCH == "fts":
+        _product_fts_ready = _ensure_product_search_vector(engine)
 
 
 # ----------------------------
@@ -293,6 +749,7 @@ class RankedProduct(BaseModel):
     price_cents: int = 0
     currency: str = "USD"
     images: list[str] = Field(default_factory=list)
+    image_variants: list[dict] = Field(default_factory=list)
     rank: int
 
 
@@ -304,18 +761,295 @@ class PromptResponse(BaseModel):
     fallback_used: bool = False
 
 
+class PromptBatchRequest(BaseModel):
+    prompts: list[Annotated[str, Field(min_length=1, max_length=2000)]] = Field(
+        min_length=1, max_length=max(1, HWEIBO_AI_BATCH_MAX_PROMPTS)
+    )
+
+
+class PromptBatchItem(PromptResponse):
+    index: int  # position in the request's prompts list (NDJSON lines arrive in completion order)
+    status: str  # ok | fallback | error
+    error: Optional[str] = None
+
+
+# ----------------------------
+# Product image serving
+# ----------------------------
+
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+_NEGOTIABLE_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".avif"}
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class _ImageFile(NamedTuple):
+    path: str
+    stat: os.stat_result
+    etag: str  # strong validator, unquoted
+    media_type: Optional[str]  # None = guess from the file name
+    immutable: bool  # content-addressed URL (blobs/, derived/)
+    negotiated: bool  # response depends on Accept
+
+
+def _accepted_image_formats(accept: str) -> set[str]:
+    # Only explicit types count: browsers send image/* even when they cannot decode AVIF.
+    formats: set[str] = set()
+    for part in accept.split(","):
+        media_type, _, params = part.partition(";")
+        q = re.search(r"q\s*=\s*([0-9.]+)", params)
+        if q and float(q.group(1) or 0) <= 0:
+            continue
+        media_type = media_type.strip().lower()
+        if media_type in {"image/avif", "image/webp"}:
+            formats.add(media_type.split("/")[1])
+    return formats
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # If-None-Match uses weak comparison (RFC 9110 13.1.2).
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or f'"{etag}"' in tags
+
+
+def _not_modified(request_headers: Headers, etag: str, mtime: float) -> bool:
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _requested_range(request_headers: Headers, etag: str, size: int):
+    """(start, end) inclusive, None for a full response, or "unsatisfiable"."""
+    header = request_headers.get("range")
+    if not header:
+        return None
+    if_range = request_headers.get("if-range")
+    if if_range is not None and if_range.strip() != f'"{etag}"':
+        return None  # changed since the client's partial copy (or a date validator): send it all
+    m = _RANGE_RE.match(header.strip())
+    if not m or not (m.group(1) or m.group(2)):
+        return None  # multi-range or malformed: ignoring Range is always allowed
+    if m.group(1):
+        start = int(m.group(1))
+        end = min(int(m.group(2)), size - 1) if m.group(2) else size - 1
+    else:
+        start, end = max(0, size - int(m.group(2))), size - 1
+    if start >= size or start > end:
+        return "unsatisfiable"
+    return start, end
+
+
+class _FileRangeResponse(Response):
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, start: int, end: int, size: int, headers: dict, media_type: str, method: str) -> None:
+        super().__init__(status_code=206, headers=headers, media_type=media_type)
+        self.path, self.start, self.end, self.send_body = path, start, end, method != "HEAD"
+        self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+        self.headers["content-length"] = str(end - start + 1)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        remaining = self.end - self.start + 1
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+class ProductImageFiles(StaticFiles):
+    """
+    StaticFiles for /product_images with a cache policy:
+    - strong ETags from the file's SHA-256 (free for content-addressed paths, cached per file otherwise)
+    - `immutable` year-long caching for blobs/ and derived/, HWEIBO_STATIC_MAX_AGE for path URLs
+    - 304 on If-None-Match / If-Modified-Since, single byte ranges (206/416, If-Range)
+    - Accept-negotiated AVIF/WebP re-encodes of originals (derived/.../full.*, see image_derivatives.py),
+      used only when smaller than the original
+    """
+
+    def __init__(self, *, directory: str, digest_cache_size: int = 50_000) -> None:
+        super().__init__(directory=directory)
+        self._digests: OrderedDict[str, tuple[tuple, str]] = OrderedDict()
+        self._digest_cache_size = digest_cache_size
+        self._digest_lock = threading.Lock()
+
+    def _digest(self, path: str, st: os.stat_result) -> str:
+        version = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._digest_lock:
+            cached = self._digests.get(path)
+            if cached and cached[0] == version:
+                self._digests.move_to_end(path)
+                return cached[1]
+        digest = image_store.file_digest(Path(path))
+        with self._digest_lock:
+            self._digests[path] = (version, digest)
+            while len(self._digests) > self._digest_cache_size:
+                self._digests.popitem(last=False)
+        return digest
+
+    def _select(self, rel: str, path: str, st: os.stat_result, accept: str) -> _ImageFile:
+        # Runs in a worker thread: may hash the file and stat variants.
+        parts = rel.split("/")
+        if len(parts) == 4 and parts[0] == image_store.DERIVED_DIR:
+            return _ImageFile(path, st, f"{parts[2]}-{parts[3].replace('.', '-')}", None, True, False)
+        blob = len(parts) == 4 and parts[0] == image_store.BLOB_DIR
+        digest = parts[3].split(".")[0] if blob else self._digest(path, st)
+        if os.path.splitext(rel)[1].lower() not in _NEGOTIABLE_IMAGE_SUFFIXES:
+            return _ImageFile(path, st, digest, None, blob, False)
+
+        chosen = _ImageFile(path, st, digest, None, blob, True)
+        accepted = _accepted_image_formats(accept)
+        variant_dir = os.path.join(self.directory, image_store.derived_relpath(digest))
+        for fmt in ("avif", "webp"):
+            if fmt not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(os.path.join(variant_dir, f"full.{fmt}"))
+            except OSError:
+                continue
+            if variant_stat.st_size < chosen.stat.st_size:
+                chosen = chosen._replace(
+                    path=os.path.join(variant_dir, f"full.{fmt}"),
+                    stat=variant_stat,
+                    etag=f"{digest}-{fmt}",
+                    media_type=f"image/{fmt}",
+                )
+        return chosen
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        # Validators are only known after _select; conditional handling happens in get_response.
+        return FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200:
+            return response
+
+        request_headers = Headers(scope=scope)
+        rel = path.replace(os.sep, "/")
+        f = await anyio.to_thread.run_sync(
+            self._select, rel, str(response.path), response.stat_result, request_headers.get("accept", "")
+        )
+        headers = {
+            "etag": f'"{f.etag}"',
+            "cache-control": _IMMUTABLE_CACHE_CONTROL if f.immutable else f"public, max-age={HWEIBO_STATIC_MAX_AGE}",
+            "accept-ranges": "bytes",
+        }
+        if f.negotiated:
+            headers["vary"] = "Accept"
+        if _not_modified(request_headers, f.etag, f.stat.st_mtime):
+            return Response(status_code=304, headers=headers)
+
+        media_type = f.media_type or guess_type(f.path)[0] or "application/octet-stream"
+        byte_range = _requested_range(request_headers, f.etag, f.stat.st_size)
+        if byte_range == "unsatisfiable":
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{f.stat.st_size}"})
+        if byte_range:
+            return _FileRangeResponse(f.path, *byte_range, f.stat.st_size, headers, media_type, scope["method"])
+        return FileResponse(f.path, stat_result=f.stat, headers=headers, media_type=media_type, method=scope["method"])
+
+
+# ----------------------------
+# JSON response encoding
+# ----------------------------
+
+_GZIP_LEVEL = 6
+_BROTLI_QUALITY = 5  # close to gzip -6 in speed, ~15-20% smaller on catalog JSON
+
+
+def _accepted_encoding(accept_encoding: str) -> Optional[str]:
+    accepted: dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.partition(";")
+        q = re.search(r"q\s*=\s*([0-9.]+)", params)
+        accepted[coding.strip()] = float(q.group(1) or 0) if q else 1.0
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return None
+
+
+def _dumps_bytes(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=str)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+class CatalogJSONResponse(JSONResponse):
+    """
+    JSON for already-shaped dicts/lists: no response_model validation or jsonable_encoder pass,
+    orjson when installed, and gzip/brotli negotiated per request above HWEIBO_COMPRESS_MIN_BYTES.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with profiling.phase("serialize"):
+            return _dumps_bytes(content)
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.headers.append("vary", "Accept-Encoding")
+        if 0 < HWEIBO_COMPRESS_MIN_BYTES <= len(self.body):
+            coding = _accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+            if coding == "br":
+                self.body = brotli.compress(self.body, quality=_BROTLI_QUALITY)
+            elif coding == "gzip":
+                self.body = gzip.compress(self.body, compresslevel=_GZIP_LEVEL, mtime=0)
+            if coding:
+                self.headers["content-encoding"] = coding
+                self.headers["content-length"] = str(len(self.body))
+        await super().__call__(scope, receive, send)
+
+
+def _catalog_response(content: Any, headers: Optional[dict] = None) -> Any:
+    """Return `content` through CatalogJSONResponse when HWEIBO_FAST_JSON is on, else unchanged."""
+    if not HWEIBO_FAST_JSON:
+        return content
+    return CatalogJSONResponse(content, headers=headers)
+
+
 app = FastAPI(title="Hweibo API", version="0.2.0")
+app.add_middleware(_ServerTimingMiddleware)
+app.add_middleware(_MetricsMiddleware)
 
 # Serve sample product images from the repo (and from inside the Docker image).
 _PRODUCT_IMAGES_DIR = Path(__file__).resolve().parent / "product_images"
 if _PRODUCT_IMAGES_DIR.exists():
-    app.mount("/product_images", StaticFiles(directory=str(_PRODUCT_IMAGES_DIR)), name="product_images")
+    app.mount("/product_images", ProductImageFiles(directory=str(_PRODUCT_IMAGES_DIR)), name="product_images")
 
 
 @app.on_event("startup")
 def _startup() -> None:
     # For a student/demo app, table auto-create is acceptable. For production, migrate with Alembic.
     create_db_and_tables()
+    if engine is not None and HWEIBO_DB_POOL_PREWARM > 0:
+        opened = _prewarm_pool(engine, HWEIBO_DB_POOL_PREWARM)
+        logger.info("Connection pool prewarmed. connections=%d", opened)
+    if engine is not None and HWEIBO_CATALOG_REPLICA and _ensure_catalog_notify_triggers(engine):
+        _CATALOG_REPLICA.start()
+    if engine is not None and HWEIBO_ROLLUP_REFRESH_SECONDS > 0:
+        _SALES_ROLLUPS.start()
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    _CATALOG_REPLICA.stop()
+    _SALES_ROLLUPS.stop()
 
 
 @app.get("/health")
@@ -324,8 +1058,27 @@ def health_check() -> dict:
         "status": "ok",
         "profile": HWEIBO_PROFILE,
         "db": "enabled" if engine is not None else "disabled",
+        "db_pool": db_pool.pool_stats(engine) if engine is not None else None,
+        "ai_cache": _PROMPT_CACHE.stats(),
+        "ai_breaker": _GEMINI_BREAKER.stats() if HWEIBO_AI_BREAKER else None,
+        "ai_bulkhead": _AI_BULKHEAD.stats(),
+        "catalog_replica": _CATALOG_REPLICA.stats() if HWEIBO_CATALOG_REPLICA else None,
+        "embeddings": _embeddings_status(),
     }
 
+
+def _embeddings_status() -> Optional[dict]:
+    index = _EMBEDDINGS.get() if HWEIBO_AI_VECTOR_TOP_K > 0 else None
+    if index is None:
+        return None
+    return {key: index.meta.get(key) for key in ("version", "dim", "products", "built_at")}
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    return Response(_METRICS.render(), media_type=metrics.CONTENT_TYPE)
+
+
 def _require_ai_api_key(
     authorization: Optional[str] = Header(default=None, alias="Authorization"),
     x_hweibo_api_key: Optional[str] = Header(default=None, alias="X-Hweibo-Api-Key"),
@@ -352,6 +1105,251 @@ def _require_ai_api_key(
         raise HTTPException(status_code=401, detail="Unauthorized.")
 
 
+# ----------------------------
+# AI admission control (bulkhead)
+# ----------------------------
+# Gemini calls and candidate loads get their own slots, queue and worker threads, so an AI burst
+# sheds its own load instead of taking threads and pool connections from /products and /health.
+# Slots go to waiting callers by the seller's plan tier; callers without one rank last. The seller
+# comes from a server-signed token (_verified_seller_id), never from a header the browser can set.
+_PLAN_TIER_PRIORITY = {"business": 3, "pro": 2, "starter": 1}
+_ANONYMOUS_TIER = "anonymous"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, outcome: str, retry_after: int) -> None:
+        super().__init__(outcome)
+        self.status_code = status_code
+        self.outcome = outcome
+        self.retry_after = retry_after
+
+
+class AIBulkhead:
+    """
+    At most `max_concurrent` admitted requests, plus a wait queue of `max_queue` ordered by priority
+    (FIFO within a priority). A full queue sheds the newest lowest-priority waiter when the newcomer
+    outranks it, else the newcomer (429). Waiting longer than `queue_timeout` is a 503. Both carry a
+    Retry-After estimated from the queue depth and recent slot hold times.
+
+    acquire/release run on the worker's loop. `_lock` only guards the waiter heap and outcome
+    counts against stats() and outcome_counts(), which /health and /metrics call from threads.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = max(0.0, queue_timeout)
+        self.active = 0
+        # heap of (-priority, seq, tier, future)
+        self._waiters: list[tuple[int, int, str, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._hold_seconds = 1.0  # EWMA of slot hold time, for Retry-After
+        self._lock = threading.Lock()
+        self._outcomes: dict[tuple[str, str], int] = {}
+
+    def _count(self, tier: str, outcome: str) -> None:
+        with self._lock:
+            self._outcomes[(tier, outcome)] = self._outcomes.get((tier, outcome), 0) + 1
+
+    def outcome_counts(self) -> dict[tuple[str, str], int]:
+        with self._lock:
+            return dict(self._outcomes)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil((len(self._waiters) + 1) / self.max_concurrent * self._hold_seconds))
+
+    def _reject(self, tier: str, status_code: int, outcome: str) -> AdmissionRejected:
+        self._count(tier, outcome)
+        return AdmissionRejected(status_code, outcome, self.retry_after())
+
+    def _forget(self, entry: tuple) -> None:
+        with self._lock:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+
+    async def acquire(self, tier: str) -> Callable[[], None]:
+        """Wait for a slot; returns its (idempotent) release callable, or raises AdmissionRejected."""
+        started = time.perf_counter()
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+        else:
+            priority = _PLAN_TIER_PRIORITY.get(tier, 0)
+            if len(self._waiters) >= self.max_queue:
+                worst = max(self._waiters) if self._waiters else None
+                if worst is None or -worst[0] >= priority:
+                    raise self._reject(tier, 429, "queue_full")
+                self._forget(worst)
+                worst[3].set_exception(self._reject(worst[2], 429, "evicted"))
+            future = asyncio.get_running_loop().create_future()
+            entry = (-priority, next(self._seq), tier, future)
+            with self._lock:
+                heapq.heappush(self._waiters, entry)
+            try:
+                await asyncio.wait_for(future, timeout=self.queue_timeout or None)
+            except asyncio.TimeoutError:
+                self._forget(entry)
+                raise self._reject(tier, 503, "queue_timeout") from None
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    self._release()  # handed a slot just as the caller went away
+                self._forget(entry)
+                raise
+        _AI_QUEUE_WAIT.observe(time.perf_counter() - started, tier=tier)
+        self._count(tier, "admitted")
+
+        admitted = time.perf_counter()
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                self._hold_seconds = 0.8 * self._hold_seconds + 0.2 * (time.perf_counter() - admitted)
+                self._release()
+
+        return release
+
+    def _release(self) -> None:
+        # Hand the slot straight to the best waiter, so a newcomer cannot jump the queue.
+        while self._waiters:
+            with self._lock:
+                _, _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        queued: dict[str, int] = {}
+        with self._lock:
+            for _, _, tier, _ in self._waiters:
+                queued[tier] = queued.get(tier, 0) + 1
+            shed = sum(n for (_, outcome), n in self._outcomes.items() if outcome != "admitted")
+        return {
+            "active": self.active,
+            "max_concurrent": self.max_concurrent,
+            "queued": queued,
+            "max_queue": self.max_queue,
+            "retry_after_seconds": self.retry_after(),
+            "shed": shed,
+        }
+
+
+class SellerPlanTiers:
+    """Seller id -> plan code for active subscriptions, reloaded in one query every `ttl_seconds`."""
+
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._tiers: dict[int, str] = {}
+        self._loaded_at: Optional[float] = None
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl_seconds
+
+    def _reload(self) -> None:
+        with self._lock:
+            if not self._stale():
+                return
+            try:
+                with Session(engine) as session:
+                    rows = session.exec(
+                        select(Subscription.seller_id, Plan.code)
+                        .join(Plan, Plan.id == Subscription.plan_id)
+                        .where(Subscription.status == SubscriptionStatus.active, Plan.is_active == True)  # noqa: E712
+                    ).all()
+                self._tiers = {int(seller_id): code for seller_id, code in rows}
+            except Exception as e:
+                # Keep the previous map; everyone is served, just without plan priority.
+                logger.warning("Could not load seller plans for AI admission. error=%r", e)
+            self._loaded_at = time.monotonic()
+
+    async def tier(self, seller_id: Optional[int]) -> str:
+        if seller_id is None or engine is None:
+            return _ANONYMOUS_TIER
+        if self._stale():
+            await run_in_threadpool(self._reload)
+        return self._tiers.get(seller_id, _ANONYMOUS_TIER)
+
+
+_AI_BULKHEAD = AIBulkhead(HWEIBO_AI_MAX_CONCURRENCY, HWEIBO_AI_QUEUE_SIZE, HWEIBO_AI_QUEUE_TIMEOUT_SECONDS)
+_SELLER_PLAN_TIERS = SellerPlanTiers(HWEIBO_AI_PLAN_CACHE_SECONDS)
+_ai_thread_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+async def _run_ai_io(func, *args):
+    """Run blocking AI-path work (candidate loads) on AI-only worker threads, not the shared pool."""
+    global _ai_thread_limiter
+    if _ai_thread_limiter is None:
+        _ai_thread_limiter = anyio.CapacityLimiter(_AI_BULKHEAD.max_concurrent)
+    return await anyio.to_thread.run_sync(func, *args, limiter=_ai_thread_limiter)
+
+
+def _seller_token(seller_id: int, expires_at: int) -> str:
+    """
+    `<seller_id>.<expires_at>.<signature>` for X-Hweibo-Seller-Token: an HMAC-SHA256 under
+    HWEIBO_API_KEY, so only a server holding the key (the gateway or frontend server that
+    authenticated the seller) can vouch for a seller id. Browsers never see the key.
+    """
+    payload = f"{seller_id}.{expires_at}"
+    signature = hmac.new(HWEIBO_API_KEY.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{payload}.{signature}"
+
+
+def _verified_seller_id(token: Optional[str]) -> Optional[int]:
+    """Seller id from a valid, unexpired seller token; None (anonymous tier) otherwise."""
+    if not token or not HWEIBO_API_KEY:
+        return None
+    parts = token.strip().split(".")
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[1].isdigit():
+        return None
+    seller_id, expires_at = int(parts[0]), int(parts[1])
+    if expires_at < time.time():
+        return None
+    if not hmac.compare_digest(token.strip(), _seller_token(seller_id, expires_at)):
+        return None
+    return seller_id
+
+
+_ai_batch_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _ai_batch_limiter() -> asyncio.Semaphore:
+    """Worker-wide cap on batch Gemini calls, so N concurrent batches still make at most HWEIBO_AI_BATCH_CONCURRENCY."""
+    global _ai_batch_semaphore
+    if _ai_batch_semaphore is None:
+        _ai_batch_semaphore = asyncio.Semaphore(max(1, HWEIBO_AI_BATCH_CONCURRENCY))
+    return _ai_batch_semaphore
+
+
+async def _admit_ai_request(seller_id: Optional[int]) -> Callable[[], None]:
+    """Bulkhead slot for one real-mode AI request, or 429/503 with Retry-After."""
+    tier = await _SELLER_PLAN_TIERS.tier(seller_id)
+    try:
+        return await _AI_BULKHEAD.acquire(tier)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail="AI search is busy; retry shortly." if e.status_code == 429 else "AI search is overloaded.",
+            headers={"Retry-After": str(e.retry_after)},
+        ) from None
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that frees its bulkhead slot when the stream ends or is abandoned."""
+
+    def __init__(self, *args, release: Callable[[], None], **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
 def _tokenize_query(q: str) -> list[str]:
     # Keep it simple and deterministic; good enough for a prototype keyword fallback.
     tokens = re.findall(r"[a-z0-9]{3,}", q.lower())
@@ -378,36 +1376,228 @@ def _tokenize_query(q: str) -> list[str]:
     return [t for t in tokens if t not in stop][:25]
 
 
-def _score_product(prompt: str, title: str, description: str, category: str) -> int:
-    tokens = _tokenize_query(prompt)
-    if not tokens:
-        return 0
-    hay = f"{title} {category} {description}".lower()
-    score = 0
-    for t in tokens:
-        if t in title.lower():
-            score += 4
-        elif t in category.lower():
-            score += 3
-        elif t in hay:
-            score += 1
-    return score
-
-
-def _rank_candidates(prompt: str, candidates: list[dict]) -> list[dict]:
-    scored = []
-    for c in candidates:
-        scored.append(
-            (
-                _score_product(prompt, c.get("title", ""), c.get("description", ""), c.get("category", "")),
-                c,
-            )
-        )
-    scored.sort(key=lambda x: x[0], reverse=True)
-    # If everything scored 0, keep original order (likely recency from DB query).
-    if scored and scored[0][0] == 0:
-        return [c for _, c in scored]
-    return [c for _, c in scored]
+def _tsquery_text(tokens: list[str], joiner: str, max_terms: int = 25) -> str:
+    """
+    Build a prefix-matching tsquery string ("lap:* & stud:*").
+
+    Only [a-z0-9] tokens are emitted, so user input can never inject tsquery syntax.
+    """
+    safe = [t for t in dict.fromkeys(tokens) if re.fullmatch(r"[a-z0-9]+", t)]
+    return f" {joiner} ".join(f"{t}:*" for t in safe[:max_terms])
+
+
+_SEARCH_FIELD_WEIGHTS = {"title": 4.0, "category": 3.0, "description": 1.0}
+
+
+class CatalogSearchIndex:
+    """
+    In-memory inverted index over product title/category/description.
+
+    Scoring is BM25F-style: per-field term frequencies are length-normalized, weighted
+    (title > category > description, like the old keyword scan) and summed before the
+    BM25 saturation + IDF step. Query tokens match indexed terms by prefix so "laptop"
+    still hits "laptops". Documents are added/removed incrementally; re-adding a product
+    whose text did not change is a dict lookup, not a re-tokenize. With `max_docs`, the least
+    recently upserted products are evicted, so products that stop showing up (deactivated,
+    deleted) do not stay forever.
+    """
+
+    def __init__(
+        self,
+        field_weights: Optional[dict[str, float]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        max_docs: Optional[int] = None,
+    ) -> None:
+        self._weights = dict(field_weights or _SEARCH_FIELD_WEIGHTS)
+        self._k1 = k1
+        self._b = b
+        self._max_docs = max_docs
+        self._lock = threading.Lock()
+        # product_id -> indexed text, least recently upserted first
+        self._signatures: OrderedDict[int, tuple[str, ...]] = OrderedDict()
+        # product_id -> field -> indexed terms (so removal only touches that product's postings)
+        self._doc_terms: dict[int, dict[str, dict[str, int]]] = {}
+        # field -> term -> {product_id: term frequency}
+        self._postings: dict[str, dict[str, dict[int, int]]] = {f: {} for f in self._weights}
+        # field -> {product_id: token count}, plus running totals for average field length.
+        self._field_lengths: dict[str, dict[int, int]] = {f: {} for f in self._weights}
+        self._field_totals: dict[str, int] = {f: 0 for f in self._weights}
+        self._vocab: list[str] = []
+        self._vocab_dirty = False
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _terms(text: str) -> dict[str, int]:
+        counts: dict[str, int] = {}
+        for t in re.findall(r"[a-z0-9]+", (text or "").lower()):
+            counts[t] = counts.get(t, 0) + 1
+        return counts
+
+    def _remove_locked(self, product_id: int) -> None:
+        if self._signatures.pop(product_id, None) is None:
+            return
+        doc_terms = self._doc_terms.pop(product_id, {})
+        for field in self._weights:
+            length = self._field_lengths[field].pop(product_id, 0)
+            self._field_totals[field] -= length
+            postings = self._postings[field]
+            for term in doc_terms.get(field, ()):
+                docs = postings[term]
+                del docs[product_id]
+                if not docs:
+                    del postings[term]
+                    self._vocab_dirty = True
+
+    def _upsert_locked(self, product: dict) -> bool:
+        pid = int(product.get("id", 0) or 0)
+        texts = {f: str(product.get(f, "") or "") for f in self._weights}
+        signature = tuple(texts[f] for f in self._weights)
+        if self._signatures.get(pid) == signature:
+            self._signatures.move_to_end(pid)
+            return False
+        self._remove_locked(pid)
+        self._signatures[pid] = signature
+        doc_terms: dict[str, dict[str, int]] = {}
+        for field, text in texts.items():
+            counts = self._terms(text)
+            doc_terms[field] = counts
+            postings = self._postings[field]
+            for term, tf in counts.items():
+                docs = postings.get(term)
+                if docs is None:
+                    docs = postings[term] = {}
+                    self._vocab_dirty = True
+                docs[pid] = tf
+            length = sum(counts.values())
+            self._field_lengths[field][pid] = length
+            self._field_totals[field] += length
+        self._doc_terms[pid] = doc_terms
+        if self._max_docs is not None:
+            while len(self._signatures) > self._max_docs:
+                self._remove_locked(next(iter(self._signatures)))
+        return True
+
+    def upsert(self, product: dict) -> bool:
+        """Index (or re-index) one product dict. Returns False when its text is unchanged."""
+        with self._lock:
+            return self._upsert_locked(product)
+
+    def upsert_many(self, products: list[dict]) -> int:
+        with self._lock:
+            return sum(1 for p in products if self._upsert_locked(p))
+
+    def remove(self, product_id: int) -> None:
+        with self._lock:
+            self._remove_locked(int(product_id))
+
+    def _expand_locked(self, token: str) -> list[str]:
+        if self._vocab_dirty:
+            vocab: set[str] = set()
+            for postings in self._postings.values():
+                vocab.update(postings)
+            self._vocab = sorted(vocab)
+            self._vocab_dirty = False
+        out: list[str] = []
+        i = bisect.bisect_left(self._vocab, token)
+        while i < len(self._vocab) and self._vocab[i].startswith(token):
+            out.append(self._vocab[i])
+            i += 1
+        return out
+
+    def score(self, prompt: str, restrict_to: Optional[set[int]] = None) -> dict[int, float]:
+        """
+        BM25F scores for every indexed product matching at least one prompt token. With
+        `restrict_to`, only those products are scored and the collection statistics (document
+        count, average field length, document frequency) are computed over them alone, and
+        the work is bounded by the candidate count rather than the size of the whole index.
+        """
+        tokens = _tokenize_query(prompt)
+        if not tokens:
+            return {}
+        scores: dict[int, float] = {}
+        with self._lock:
+            if restrict_to is None:
+                n_docs = len(self._signatures)
+                totals = self._field_totals
+            else:
+                docs = [pid for pid in restrict_to if pid in self._signatures]
+                n_docs = len(docs)
+                totals = {f: sum(self._field_lengths[f][pid] for pid in docs) for f in self._weights}
+            if n_docs == 0:
+                return {}
+            avg_len = {f: max(1.0, totals[f] / n_docs) for f in self._weights}
+            for token in dict.fromkeys(tokens):
+                terms = self._expand_locked(token)
+                if not terms:
+                    continue
+                if restrict_to is None:
+                    weighted_tf = self._weighted_tf_postings_locked(terms, avg_len)
+                elif self._postings_size_locked(terms) <= len(docs) * len(self._weights):
+                    # Rare terms: their postings are shorter than the candidate list.
+                    weighted_tf = self._weighted_tf_postings_locked(terms, avg_len, restrict_to)
+                else:
+                    weighted_tf = self._weighted_tf_docs_locked(set(terms), docs, avg_len)
+                if not weighted_tf:
+                    continue
+                df = len(weighted_tf)
+                idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+                for pid, wtf in weighted_tf.items():
+                    scores[pid] = scores.get(pid, 0.0) + idf * (wtf * (self._k1 + 1.0)) / (wtf + self._k1)
+        return scores
+
+    def _postings_size_locked(self, terms: list[str]) -> int:
+        return sum(len(self._postings[field].get(term, ())) for field in self._weights for term in terms)
+
+    def _weighted_tf_postings_locked(
+        self, terms: list[str], avg_len: dict[str, float], restrict_to: Optional[set[int]] = None
+    ) -> dict[int, float]:
+        # Walk each matching term's postings, keeping only `restrict_to` when given.
+        weighted_tf: dict[int, float] = {}
+        for field, weight in self._weights.items():
+            postings = self._postings[field]
+            lengths = self._field_lengths[field]
+            for term in terms:
+                for pid, tf in postings.get(term, {}).items():
+                    if restrict_to is not None and pid not in restrict_to:
+                        continue
+                    norm = 1.0 - self._b + self._b * (lengths.get(pid, 0) / avg_len[field])
+                    weighted_tf[pid] = weighted_tf.get(pid, 0.0) + weight * tf / norm
+        return weighted_tf
+
+    def _weighted_tf_docs_locked(self, terms: set[str], docs: list[int], avg_len: dict[str, float]) -> dict[int, float]:
+        # A candidate set: intersect each candidate's own terms with the expanded query terms
+        # (the set intersection walks whichever side is smaller).
+        weighted_tf: dict[int, float] = {}
+        for pid in docs:
+            doc_terms = self._doc_terms[pid]
+            for field, weight in self._weights.items():
+                counts = doc_terms[field]
+                common = counts.keys() & terms
+                if common:
+                    tf = sum(counts[term] for term in common)
+                    norm = 1.0 - self._b + self._b * (self._field_lengths[field][pid] / avg_len[field])
+                    weighted_tf[pid] = weighted_tf.get(pid, 0.0) + weight * tf / norm
+        return weighted_tf
+
+
+# Shared across requests; products are upserted as they are fetched so unchanged rows are never
+# re-tokenized, and ones no longer fetched age out past HWEIBO_SEARCH_INDEX_MAX_PRODUCTS.
+_CATALOG_INDEX = CatalogSearchIndex(max_docs=max(1, HWEIBO_SEARCH_INDEX_MAX_PRODUCTS))
+
+
+def _rank_candidates(prompt: str, candidates: list[dict], index: Optional[CatalogSearchIndex] = None) -> list[dict]:
+    index = index if index is not None else _CATALOG_INDEX
+    with profiling.phase("rank"):
+        index.upsert_many(candidates)
+        scores = index.score(prompt, restrict_to={int(c.get("id", 0) or 0) for c in candidates})
+    if not scores:
+        # Nothing matched: keep original order (likely recency from DB query).
+        return list(candidates)
+    # Stable sort, so ties keep the incoming (recency) order.
+    return sorted(candidates, key=lambda c: scores.get(int(c.get("id", 0) or 0), 0.0), reverse=True)
 
 
 def _ensure_five_unique(ids: list[int], fallback_ids: list[int]) -> list[int]:
@@ -432,19 +1622,150 @@ def _gemini_suggestions(prompt: str) -> list[str]:
     raise HTTPException(status_code=500, detail="Internal error: _gemini_suggestions() is deprecated.")
 
 
-def _gemini_rank_product_ids(prompt: str, candidates: list[dict]) -> list[int]:
-    """
-    Rank *existing catalog products* using Gemini, returning exactly 5 product IDs.
+_gemini_client_instance = None
+_gemini_client_lock = threading.Lock()
 
-    This matches the SRS requirement: recommendations must come from the platform catalog
-    and prompt-search returns 5 ranked products (with images added by the API response).
-    """
+
+def _gemini_client():
+    """One long-lived client per process; it owns the HTTP connection pool to Gemini."""
+    global _gemini_client_instance
     if genai is None:
         raise HTTPException(status_code=500, detail="Gemini SDK not installed. Add 'google-genai' to requirements.")
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="Missing GEMINI_API_KEY for real mode.")
+    with _gemini_client_lock:
+        if _gemini_client_instance is None:
+            _gemini_client_instance = genai.Client(api_key=GEMINI_API_KEY)
+        return _gemini_client_instance
+
+
+# ----------------------------
+# Gemini candidate encoding
+# ----------------------------
+_AI_MIN_CANDIDATES = 5  # Gemini must be able to pick 5, whatever the budget says
+_TABLE_COLUMNS = "id|title|category|price|description"
+
+
+def _estimate_tokens(text: str) -> int:
+    # ~4 UTF-8 bytes per token for English catalog text; close enough to budget against.
+    return max(1, (len(text.encode("utf-8")) + 3) // 4)
+
+
+def _short_description(text: str, limit: int) -> str:
+    """First sentence if it fits, else cut at a word boundary; whitespace collapsed."""
+    text = " ".join((text or "").split())
+    if limit <= 0 or len(text) <= limit:
+        return text
+    sentence_end = max(text.rfind(". ", 0, limit), text.rfind("! ", 0, limit), text.rfind("? ", 0, limit))
+    if sentence_end >= limit // 2:
+        return text[: sentence_end + 1]
+    cut = text.rfind(" ", 0, limit)
+    return text[: cut if cut > limit // 2 else limit].rstrip(" ,;:-") + "…"
+
+
+def _table_cell(value: Any) -> str:
+    return " ".join(str(value).split()).replace("|", "/")
+
+
+def _candidate_row(c: dict, description_chars: int) -> str:
+    price = f"{c.get('currency', 'USD')} {int(c.get('price_cents', 0) or 0) / 100:.2f}"
+    return "|".join(
+        _table_cell(v)
+        for v in (c["id"], c.get("title", ""), c.get("category", ""), price, _short_description(c.get("description", ""), description_chars))
+    )
+
+
+def _candidate_json(c: dict, description_chars: int) -> dict:
+    return {
+        "id": c["id"],
+        "title": c.get("title", ""),
+        "description": _short_description(c.get("description", ""), description_chars),
+        "category": c.get("category", ""),
+        "price_cents": c.get("price_cents", 0),
+        "currency": c.get("currency", "USD"),
+    }
 
-    client = genai.Client(api_key=GEMINI_API_KEY)
+
+class _GeminiLatencyModel:
+    """EWMA of Gemini milliseconds per input token, learned from successful calls."""
+
+    def __init__(self, alpha: float = 0.2) -> None:
+        self._alpha = alpha
+        self._lock = threading.Lock()
+        self.ms_per_token: Optional[float] = None
+
+    def observe(self, seconds: float, input_tokens: float) -> None:
+        if input_tokens <= 0:
+            return
+        sample = seconds * 1000 / input_tokens
+        with self._lock:
+            prev = self.ms_per_token
+            self.ms_per_token = sample if prev is None else prev + self._alpha * (sample - prev)
+
+    def token_budget(self, target_ms: float) -> Optional[int]:
+        # Attributes the whole call to input size (overhead included), so the budget errs small.
+        with self._lock:
+            rate = self.ms_per_token
+        return int(target_ms / rate) if rate else None
+
+
+_GEMINI_LATENCY_MODEL = _GeminiLatencyModel()
+
+
+def _candidate_token_budget() -> Optional[int]:
+    budgets = [HWEIBO_AI_TOKEN_BUDGET] if HWEIBO_AI_TOKEN_BUDGET > 0 else []
+    if HWEIBO_AI_LATENCY_TARGET_MS > 0:
+        latency_budget = _GEMINI_LATENCY_MODEL.token_budget(HWEIBO_AI_LATENCY_TARGET_MS)
+        if latency_budget is not None:
+            budgets.append(latency_budget)
+    return min(budgets) if budgets else None
+
+
+def _encode_gemini_candidates(prompt: str, candidates: list[dict]) -> tuple[str, int]:
+    """
+    User message for the ranking call and how many candidates it carries.
+
+    Candidates arrive best-first, so they are added in order until the next row would exceed the
+    token budget (never fewer than 5). The prompt stays a JSON string either way, which keeps it
+    clearly delimited from the catalog data.
+    """
+    budget = _candidate_token_budget()
+    used = 0
+    if HWEIBO_AI_PAYLOAD_FORMAT == "json":
+        items: list[dict] = []
+        for c in candidates:
+            item = _candidate_json(c, HWEIBO_AI_DESCRIPTION_CHARS)
+            cost = _estimate_tokens(json.dumps(item, ensure_ascii=False, separators=(",", ":")))
+            if budget is not None and len(items) >= _AI_MIN_CANDIDATES and used + cost > budget:
+                break
+            items.append(item)
+            used += cost
+        text = json.dumps({"user_prompt": prompt, "candidates": items}, ensure_ascii=False, separators=(",", ":"))
+        return text, len(items)
+
+    rows: list[str] = []
+    for c in candidates:
+        row = _candidate_row(c, HWEIBO_AI_DESCRIPTION_CHARS)
+        cost = _estimate_tokens(row)
+        if budget is not None and len(rows) >= _AI_MIN_CANDIDATES and used + cost > budget:
+            break
+        rows.append(row)
+        used += cost
+    text = (
+        f"user_prompt: {json.dumps(prompt, ensure_ascii=False)}\n"
+        f"candidates ({_TABLE_COLUMNS}):\n" + "\n".join(rows)
+    )
+    return text, len(rows)
+
+
+async def _gemini_rank_product_ids(prompt: str, candidates: list[dict]) -> list[int]:
+    """
+    Rank *existing catalog products* using Gemini, returning exactly 5 product IDs.
+
+    This matches the SRS requirement: recommendations must come from the platform catalog
+    and prompt-search returns 5 ranked products (with images added by the API response).
+    """
+    client = _gemini_client()
 
     # System instruction is isolated from user input to reduce prompt injection risk.
     system_instruction = (
@@ -458,6 +1779,11 @@ def _gemini_rank_product_ids(prompt: str, candidates: list[dict]) -> list[int]:
         "- Do not output explanations, markdown, or extra text.\n"
         "- Output must be valid JSON matching the response schema.\n"
     )
+    if HWEIBO_AI_PAYLOAD_FORMAT != "json":
+        system_instruction += (
+            "Input format: the user_prompt line, then one candidate per line with pipe-separated columns "
+            f"{_TABLE_COLUMNS} (best keyword/semantic matches first).\n"
+        )
 
     # Minimal schema: enforce exactly 5 IDs.
     response_schema = {
@@ -474,39 +1800,53 @@ def _gemini_rank_product_ids(prompt: str, candidates: list[dict]) -> list[int]:
         "additionalProperties": False,
     }
 
-    user_payload = {
-        "user_prompt": prompt,
-        "candidates": [
-            {
-                "id": c["id"],
-                "title": c.get("title", ""),
-                "description": c.get("description", ""),
-                "category": c.get("category", ""),
-                "price_cents": c.get("price_cents", 0),
-                "currency": c.get("currency", "USD"),
-            }
-            for c in candidates
-        ],
-    }
-
-    response = client.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=[
-            genai.types.Content(
-                role="user",
-                parts=[genai.types.Part(text=json.dumps(user_payload, ensure_ascii=True))],
-            )
-        ],
-        config=genai.types.GenerateContentConfig(
-            systemInstruction=system_instruction,
-            temperature=0.2,
-            maxOutputTokens=200,
-            responseMimeType="application/json",
-            responseSchema=response_schema,
-        ),
+    contents_text, sent = _encode_gemini_candidates(prompt, candidates)
+    input_tokens = _estimate_tokens(system_instruction) + _estimate_tokens(contents_text)
+    _GEMINI_CANDIDATES.observe(sent)
+    logger.info(
+        "Gemini ranking payload. candidates=%d/%d bytes=%d est_tokens=%d format=%s",
+        sent,
+        len(candidates),
+        len(contents_text.encode("utf-8")),
+        input_tokens,
+        HWEIBO_AI_PAYLOAD_FORMAT,
     )
+    started = time.perf_counter()
+    try:
+        response = await client.aio.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=[
+                genai.types.Content(
+                    role="user",
+                    parts=[genai.types.Part(text=contents_text)],
+                )
+            ],
+            config=genai.types.GenerateContentConfig(
+                systemInstruction=system_instruction,
+                temperature=0.2,
+                maxOutputTokens=200,
+                responseMimeType="application/json",
+                responseSchema=response_schema,
+            ),
+        )
+    except asyncio.CancelledError:
+        # Deadline hit or the request went away.
+        _GEMINI_LATENCY.observe(time.perf_counter() - started, outcome="cancelled")
+        raise
+    except Exception:
+        _GEMINI_LATENCY.observe(time.perf_counter() - started, outcome="error")
+        raise
+    elapsed = time.perf_counter() - started
+    _GEMINI_LATENCY.observe(elapsed, outcome="ok")
 
     raw = (response.text or "").strip()
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    completion_tokens = getattr(usage, "candidates_token_count", None)
+    prompt_tokens = prompt_tokens if prompt_tokens is not None else input_tokens
+    _GEMINI_TOKENS.observe(prompt_tokens, direction="prompt")
+    _GEMINI_LATENCY_MODEL.observe(elapsed, prompt_tokens)
+    _GEMINI_TOKENS.observe(completion_tokens if completion_tokens is not None else len(raw) / 4, direction="completion")
     if not raw:
         return []
     try:
@@ -523,6 +1863,359 @@ def _gemini_rank_product_ids(prompt: str, candidates: list[dict]) -> list[int]:
         return []
 
 
+async def _gemini_rank_hedged(prompt: str, candidates: list[dict]) -> list[int]:
+    """
+    Run the Gemini ranking, optionally hedged.
+
+    With HWEIBO_AI_HEDGE_AFTER_SECONDS > 0, a second identical request is started if the
+    first has not answered by then; the first non-empty answer wins and the loser is cancelled.
+    """
+    first = asyncio.ensure_future(_gemini_rank_product_ids(prompt, candidates))
+    if HWEIBO_AI_HEDGE_AFTER_SECONDS <= 0:
+        return await first
+
+    attempts = {first}
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=HWEIBO_AI_HEDGE_AFTER_SECONDS)
+        if not done:
+            logger.info("Gemini ranking slower than %.2fs; sending hedged request.", HWEIBO_AI_HEDGE_AFTER_SECONDS)
+            attempts.add(asyncio.ensure_future(_gemini_rank_product_ids(prompt, candidates)))
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is None and task.result():
+                    return task.result()
+        # No attempt produced IDs: surface the first attempt's outcome (empty list or its error).
+        return first.result()
+    finally:
+        for task in attempts:
+            if not task.done():
+                task.cancel()
+
+
+class CircuitBreakerOpen(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker over a rolling window of call outcomes.
+
+    closed:    calls go through. Outcomes from the last `window_seconds` are kept; once there are
+               at least `min_calls`, an error rate >= `error_rate` or a slow-call rate (calls taking
+               >= `slow_call_seconds`) >= `slow_call_rate` opens the breaker.
+    open:      calls raise CircuitBreakerOpen immediately, for `open_seconds`.
+    half_open: up to `probes` calls are let through; once that many succeed (and are not slow) the
+               breaker closes with an empty window, and the first failure reopens it. Other calls
+               are rejected meanwhile.
+
+    An exception or an empty result is a failure. A call still running after `timeout_seconds`
+    is abandoned with asyncio.TimeoutError and counts as a failure, so a hung provider opens the
+    breaker. A call cancelled by its caller is not an outcome.
+    """
+
+    STATES = ("closed", "open", "half_open")
+
+    def __init__(
+        self,
+        *,
+        window_seconds: float,
+        min_calls: int,
+        error_rate: float,
+        slow_call_seconds: float,
+        slow_call_rate: float,
+        open_seconds: float,
+        probes: int,
+        timeout_seconds: float = 0.0,
+    ) -> None:
+        self.window_seconds = max(1.0, window_seconds)
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_seconds = max(0.0, slow_call_seconds)
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = max(0.0, open_seconds)
+        self.probes = max(1, probes)
+        self.timeout_seconds = max(0.0, timeout_seconds)
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._opened_at = 0.0
+        # (finished_at, failed, slow, seconds), oldest first
+        self._calls: deque[tuple[float, bool, bool, float]] = deque()
+        self._probes_started = 0
+        self._probes_passed = 0
+        self.rejected = 0
+        self._transition_counts = {state: 0 for state in self.STATES}
+        self._transitions: deque[dict] = deque(maxlen=20)
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._advance(time.monotonic())
+            return self._state
+
+    def _advance(self, now: float) -> None:
+        if self._state == "open" and now - self._opened_at >= self.open_seconds:
+            self._transition("half_open", f"open for {self.open_seconds:g}s")
+            self._probes_started = 0
+            self._probes_passed = 0
+
+    def _transition(self, state: str, reason: str) -> None:
+        previous, self._state = self._state, state
+        self._transition_counts[state] += 1
+        self._transitions.append(
+            {"from": previous, "to": state, "reason": reason, "at": datetime.now(timezone.utc).isoformat()}
+        )
+        log = logger.warning if state == "open" else logger.info
+        log("Gemini circuit breaker %s -> %s (%s).", previous, state, reason)
+
+    def _open(self, now: float, reason: str) -> None:
+        self._opened_at = now
+        self._calls.clear()
+        self._transition("open", reason)
+
+    def _admit(self) -> bool:
+        """True when the call is a half-open probe; raises CircuitBreakerOpen when it is rejected."""
+        with self._lock:
+            self._advance(time.monotonic())
+            if self._state == "closed":
+                return False
+            if self._state == "half_open" and self._probes_started < self.probes:
+                self._probes_started += 1
+                return True
+            self.rejected += 1
+            retry_in = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+        raise CircuitBreakerOpen(f"Gemini circuit breaker is {self._state}; retry in {retry_in:.0f}s")
+
+    def _record(self, probe: bool, failed: bool, seconds: float) -> None:
+        now = time.monotonic()
+        slow = self.slow_call_seconds > 0 and seconds >= self.slow_call_seconds
+        with self._lock:
+            self._advance(now)
+            if probe:
+                if self._state != "half_open":
+                    return
+                if failed or slow:
+                    self._open(now, f"probe {'failed' if failed else f'took {seconds:.1f}s'}")
+                    return
+                self._probes_passed += 1
+                if self._probes_passed >= self.probes:
+                    self._transition("closed", f"{self._probes_passed} probes succeeded")
+                return
+            if self._state != "closed":
+                # Finished after the breaker opened; the window it belonged to is gone.
+                return
+            self._calls.append((now, failed, slow, seconds))
+            while self._calls and self._calls[0][0] < now - self.window_seconds:
+                self._calls.popleft()
+            total = len(self._calls)
+            if total < self.min_calls:
+                return
+            errors = sum(1 for c in self._calls if c[1])
+            slow_calls = sum(1 for c in self._calls if c[2])
+            if errors / total >= self.error_rate:
+                self._open(now, f"{errors}/{total} calls failed in {self.window_seconds:g}s")
+            elif self.slow_call_seconds > 0 and slow_calls / total >= self.slow_call_rate:
+                self._open(now, f"{slow_calls}/{total} calls took >= {self.slow_call_seconds:g}s")
+
+    def _release(self, probe: bool) -> None:
+        with self._lock:
+            if probe and self._state == "half_open":
+                self._probes_started -= 1
+
+    async def call(self, loader):
+        """Await `loader()` (a zero-arg callable returning an awaitable) through the breaker."""
+        probe = self._admit()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(loader(), timeout=self.timeout_seconds or None)
+        except asyncio.CancelledError:
+            self._release(probe)
+            raise
+        except Exception:
+            self._record(probe, True, time.perf_counter() - started)
+            raise
+        self._record(probe, not result, time.perf_counter() - started)
+        return result
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        with self._lock:
+            self._advance(now)
+            calls = [c for c in self._calls if c[0] >= now - self.window_seconds]
+            latencies = sorted(c[3] for c in calls)
+            total = len(calls)
+            return {
+                "state": self._state,
+                "retry_in_seconds": round(max(0.0, self.open_seconds - (now - self._opened_at)), 1)
+                if self._state == "open"
+                else None,
+                "window": {
+                    "seconds": self.window_seconds,
+                    "calls": total,
+                    "error_rate": round(sum(1 for c in calls if c[1]) / total, 3) if total else 0.0,
+                    "slow_call_rate": round(sum(1 for c in calls if c[2]) / total, 3) if total else 0.0,
+                    "p50_ms": round(latencies[total // 2] * 1000, 1) if total else None,
+                    "p95_ms": round(latencies[min(total - 1, int(total * 0.95))] * 1000, 1) if total else None,
+                },
+                "rejected": self.rejected,
+                "transition_counts": dict(self._transition_counts),
+                "transitions": list(self._transitions),
+            }
+
+
+_GEMINI_BREAKER = CircuitBreaker(
+    window_seconds=HWEIBO_AI_BREAKER_WINDOW_SECONDS,
+    min_calls=HWEIBO_AI_BREAKER_MIN_CALLS,
+    error_rate=HWEIBO_AI_BREAKER_ERROR_RATE,
+    slow_call_seconds=HWEIBO_AI_BREAKER_SLOW_CALL_SECONDS,
+    slow_call_rate=HWEIBO_AI_BREAKER_SLOW_CALL_RATE,
+    open_seconds=HWEIBO_AI_BREAKER_OPEN_SECONDS,
+    probes=HWEIBO_AI_BREAKER_PROBES,
+    timeout_seconds=HWEIBO_AI_DEADLINE_SECONDS,
+)
+
+
+async def _gemini_rank_guarded(prompt: str, candidates: list[dict]) -> list[int]:
+    if not HWEIBO_AI_BREAKER:
+        return await _gemini_rank_hedged(prompt, candidates)
+    return await _GEMINI_BREAKER.call(lambda: _gemini_rank_hedged(prompt, candidates))
+
+
+class PromptResultCache:
+    """
+    Bounded LRU + TTL cache for Gemini rankings, with single-flight loading.
+
+    Concurrent misses on the same key await the first caller's Gemini call instead of
+    issuing their own; the shared load is shielded, so a caller hitting its deadline does
+    not cancel it for the others. Once its last waiter has gone the load is cancelled, so
+    abandoned calls do not pile up during an outage. Empty results and errors are never
+    cached, so a bad answer only costs one request. Keys include a fingerprint of the
+    candidate set (see _prompt_cache_key), which is how catalog changes invalidate entries.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self.max_entries = max(0, max_entries)
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float, list[int]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}  # in-flight load -> callers awaiting it
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def get(self, key: str) -> Optional[list[int]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(value)
+
+    def put(self, key: str, value: list[int]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, list(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_load(self, key: str, loader) -> list[int]:
+        """`loader` is a zero-arg callable returning an awaitable of product IDs."""
+        if not self.enabled:
+            return await loader()
+        cached = self.get(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached
+
+        flight = self._inflight.get(key)
+        if flight is None:
+            with self._lock:
+                self.misses += 1
+            flight = self._inflight[key] = asyncio.ensure_future(self._load(key, loader))
+            # Nobody may be left to await a failed load; retrieve its exception so it is not logged.
+            flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+        else:
+            with self._lock:
+                self.coalesced += 1
+        self._waiters[flight] = self._waiters.get(flight, 0) + 1
+        try:
+            return list(await asyncio.shield(flight))
+        finally:
+            self._waiters[flight] -= 1
+            if not self._waiters[flight]:
+                del self._waiters[flight]
+                if not flight.done():
+                    flight.cancel()
+
+    async def _load(self, key: str, loader) -> list[int]:
+        try:
+            result = await loader()
+            if result:
+                self.put(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+            }
+
+
+_PROMPT_CACHE = PromptResultCache(HWEIBO_AI_CACHE_SIZE, HWEIBO_AI_CACHE_TTL_SECONDS)
+
+
+def _prompt_cache_key(prompt: str, candidates: list[dict], model: Optional[str]) -> str:
+    # Fingerprint covers the fields Gemini sees, so any catalog edit to a candidate
+    # (or a different candidate set) produces a new key instead of a stale ranking.
+    h = hashlib.sha256()
+    h.update((model or "").encode("utf-8"))
+    h.update(b"\0")
+    h.update(" ".join(prompt.lower().split()).encode("utf-8"))
+    for c in sorted(candidates, key=lambda c: c["id"]):
+        h.update(b"\0")
+        h.update(
+            repr(
+                (
+                    c["id"],
+                    c.get("title", ""),
+                    c.get("category", ""),
+                    c.get("description", ""),
+                    c.get("price_cents", 0),
+                    c.get("currency", "USD"),
+                )
+            ).encode("utf-8")
+        )
+    return h.hexdigest()
+
+
+async def _gemini_rank_cached(prompt: str, candidates: list[dict]) -> list[int]:
+    key = _prompt_cache_key(prompt, candidates, GEMINI_MODEL)
+    return await _PROMPT_CACHE.get_or_load(key, lambda: _gemini_rank_guarded(prompt, candidates))
+
+
 def _product_to_dict(p: Product) -> dict:
     return {
         "id": int(p.id or 0),
@@ -532,23 +2225,153 @@ def _product_to_dict(p: Product) -> dict:
         "price_cents": int(p.price_cents or 0),
         "currency": p.currency or "USD",
         "images": [img.url for img in (p.images or [])],
+        "image_variants": [img.variants or {} for img in (p.images or [])],
     }
 
 
 def _fetch_catalog_candidates(session: Session, prompt: str) -> list[dict]:
+    return _fetch_catalog_candidates_many(session, [prompt])[0]
+
+
+def _fetch_catalog_candidates_many(session: Session, prompts: list[str]) -> list[list[dict]]:
+    """
+    Gemini candidates for each prompt from one shared catalog read.
+
+    Vector hits for every prompt come back in one query. The keyword path is one full-text query
+    that returns each prompt's own best HWEIBO_AI_CATALOG_FETCH_LIMIT matches (so a prompt with
+    many matches cannot crowd out another's), plus one recency top-up shared by all prompts.
+    Each prompt is then ranked against its own rows in memory. For a single prompt this is the
+    original per-request fetch.
+    """
     from sqlalchemy.orm import selectinload
 
-    stmt = (
+    fetch_limit = max(10, min(HWEIBO_AI_CATALOG_FETCH_LIMIT, 500))
+    candidate_limit = max(10, min(HWEIBO_AI_CANDIDATE_LIMIT, 120))
+    base = (
         select(Product)
         .where(Product.is_active == True)  # noqa: E712
         .options(selectinload(Product.images))
-        .order_by(Product.created_at.desc())
-        .limit(max(10, min(HWEIBO_AI_CATALOG_FETCH_LIMIT, 500)))
     )
-    rows = session.exec(stmt).all()
-    candidates = [_product_to_dict(p) for p in rows if p.id is not None]
-    ranked = _rank_candidates(prompt, candidates)
-    return ranked[: max(10, min(HWEIBO_AI_CANDIDATE_LIMIT, 120))]
+
+    vector_ids = [_vector_candidate_ids(prompt) for prompt in prompts]
+    wanted = sorted({pid for ids in vector_ids for pid in ids})
+    found = {p.id: p for p in session.exec(base.where(Product.id.in_(wanted))).all()} if wanted else {}
+    vector_candidates = [[_product_to_dict(found[pid]) for pid in ids if pid in found] for ids in vector_ids]
+    # Enough vector hits for a prompt: it needs no keyword candidates at all.
+    complete = [bool(vc) and len(vc) >= HWEIBO_AI_VECTOR_TOP_K for vc in vector_candidates]
+
+    keyword_prompts = [prompt for prompt, done in zip(prompts, complete) if not done]
+    pools: list[list[dict]] = []
+    if keyword_prompts:
+        tsqs = [_tsquery_text(_tokenize_query(prompt), "|") if _product_fts_ready else "" for prompt in keyword_prompts]
+        # Relevance-first retrieval: only products matching each prompt, best ts_rank first.
+        matches: list[list[Product]] = [[] for _ in keyword_prompts]
+        if len(keyword_prompts) == 1 and tsqs[0]:
+            query = func.to_tsquery(_SEARCH_CONFIG, tsqs[0])
+            stmt = (
+                base.where(_SEARCH_VECTOR.op("@@")(query))
+                .order_by(func.ts_rank(_SEARCH_VECTOR, query).desc(), Product.created_at.desc())
+                .limit(fetch_limit)
+            )
+            matches[0] = list(session.exec(stmt).all())
+        elif any(tsqs):
+            ranked_ids = _fts_match_ids_per_prompt(session, tsqs, fetch_limit)
+            wanted = sorted({pid for ids in ranked_ids for pid in ids})
+            found = {p.id: p for p in session.exec(base.where(Product.id.in_(wanted))).all()} if wanted else {}
+            matches = [[found[pid] for pid in ids if pid in found] for ids in ranked_ids]
+
+        # Top up with recent products so Gemini always has enough to choose 5 from; prompts
+        # without keywords get only recent products, as in the single-prompt fetch.
+        recent: list[Product] = []
+        if not all(tsqs) or any(len(rows) < candidate_limit for rows in matches):
+            recent_limit = fetch_limit if not all(tsqs) else candidate_limit
+            recent = list(session.exec(base.order_by(Product.created_at.desc()).limit(recent_limit)).all())
+        for tsq, rows in zip(tsqs, matches):
+            if not tsq:
+                rows = recent
+            elif len(rows) < candidate_limit:
+                seen = {p.id for p in rows}
+                rows = rows + [p for p in recent if p.id not in seen][: candidate_limit - len(rows)]
+            pools.append([_product_to_dict(p) for p in rows if p.id is not None])
+
+    out: list[list[dict]] = []
+    keyword_pools = iter(pools)
+    for prompt, vc, done in zip(prompts, vector_candidates, complete):
+        if done:
+            out.append(vc)
+            continue
+        ranked = _rank_candidates(prompt, next(keyword_pools))
+        out.append(_top_up_candidates(vc, ranked, HWEIBO_AI_VECTOR_TOP_K) if vc else ranked[:candidate_limit])
+    return out
+
+
+# Each prompt's own top matches in one round trip (LATERAL runs the ranked query per tsquery).
+_FTS_MATCHES_PER_PROMPT_SQL = """
+SELECT q.ord, m.id
+FROM unnest(CAST(:queries AS text[])) WITH ORDINALITY AS q(tsq, ord)
+CROSS JOIN LATERAL (
+  SELECT p.id
+  FROM product p
+  WHERE p.is_active AND p.search_vector @@ to_tsquery('english'::regconfig, q.tsq)
+  ORDER BY ts_rank(p.search_vector, to_tsquery('english'::regconfig, q.tsq)) DESC, p.created_at DESC
+  LIMIT :per_prompt
+) m
+ORDER BY q.ord
+"""
+
+
+def _fts_match_ids_per_prompt(session: Session, tsqs: list[str], per_prompt: int) -> list[list[int]]:
+    """Best-first product ids for each tsquery text ([] for empty ones), at most `per_prompt` each."""
+    positions = [i for i, tsq in enumerate(tsqs) if tsq]
+    out: list[list[int]] = [[] for _ in tsqs]
+    rows = session.exec(
+        text(_FTS_MATCHES_PER_PROMPT_SQL),
+        params={"queries": [tsqs[i] for i in positions], "per_prompt": per_prompt},
+    ).all()
+    for ord_, pid in rows:
+        out[positions[int(ord_) - 1]].append(int(pid))
+    return out
+
+
+_EMBEDDINGS = catalog_embeddings.EmbeddingStore(HWEIBO_EMBEDDINGS_DIR)
+
+
+def _vector_candidate_ids(prompt: str) -> list[int]:
+    """Product ids nearest to the prompt in the offline embedding build ([] when there is none)."""
+    if HWEIBO_AI_VECTOR_TOP_K <= 0:
+        return []
+    index = _EMBEDDINGS.get()
+    if index is None:
+        return []
+    with profiling.phase("retrieve"):
+        return [pid for pid, _ in index.top_k(prompt, HWEIBO_AI_VECTOR_TOP_K)]
+
+
+def _top_up_candidates(primary: list[dict], extra: list[dict], limit: int) -> list[dict]:
+    # Vector hits keep their order; keyword/recency candidates fill the rest (e.g. products newer than the build).
+    out = list(primary[:limit])
+    seen = {c["id"] for c in out}
+    for c in extra:
+        if len(out) >= limit:
+            break
+        if c["id"] not in seen:
+            seen.add(c["id"])
+            out.append(c)
+    return out
+
+
+def _load_catalog_candidates(prompt: str) -> list[dict]:
+    if _CATALOG_REPLICA.fresh():
+        return _CATALOG_REPLICA.candidates(prompt)
+    with Session(engine) as session:
+        return _fetch_catalog_candidates(session, prompt)
+
+
+def _load_catalog_candidates_many(prompts: list[str]) -> list[list[dict]]:
+    if _CATALOG_REPLICA.fresh():
+        return [_CATALOG_REPLICA.candidates(prompt) for prompt in prompts]
+    with Session(engine) as session:
+        return _fetch_catalog_candidates_many(session, prompts)
 
 
 def _prototype_catalog() -> list[dict]:
@@ -686,6 +2509,13 @@ def _pseudo_inventory(product_id: int) -> tuple[int, int, str]:
     return stock_units, sales_units, status
 
 
+def _image_variants(item: dict) -> list[dict]:
+    """Per-image size -> format -> URL maps, aligned with item["images"] ({} where none exist)."""
+    images = item.get("images", []) or []
+    variants = list(item.get("image_variants", []) or [])[: len(images)]
+    return variants + [{}] * (len(images) - len(variants))
+
+
 def _decorate_product(item: dict, seller_name: Optional[str] = None, seller_location: Optional[str] = None) -> dict:
     pid = int(item.get("id", 0) or 0)
     sid = int(item.get("seller_id", 0) or 0)
@@ -699,6 +2529,7 @@ def _decorate_product(item: dict, seller_name: Optional[str] = None, seller_loca
         "price_cents": int(item.get("price_cents", 0) or 0),
         "currency": item.get("currency", "USD"),
         "images": list(item.get("images", []) or []),
+        "image_variants": _image_variants(item),
         "store_name": seller_name or default_store,
         "store_location": seller_location or default_location,
         "stock_units": stock_units,
@@ -817,42 +2648,124 @@ def _build_buyer_orders_payload(products: list[dict], limit: int = 8) -> dict:
     }
 
 
-def _fetch_products_real(limit: int, q: str, category: str) -> list[dict]:
+def _seller_store_map(session: Session, seller_ids: set[int]) -> dict[int, tuple[Optional[str], Optional[str]]]:
+    """Store name/city for just the sellers on the current page (not every SellerProfile)."""
+    if not seller_ids:
+        return {}
+    rows = session.exec(
+        select(SellerProfile.user_id, SellerProfile.store_name, SellerProfile.store_city).where(
+            SellerProfile.user_id.in_(sorted(seller_ids))
+        )
+    ).all()
+    return {user_id: (store_name or None, store_city or None) for user_id, store_name, store_city in rows}
+
+
+# sort name -> (keyset columns, descending?). "relevance" orders by ts_rank and has no cursor.
+_PRODUCT_SORTS = {
+    "recent": (("created_at", "id"), True),
+    "price_asc": (("price_cents", "id"), False),
+    "price_desc": (("price_cents", "id"), True),
+}
+_PRODUCT_SORT_PATTERN = "^(recent|relevance|price_asc|price_desc)$"
+
+
+def _encode_cursor(sort: str, key: list) -> str:
+    raw = json.dumps({"s": sort, "k": key}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> list:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        key = data["k"]
+        if data["s"] != sort or not isinstance(key, list) or len(key) != len(_PRODUCT_SORTS[sort][0]):
+            raise ValueError("cursor does not match sort")
+        return key
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def _product_sort_key(item: dict, sort: str) -> list:
+    cols, _ = _PRODUCT_SORTS[sort]
+    key = []
+    for col in cols:
+        value = item.get(col)
+        key.append(value.isoformat() if isinstance(value, datetime) else value)
+    return key
+
+
+def _fetch_products_real(
+    limit: int, q: str, category: str, sort: str = "recent", cursor: Optional[str] = None
+) -> tuple[list[dict], Optional[str]]:
     if engine is None:
-        return []
+        return [], None
 
     from sqlalchemy.orm import selectinload
 
+    page_size = min(limit, 100)
+    keyset = _PRODUCT_SORTS.get(sort)
     with Session(engine) as session:
         stmt = (
             select(Product)
             .where(Product.is_active == True)  # noqa: E712
             .options(selectinload(Product.images))
-            .order_by(Product.created_at.desc())
-            .limit(min(limit, 100))
+            # One extra row tells us whether there is a next page.
+            .limit(page_size + 1)
         )
+        if keyset:
+            cols, descending = keyset
+            columns = [getattr(Product, c) for c in cols]
+            order_by = [c.desc() if descending else c.asc() for c in columns]
+            if cursor:
+                after = _decode_cursor(cursor, sort)
+                try:
+                    after = [datetime.fromisoformat(after[0]) if sort == "recent" else int(after[0]), int(after[1])]
+                except (TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail="Invalid cursor.")
+                # Row-value comparison: served by the partial (created_at, id) / (price_cents, id) indexes,
+                # so page N costs the same as page 1.
+                row, bound = tuple_(*columns), tuple_(*after)
+                stmt = stmt.where(row < bound if descending else row > bound)
+        else:
+            order_by = [Product.created_at.desc(), Product.id.desc()]
         if q.strip():
-            pattern = f"%{q.strip()}%"
-            stmt = stmt.where(
-                or_(
-                    Product.title.ilike(pattern),
-                    Product.description.ilike(pattern),
-                    Product.category.ilike(pattern),
+            tsq = _tsquery_text(re.findall(r"[a-z0-9]+", q.lower()), "&") if _product_fts_ready else ""
+            query = func.to_tsquery(_SEARCH_CONFIG, tsq)
+            # A query of only stop words ("the", "and it") reduces to an empty tsquery that matches
+            # nothing; ask Postgres (its stoplist, not a copy of it) and use the ILIKE scan instead.
+            if tsq and not session.exec(select(func.numnode(query))).one():
+                tsq = ""
+            if tsq:
+                # GIN-indexed match: cost follows the number of hits, not the table size.
+                stmt = stmt.where(_SEARCH_VECTOR.op("@@")(query))
+                if sort == "relevance":
+                    order_by.insert(0, func.ts_rank(_SEARCH_VECTOR, query).desc())
+            else:
+                pattern = f"%{q.strip()}%"
+                stmt = stmt.where(
+                    or_(
+                        Product.title.ilike(pattern),
+                        Product.description.ilike(pattern),
+                        Product.category.ilike(pattern),
+                    )
                 )
-            )
         if category.strip():
             stmt = stmt.where(Product.category.ilike(category.strip()))
+        stmt = stmt.order_by(*order_by)
 
         products = session.exec(stmt).all()
+        next_cursor = None
+        if len(products) > page_size:
+            products = products[:page_size]
+            if keyset:
+                last = products[-1]
+                next_cursor = _encode_cursor(sort, _product_sort_key({c: getattr(last, c) for c in keyset[0]}, sort))
 
-        seller_profiles = session.exec(select(SellerProfile)).all()
-        seller_map = {p.user_id: p for p in seller_profiles}
+        seller_map = _seller_store_map(session, {p.seller_id for p in products})
 
         out: list[dict] = []
         for p in products:
-            seller_profile = seller_map.get(p.seller_id)
-            seller_name = seller_profile.store_name if seller_profile and seller_profile.store_name else None
-            seller_location = seller_profile.store_city if seller_profile and seller_profile.store_city else None
+            seller_name, seller_location = seller_map.get(p.seller_id, (None, None))
             out.append(
                 _decorate_product(
                     {
@@ -864,49 +2777,841 @@ def _fetch_products_real(limit: int, q: str, category: str) -> list[dict]:
                         "price_cents": p.price_cents,
                         "currency": p.currency,
                         "images": [img.url for img in (p.images or [])],
+                        "image_variants": [img.variants or {} for img in (p.images or [])],
                     },
                     seller_name=seller_name,
                     seller_location=seller_location,
                 )
             )
-        return out
+        return out, next_cursor
+
+
+def _prototype_products_page(items: list[dict], sort: str, cursor: Optional[str], limit: int) -> tuple[list[dict], Optional[str]]:
+    keyset = _PRODUCT_SORTS.get(sort)
+    if not keyset:
+        return items[:limit], None
+    cols, descending = keyset
+    if sort == "recent":
+        # The static catalog is already listed newest-first; its position stands in for created_at.
+        position = {p["id"]: i for i, p in enumerate(items)}
+        key_of = lambda p: [position[p["id"]], p["id"]]  # noqa: E731
+        descending = False
+    else:
+        key_of = lambda p: [p.get(c) for c in cols]  # noqa: E731
+        items = sorted(items, key=key_of, reverse=descending)
+    if cursor:
+        after = _decode_cursor(cursor, sort)
+        try:
+            items = [p for p in items if (key_of(p) < after if descending else key_of(p) > after)]
+        except TypeError:
+            raise HTTPException(status_code=400, detail="Invalid cursor.")
+    page = items[:limit]
+    next_cursor = _encode_cursor(sort, key_of(page[-1])) if len(items) > limit else None
+    return page, next_cursor
 
 
-@app.post("/ai/prompts", response_model=PromptResponse)
-def ai_prompt(request: PromptRequest, _: None = Depends(_require_ai_api_key)) -> PromptResponse:
+# ----------------------------
+# In-memory catalog replica
+# ----------------------------
+_CATALOG_CHANNEL = "hweibo_catalog"
+# Row triggers send "product:<id>" / "seller:<user_id>"; TRUNCATE sends "reload".
+_CATALOG_NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION hweibo_catalog_notify() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'TRUNCATE' THEN
+    PERFORM pg_notify('hweibo_catalog', 'reload');
+  ELSIF TG_TABLE_NAME = 'product' THEN
+    PERFORM pg_notify('hweibo_catalog', 'product:' || CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+  ELSIF TG_TABLE_NAME = 'productimage' THEN
+    IF TG_OP <> 'INSERT' THEN
+      PERFORM pg_notify('hweibo_catalog', 'product:' || OLD.product_id);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+      PERFORM pg_notify('hweibo_catalog', 'product:' || NEW.product_id);
+    END IF;
+  ELSE
+    IF TG_OP <> 'INSERT' THEN
+      PERFORM pg_notify('hweibo_catalog', 'seller:' || OLD.user_id);
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+      PERFORM pg_notify('hweibo_catalog', 'seller:' || NEW.user_id);
+    END IF;
+  END IF;
+  RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+# trigger name -> DDL
+_CATALOG_NOTIFY_TRIGGERS = {
+    name: ddl
+    for table in ("product", "productimage", "sellerprofile")
+    for name, ddl in (
+        (
+            f"{table}_catalog_notify",
+            f"CREATE TRIGGER {table}_catalog_notify AFTER INSERT OR UPDATE OR DELETE ON {table} "
+            "FOR EACH ROW EXECUTE FUNCTION hweibo_catalog_notify()",
+        ),
+        (
+            f"{table}_catalog_truncate",
+            f"CREATE TRIGGER {table}_catalog_truncate AFTER TRUNCATE ON {table} "
+            "FOR EACH STATEMENT EXECUTE FUNCTION hweibo_catalog_notify()",
+        ),
+    )
+}
+# pg_advisory_xact_lock key serializing the install across workers that boot together.
+_CATALOG_NOTIFY_LOCK_KEY = 0x68776E74
+# More changed rows than this in one batch (bulk import) -> one full reload instead of per-row deltas.
+_REPLICA_DELTA_LIMIT = 2000
+_REPLICA_POLL_SECONDS = 0.5
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _missing_catalog_notify_ddl(conn) -> list[str]:
+    if conn.exec_driver_sql("SELECT to_regproc('hweibo_catalog_notify')").scalar() is None:
+        return [_CATALOG_NOTIFY_FUNCTION, *_CATALOG_NOTIFY_TRIGGERS.values()]
+    existing = {
+        name
+        for (name,) in conn.exec_driver_sql(
+            "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgfoid = 'hweibo_catalog_notify'::regproc"
+        )
+    }
+    return [ddl for name, ddl in _CATALOG_NOTIFY_TRIGGERS.items() if name not in existing]
+
+
+def _ensure_catalog_notify_triggers(db_engine) -> bool:
     """
-    Prompt-based search.
-    SRS alignment:
-    - returns exactly 5 ranked products
-    - results come from the platform catalog (not hallucinated names)
-    - graceful fallback if Gemini fails
-    - protected in real mode to reduce unauthenticated usage
+    Install the notify function and triggers if any are missing.
+
+    Usually a read-only check: CREATE TRIGGER takes table locks, so nothing is rewritten on boot.
+    Installs run under an advisory lock; workers that lose the race re-check and find nothing to do.
     """
-    if HWEIBO_PROFILE == ProfileMode.prototype:
-        ranked = _rank_candidates(request.prompt, _prototype_catalog())
-        top5 = ranked[:5]
-        return PromptResponse(
-            prompt=request.prompt,
-            products=[
-                RankedProduct(**p, rank=i + 1)  # type: ignore[arg-type]
-                for i, p in enumerate(top5)
-            ],
-            mode=HWEIBO_PROFILE,
-            model=None,
-            fallback_used=True,
+    try:
+        with db_engine.connect() as conn:
+            if not _missing_catalog_notify_ddl(conn):
+                return True
+        with db_engine.begin() as conn:
+            conn.exec_driver_sql(f"SELECT pg_advisory_xact_lock({_CATALOG_NOTIFY_LOCK_KEY})")
+            for stmt in _missing_catalog_notify_ddl(conn):
+                conn.exec_driver_sql(stmt)
+    except Exception as e:
+        logger.warning("Catalog change notifications unavailable; catalog replica disabled. error=%r", e)
+        return False
+    return True
+
+
+def _micros(value: Optional[datetime]) -> int:
+    """Exact integer sort key for a timestamp (naive values are taken as UTC, like the DB column)."""
+    if value is None:
+        return 0
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+class _ReplicaProduct(NamedTuple):
+    id: int
+    seller_id: int
+    title: str
+    description: str
+    category: str
+    price_cents: int
+    currency: str
+    created_at: Optional[datetime]
+    images: tuple[str, ...]
+    image_variants: tuple[dict, ...]
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "seller_id": self.seller_id,
+            "title": self.title,
+            "description": self.description,
+            "category": self.category,
+            "price_cents": self.price_cents,
+            "currency": self.currency,
+            "images": list(self.images),
+            "image_variants": list(self.image_variants),
+        }
+
+
+class _ReplicaSnapshot(NamedTuple):
+    products: dict[int, _ReplicaProduct]
+    sellers: dict[int, tuple[Optional[str], Optional[str]]]
+    # sort name -> product ids in that order, and the matching ascending keys for bisect
+    orders: dict[str, list[int]]
+    keys: dict[str, list[tuple[int, int]]]
+
+
+def _replica_sort_key(p: _ReplicaProduct, sort: str) -> tuple[int, int]:
+    if sort == "recent":
+        return (-_micros(p.created_at), -p.id)
+    if sort == "price_desc":
+        return (-p.price_cents, -p.id)
+    return (p.price_cents, p.id)
+
+
+def _replica_cursor_key(after: list, sort: str) -> tuple[int, int]:
+    try:
+        if sort == "recent":
+            return (-_micros(datetime.fromisoformat(after[0])), -int(after[1]))
+        if sort == "price_desc":
+            return (-int(after[0]), -int(after[1]))
+        return (int(after[0]), int(after[1]))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def _build_replica_snapshot(
+    products: dict[int, _ReplicaProduct], sellers: dict[int, tuple[Optional[str], Optional[str]]]
+) -> _ReplicaSnapshot:
+    orders: dict[str, list[int]] = {}
+    keys: dict[str, list[tuple[int, int]]] = {}
+    for sort in _PRODUCT_SORTS:
+        keyed = sorted((_replica_sort_key(p, sort), pid) for pid, p in products.items())
+        keys[sort] = [k for k, _ in keyed]
+        orders[sort] = [pid for _, pid in keyed]
+    return _ReplicaSnapshot(products, sellers, orders, keys)
+
+
+class CatalogReplica:
+    """
+    Read-through copy of the active catalog for one worker process.
+
+    A background thread holds a dedicated LISTEN connection, loads the full catalog, then applies
+    per-product / per-seller deltas as notifications arrive (polled every 0.5s, batched). Readers
+    use the current immutable snapshot; every change builds and swaps in a new one. A periodic
+    full resync covers anything a dropped listener connection may have missed.
+    """
+
+    def __init__(self, db_engine_getter) -> None:
+        self._engine_getter = db_engine_getter
+        self._snapshot: Optional[_ReplicaSnapshot] = None
+        self.index = CatalogSearchIndex()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._synced_at: Optional[float] = None  # monotonic time the replica last matched the DB
+        self._loaded_at: Optional[float] = None
+        self.notifications = 0
+        self.deltas = 0
+        self.reloads = 0
+        self.errors = 0
+
+    # -- lifecycle ------------------------------------------------------------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hweibo-catalog-replica", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def staleness_seconds(self) -> Optional[float]:
+        if self._synced_at is None:
+            return None
+        return max(0.0, time.monotonic() - self._synced_at)
+
+    def fresh(self) -> bool:
+        staleness = self.staleness_seconds()
+        return (
+            HWEIBO_CATALOG_REPLICA
+            and self._snapshot is not None
+            and staleness is not None
+            and staleness <= HWEIBO_CATALOG_REPLICA_MAX_STALENESS_SECONDS
         )
 
-    # real mode
-    if engine is None:
-        raise HTTPException(status_code=500, detail="Database is not configured for real mode (missing DATABASE_URL).")
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        staleness = self.staleness_seconds()
+        return {
+            "running": self._thread is not None,
+            "fresh": self.fresh(),
+            "products": len(snapshot.products) if snapshot else 0,
+            "sellers": len(snapshot.sellers) if snapshot else 0,
+            "staleness_seconds": round(staleness, 3) if staleness is not None else None,
+            "notifications": self.notifications,
+            "deltas": self.deltas,
+            "reloads": self.reloads,
+            "errors": self.errors,
+        }
+
+    # -- loading --------------------------------------------------------------------
+    def _query_products(self, session: Session, ids: Optional[list[int]] = None) -> dict[int, _ReplicaProduct]:
+        stmt = select(
+            Product.id,
+            Product.seller_id,
+            Product.title,
+            Product.description,
+            Product.category,
+            Product.price_cents,
+            Product.currency,
+            Product.created_at,
+        ).where(Product.is_active == True)  # noqa: E712
+        image_stmt = select(ProductImage.product_id, ProductImage.url, ProductImage.variants).order_by(
+            ProductImage.product_id, ProductImage.sort_order, ProductImage.id
+        )
+        if ids is not None:
+            stmt = stmt.where(Product.id.in_(ids))
+            image_stmt = image_stmt.where(ProductImage.product_id.in_(ids))
+        images: dict[int, list[tuple[str, dict]]] = {}
+        for product_id, url, variants in session.exec(image_stmt):
+            images.setdefault(product_id, []).append((url, variants or {}))
+        out: dict[int, _ReplicaProduct] = {}
+        for pid, seller_id, title, description, category, price_cents, currency, created_at in session.exec(stmt):
+            own = images.get(pid, [])
+            out[pid] = _ReplicaProduct(
+                id=int(pid),
+                seller_id=int(seller_id),
+                title=title or "",
+                description=description or "",
+                category=category or "",
+                price_cents=int(price_cents or 0),
+                currency=currency or "USD",
+                created_at=created_at,
+                images=tuple(url for url, _ in own),
+                image_variants=tuple(v for _, v in own),
+            )
+        return out
+
+    def _query_sellers(
+        self, session: Session, user_ids: Optional[list[int]] = None
+    ) -> dict[int, tuple[Optional[str], Optional[str]]]:
+        stmt = select(SellerProfile.user_id, SellerProfile.store_name, SellerProfile.store_city)
+        if user_ids is not None:
+            stmt = stmt.where(SellerProfile.user_id.in_(user_ids))
+        return {user_id: (store_name or None, store_city or None) for user_id, store_name, store_city in session.exec(stmt)}
+
+    def reload(self) -> None:
+        with Session(self._engine_getter()) as session:
+            products = self._query_products(session)
+            sellers = self._query_sellers(session)
+        for pid in set(self._snapshot.products if self._snapshot else ()) - set(products):
+            self.index.remove(pid)
+        self.index.upsert_many([p.as_dict() for p in products.values()])
+        self._snapshot = _build_replica_snapshot(products, sellers)
+        self._loaded_at = time.monotonic()
+        self.reloads += 1
+        logger.info("Catalog replica loaded. products=%d sellers=%d", len(products), len(sellers))
+
+    def apply(self, payloads: list[str]) -> None:
+        """Apply a batch of notification payloads ("product:<id>", "seller:<id>", "reload")."""
+        product_ids: set[int] = set()
+        seller_ids: set[int] = set()
+        full_reload = self._snapshot is None
+        for payload in payloads:
+            kind, _, value = payload.partition(":")
+            if kind == "product" and value.isdigit():
+                product_ids.add(int(value))
+            elif kind == "seller" and value.isdigit():
+                seller_ids.add(int(value))
+            else:  # "reload" (TRUNCATE) or anything unexpected
+                full_reload = True
+        if full_reload or len(product_ids) + len(seller_ids) > _REPLICA_DELTA_LIMIT:
+            self.reload()
+            return
+        with Session(self._engine_getter()) as session:
+            changed = self._query_products(session, sorted(product_ids)) if product_ids else {}
+            seller_rows = self._query_sellers(session, sorted(seller_ids)) if seller_ids else {}
+        snapshot = self._snapshot
+        products = dict(snapshot.products)
+        for pid in product_ids:
+            if pid in changed:
+                products[pid] = changed[pid]
+                self.index.upsert(changed[pid].as_dict())
+            elif products.pop(pid, None) is not None:  # deleted or deactivated
+                self.index.remove(pid)
+        sellers = dict(snapshot.sellers)
+        for user_id in seller_ids:
+            if user_id in seller_rows:
+                sellers[user_id] = seller_rows[user_id]
+            else:
+                sellers.pop(user_id, None)
+        self._snapshot = _build_replica_snapshot(products, sellers)
+        self.deltas += 1
+
+    # -- listener -------------------------------------------------------------------
+    @staticmethod
+    def _drain(dbapi_conn, timeout: float) -> list[str]:
+        """Wait up to `timeout` for notifications on a LISTENing DBAPI connection."""
+        if hasattr(dbapi_conn, "poll") and hasattr(dbapi_conn, "notifies"):  # psycopg2
+            import select as select_module
+
+            if select_module.select([dbapi_conn], [], [], timeout)[0]:
+                dbapi_conn.poll()
+            payloads = [n.payload for n in dbapi_conn.notifies]
+            dbapi_conn.notifies.clear()
+            return payloads
+        # pg8000 only reads notifications while executing, so poll with a no-op query.
+        time.sleep(timeout)
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+        payloads = []
+        while dbapi_conn.notifications:
+            payloads.append(dbapi_conn.notifications.popleft()[2])
+        return payloads
+
+    def _run(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            raw = None
+            try:
+                # Dedicated connection, detached so it does not hold a pool slot for the process lifetime.
+                raw = self._engine_getter().raw_connection()
+                raw.detach()
+                dbapi_conn = raw.driver_connection
+                dbapi_conn.autocommit = True
+                cursor = dbapi_conn.cursor()
+                cursor.execute(f"LISTEN {_CATALOG_CHANNEL}")
+                cursor.close()
+                # Load after LISTEN, so changes committed during the load are still delivered.
+                self.reload()
+                self._synced_at = time.monotonic()
+                backoff = 1.0
+                while not self._stop.is_set():
+                    payloads = self._drain(dbapi_conn, _REPLICA_POLL_SECONDS)
+                    checked_at = time.monotonic()
+                    if payloads:
+                        self.notifications += len(payloads)
+                        self.apply(payloads)
+                    elif (
+                        HWEIBO_CATALOG_REPLICA_RESYNC_SECONDS > 0
+                        and checked_at - (self._loaded_at or 0) > HWEIBO_CATALOG_REPLICA_RESYNC_SECONDS
+                    ):
+                        self.reload()
+                    self._synced_at = checked_at
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Catalog replica listener failed; retrying in %.0fs. error=%r", backoff, e)
+                self._stop.wait(backoff)
+                backoff = min(30.0, backoff * 2)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+    # -- reads ----------------------------------------------------------------------
+    def page(
+        self, limit: int, category: str, sort: str = "recent", cursor: Optional[str] = None
+    ) -> tuple[list[dict], Optional[str]]:
+        """
+        _fetch_products_real without a search term (same category filter, sorts and cursors), from memory.
+
+        Text search stays on Postgres: its english to_tsquery stems and drops stopwords, which the
+        in-memory index does not, so results would change with replica freshness.
+        """
+        snapshot = self._snapshot
+        page_size = min(limit, 100)
+        category_key = category.strip().lower()
+
+        def wanted(p: _ReplicaProduct) -> bool:
+            return not category_key or p.category.lower() == category_key
+
+        keyset = _PRODUCT_SORTS.get(sort)
+        rows: list[_ReplicaProduct] = []
+        if keyset:
+            order = snapshot.orders[sort]
+            start = 0
+            if cursor:
+                start = bisect.bisect_right(snapshot.keys[sort], _replica_cursor_key(_decode_cursor(cursor, sort), sort))
+            for pid in order[start:]:
+                p = snapshot.products[pid]
+                if wanted(p):
+                    rows.append(p)
+                    if len(rows) > page_size:
+                        break
+        else:
+            rows = [snapshot.products[pid] for pid in snapshot.orders["recent"] if wanted(snapshot.products[pid])]
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            if keyset:
+                last = rows[-1]
+                next_cursor = _encode_cursor(sort, _product_sort_key({c: getattr(last, c) for c in keyset[0]}, sort))
+        out = []
+        for p in rows:
+            seller_name, seller_location = snapshot.sellers.get(p.seller_id, (None, None))
+            out.append(_decorate_product(p.as_dict(), seller_name=seller_name, seller_location=seller_location))
+        return out, next_cursor
+
+    def candidates(self, prompt: str) -> list[dict]:
+        """
+        Gemini candidates like _fetch_catalog_candidates, but scored against the whole catalog:
+        best keyword matches first, topped up with the newest products.
+        """
+        snapshot = self._snapshot
+        candidate_limit = max(10, min(HWEIBO_AI_CANDIDATE_LIMIT, 120))
+        vector = [snapshot.products[pid].as_dict() for pid in _vector_candidate_ids(prompt) if pid in snapshot.products]
+        for item in vector:
+            del item["seller_id"]
+        if len(vector) >= HWEIBO_AI_VECTOR_TOP_K:
+            return vector
+        with profiling.phase("rank"):
+            scores = self.index.score(prompt)
+            recency = {pid: i for i, pid in enumerate(snapshot.orders["recent"])}
+            ranked = sorted(
+                (pid for pid in scores if pid in snapshot.products),
+                key=lambda pid: (-scores[pid], recency.get(pid, 0)),
+            )[:candidate_limit]
+            if len(ranked) < candidate_limit:
+                chosen = set(ranked)
+                for pid in snapshot.orders["recent"]:
+                    if len(ranked) >= candidate_limit:
+                        break
+                    if pid not in chosen:
+                        ranked.append(pid)
+        out = []
+        for pid in ranked:
+            item = snapshot.products[pid].as_dict()
+            del item["seller_id"]
+            out.append(item)
+        return _top_up_candidates(vector, out, HWEIBO_AI_VECTOR_TOP_K) if vector else out
+
+
+_CATALOG_REPLICA = CatalogReplica(lambda: engine)
+_METRICS.gauge(
+    "hweibo_catalog_replica_staleness_seconds",
+    "Seconds since the in-memory catalog replica last confirmed it matches the database.",
+    collect=lambda: {(): _CATALOG_REPLICA.staleness_seconds()} if _CATALOG_REPLICA.staleness_seconds() is not None else {},
+)
+_METRICS.gauge(
+    "hweibo_catalog_replica_products",
+    "Active products held by the in-memory catalog replica.",
+    collect=lambda: {(): _CATALOG_REPLICA.stats()["products"]} if HWEIBO_CATALOG_REPLICA else {},
+)
+_METRICS.counter(
+    "hweibo_catalog_replica_events_total",
+    "Catalog replica notifications received, delta batches applied, full reloads and listener errors.",
+    ("event",),
+    collect=lambda: {(k,): v for k, v in _CATALOG_REPLICA.stats().items() if k in ("notifications", "deltas", "reloads", "errors")}
+    if HWEIBO_CATALOG_REPLICA
+    else {},
+)
+
+
+# Recompute rollups for every UTC day from :start_day on. GROUPING SETS yields both the
+# per-product rows and the seller-wide row (product_id=0) in one pass over order/orderitem.
+_ROLLUP_REBUILD_SQL = """
+INSERT INTO sellerdailysales (seller_id, product_id, day, sales_cents, units, orders)
+SELECT
+  p.seller_id,
+  COALESCE(oi.product_id, 0),
+  (o.created_at AT TIME ZONE 'UTC')::date AS day,
+  SUM(oi.quantity::bigint * oi.unit_price_cents),
+  SUM(oi.quantity),
+  COUNT(DISTINCT o.id)
+FROM orderitem oi
+JOIN "order" o ON o.id = oi.order_id
+JOIN product p ON p.id = oi.product_id
+WHERE o.status <> 'cancelled' AND o.created_at >= :start_ts
+GROUP BY GROUPING SETS ((p.seller_id, oi.product_id, day), (p.seller_id, day))
+"""
+_ROLLUP_STATE_NAME = "seller_daily_sales"
+_ROLLUP_LOCK_KEY = 0x48574253  # pg advisory lock id, so only one worker rebuilds at a time
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLModel-created tables store naive UTC timestamps; schema.sql uses TIMESTAMPTZ.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def _refresh_sales_rollups(session: Session) -> bool:
+    """
+    Fold new order items into sellerdailysales.
+
+    Only days touched by order items newer than the stored watermark (plus the trailing
+    HWEIBO_ROLLUP_LOOKBACK_DAYS) are rebuilt, so the cost follows recent order volume rather
+    than a seller's whole history. Every HWEIBO_ROLLUP_RECONCILE_HOURS (and on the first run)
+    all days are rebuilt instead, which picks up status changes on older orders.
+    Returns False if another worker holds the refresh lock.
+    """
+    got_lock = session.exec(text("SELECT pg_try_advisory_xact_lock(:key)"), params={"key": _ROLLUP_LOCK_KEY}).scalar()
+    if not got_lock:
+        session.rollback()
+        return False
+
+    state = session.get(RollupState, _ROLLUP_STATE_NAME) or RollupState(name=_ROLLUP_STATE_NAME)
+    now = datetime.now(timezone.utc)
+    start_day = now.date() - timedelta(days=max(0, HWEIBO_ROLLUP_LOOKBACK_DAYS))
+    max_item_id = session.exec(select(func.max(OrderItem.id))).one() or 0
+    full = state.full_refreshed_at is None or now - _as_utc(state.full_refreshed_at) >= timedelta(
+        hours=HWEIBO_ROLLUP_RECONCILE_HOURS
+    )
+    if full:
+        start_day = date(1970, 1, 1)
+        state.full_refreshed_at = now
+    elif max_item_id > state.last_orderitem_id:
+        oldest_new = session.exec(
+            select(func.min(Order.created_at))
+            .select_from(OrderItem)
+            .join(Order, Order.id == OrderItem.order_id)
+            .where(OrderItem.id > state.last_orderitem_id)
+        ).one()
+        if oldest_new is not None:
+            start_day = min(start_day, _as_utc(oldest_new).date())
+
+    start_ts = datetime(start_day.year, start_day.month, start_day.day, tzinfo=timezone.utc)
+    session.exec(text("DELETE FROM sellerdailysales WHERE day >= :start_day"), params={"start_day": start_day})
+    session.exec(text(_ROLLUP_REBUILD_SQL), params={"start_ts": start_ts})
+    state.last_orderitem_id = int(max_item_id)
+    state.refreshed_at = now
+    session.add(state)
+    session.commit()
+    return True
+
+
+class SalesRollupRefresher:
+    """Background thread that runs _refresh_sales_rollups every `interval_seconds`, off the request path."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="hweibo-sales-rollups", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def refresh_once(self) -> bool:
+        try:
+            with Session(engine) as session:
+                return _refresh_sales_rollups(session)
+        except Exception as e:
+            logger.warning("Seller sales rollup refresh failed; the dashboard keeps the existing rollups. error=%r", e)
+            return False
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh_once()
+            self._stop.wait(self.interval_seconds)
+
+
+_SALES_ROLLUPS = SalesRollupRefresher(HWEIBO_ROLLUP_REFRESH_SECONDS)
+
+
+_ORDER_STATUS_LABELS = {
+    OrderStatus.pending: "Pending",
+    OrderStatus.paid: "Processing",
+    OrderStatus.shipped: "Processing",
+    OrderStatus.completed: "Completed",
+    OrderStatus.cancelled: "Cancelled",
+}
+
+
+def _seller_dashboard_real(seller_id: int) -> dict:
+    """
+    Seller dashboard from pre-aggregated rollups: a handful of rows regardless of order volume.
+    Read-only; SalesRollupRefresher keeps the rollups current.
+    """
+    from sqlalchemy.orm import selectinload
 
     with Session(engine) as session:
-        candidates = _fetch_catalog_candidates(session, request.prompt)
+        total_sales_cents, total_orders = session.exec(
+            select(func.coalesce(func.sum(SellerDailySales.sales_cents), 0), func.coalesce(func.sum(SellerDailySales.orders), 0))
+            .where(SellerDailySales.seller_id == seller_id)
+            .where(SellerDailySales.product_id == 0)
+        ).one()
+        total_products = session.exec(
+            select(func.count())
+            .select_from(Product)
+            .where(Product.seller_id == seller_id)
+            .where(Product.is_active == True)  # noqa: E712
+        ).one()
+
+        units_sum = func.sum(SellerDailySales.units)
+        top_rows = session.exec(
+            select(SellerDailySales.product_id, units_sum, func.sum(SellerDailySales.sales_cents))
+            .where(SellerDailySales.seller_id == seller_id)
+            .where(SellerDailySales.product_id != 0)
+            .group_by(SellerDailySales.product_id)
+            .order_by(units_sum.desc(), SellerDailySales.product_id)
+            .limit(4)
+        ).all()
+        top_ids = [int(pid) for pid, _, _ in top_rows]
+        products = {
+            p.id: p
+            for p in session.exec(select(Product).where(Product.id.in_(top_ids)).options(selectinload(Product.images))).all()
+        } if top_ids else {}
+
+        recent_rows = session.exec(
+            select(Order.id, Order.status, Order.buyer_id, Product.title, OrderItem.quantity, OrderItem.unit_price_cents)
+            .select_from(OrderItem)
+            .join(Order, Order.id == OrderItem.order_id)
+            .join(Product, Product.id == OrderItem.product_id)
+            .where(Product.seller_id == seller_id)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(4)
+        ).all()
+        buyer_ids = sorted({int(r[2]) for r in recent_rows})
+        buyer_names = dict(
+            session.exec(
+                select(BuyerProfile.user_id, BuyerProfile.display_name).where(BuyerProfile.user_id.in_(buyer_ids))
+            ).all()
+        ) if buyer_ids else {}
+        store_name, store_location = _seller_store_map(session, {seller_id}).get(seller_id, (None, None))
+
+    default_store, default_location = _pseudo_store_for_product(0, seller_id)
+    store_name = store_name or default_store
+    store_location = store_location or default_location
+
+    top_products = []
+    for pid, units, revenue in top_rows:
+        p = products.get(pid)
+        if p is None:
+            continue
+        stock_units, _, status = _pseudo_inventory(int(pid))
+        images = sorted(p.images or [], key=lambda img: img.sort_order)
+        top_products.append(
+            {
+                "id": int(pid),
+                "title": p.title,
+                "sales_units": int(units or 0),
+                "revenue_cents": int(revenue or 0),
+                "price_cents": int(p.price_cents or 0),
+                "status": status if p.is_active else "Inactive",
+                "stock_units": stock_units,
+                "image": images[0].url if images else "/product_images/canon_camera.jpg",
+            }
+        )
+
+    total_orders = int(total_orders or 0)
+    total_products = int(total_products or 0)
+    return {
+        "stats": {
+            "total_sales_cents": int(total_sales_cents or 0),
+            "total_orders": total_orders,
+            "total_products": total_products,
+            "conversion_rate": round(min(9.9, max(1.8, (total_orders / max(300, total_products * 80)) * 100)), 1),
+        },
+        "recent_orders": [
+            {
+                "id": f"HW-{order_id}",
+                "customer_name": buyer_names.get(buyer_id) or f"Customer #{buyer_id}",
+                "product_title": title,
+                "amount_cents": int(quantity or 0) * int(unit_price_cents or 0),
+                "status": _ORDER_STATUS_LABELS.get(OrderStatus(status), "Pending"),
+                "store_name": store_name,
+                "store_location": store_location,
+            }
+            for order_id, status, buyer_id, title, quantity, unit_price_cents in recent_rows
+        ],
+        "top_products": top_products,
+        "feeder_lines": [
+            "Live feed: totals come from daily sales rollups of all non-cancelled orders.",
+            "Live feed: top products are ranked by units sold.",
+        ],
+    }
+
 
+def _list_products_page(
+    limit: int,
+    q: str = "",
+    category: str = "",
+    include_metrics: bool = True,
+    sort: str = "recent",
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    if HWEIBO_PROFILE == ProfileMode.prototype or engine is None:
+        raw = _prototype_filter_products(_prototype_catalog(), q=q, category=category)
+        if sort == "relevance" and q.strip():
+            raw = _rank_candidates(q, raw)
+        raw, next_cursor = _prototype_products_page(raw, sort, cursor, limit)
+        if include_metrics:
+            return [_decorate_product(item) for item in raw], next_cursor
+        return [{**item, "image_variants": _image_variants(item)} for item in raw], next_cursor
+
+    if _CATALOG_REPLICA.fresh() and not q.strip():
+        rows, next_cursor = _CATALOG_REPLICA.page(limit=limit, category=category, sort=sort, cursor=cursor)
+    else:
+        rows, next_cursor = _fetch_products_real(limit=limit, q=q, category=category, sort=sort, cursor=cursor)
+    if include_metrics:
+        return rows, next_cursor
+    return [
+        {
+            "id": p["id"],
+            "title": p["title"],
+            "description": p["description"],
+            "category": p["category"],
+            "price_cents": p["price_cents"],
+            "currency": p["currency"],
+            "images": p["images"],
+            "image_variants": p["image_variants"],
+        }
+        for p in rows
+    ], next_cursor
+
+
+def _prototype_prompt_response(prompt: str) -> PromptResponse:
+    ranked = _rank_candidates(prompt, _prototype_catalog())
+    top5 = ranked[:5]
+    response = PromptResponse(
+        prompt=prompt,
+        products=[
+            RankedProduct(**p, image_variants=_image_variants(p), rank=i + 1)  # type: ignore[arg-type]
+            for i, p in enumerate(top5)
+        ],
+        mode=HWEIBO_PROFILE,
+        model=None,
+        fallback_used=True,
+    )
+    _AI_PROMPT_RESPONSES.inc(fallback_used="true")
+    return response
+
+
+def _ranked_product(c: dict, rank: int) -> RankedProduct:
+    return RankedProduct(
+        id=c["id"],
+        title=c.get("title", ""),
+        description=c.get("description", ""),
+        category=c.get("category", ""),
+        price_cents=int(c.get("price_cents", 0)),
+        currency=c.get("currency", "USD"),
+        images=list(c.get("images", []) or []),
+        image_variants=_image_variants(c),
+        rank=rank,
+    )
+
+
+def _keyword_prompt_response(prompt: str, candidates: list[dict]) -> PromptResponse:
+    """The keyword-order top 5: exactly what _rank_prompt falls back to."""
+    return PromptResponse(
+        prompt=prompt,
+        products=[_ranked_product(c, i + 1) for i, c in enumerate(candidates[:5])],
+        mode=HWEIBO_PROFILE,
+        model=GEMINI_MODEL,
+        fallback_used=True,
+    )
+
+
+async def _rank_prompt(prompt: str, candidates: list[dict]) -> PromptResponse:
+    """Gemini ranking of `candidates` for one prompt, with the keyword-order fallback on any failure."""
     fallback_ids = [c["id"] for c in candidates][:5]
     used_fallback = False
+    # With the breaker on, it enforces the deadline itself so a miss is recorded as a failure
+    # (an outer wait_for would cancel the call first, and cancelled calls are not outcomes).
+    # Cache waiters are bounded by the flight they join, which started no later than they did.
+    deadline = None if HWEIBO_AI_BREAKER or HWEIBO_AI_DEADLINE_SECONDS <= 0 else HWEIBO_AI_DEADLINE_SECONDS
     try:
-        ranked_ids = _gemini_rank_product_ids(request.prompt, candidates)
+        with profiling.phase("ai"):
+            ranked_ids = await asyncio.wait_for(_gemini_rank_cached(prompt, candidates), timeout=deadline)
         # Hard filter: Gemini must select from the candidates list only.
         candidate_ids = {c["id"] for c in candidates}
         ranked_ids = [pid for pid in ranked_ids if pid in candidate_ids]
@@ -914,30 +3619,32 @@ def ai_prompt(request: PromptRequest, _: None = Depends(_require_ai_api_key)) ->
         if len(ranked_ids) != 5:
             used_fallback = True
             ranked_ids = _ensure_five_unique([], fallback_ids)
+        _AI_RANKING_OUTCOMES.inc(outcome="invalid_ids" if used_fallback else "success")
+    except CircuitBreakerOpen:
+        # Provider is degraded: answer in keyword order without waiting on the model.
+        _AI_RANKING_OUTCOMES.inc(outcome="circuit_open")
+        used_fallback = True
+        ranked_ids = _ensure_five_unique([], fallback_ids)
+    except asyncio.TimeoutError:
+        logger.warning("Gemini ranking exceeded %.2fs deadline; using keyword fallback.", HWEIBO_AI_DEADLINE_SECONDS)
+        _AI_RANKING_OUTCOMES.inc(outcome="timeout")
+        used_fallback = True
+        ranked_ids = _ensure_five_unique([], fallback_ids)
     except Exception as e:  # pragma: no cover
         logger.warning("Gemini ranking failed; using keyword fallback. error=%r", e)
+        _AI_RANKING_OUTCOMES.inc(outcome="exception")
         used_fallback = True
         ranked_ids = _ensure_five_unique([], fallback_ids)
 
     # Map IDs back to full product payloads (including images), preserving rank order.
+    serialize_started = time.perf_counter()
     by_id = {c["id"]: c for c in candidates}
     ranked_products: list[RankedProduct] = []
     for i, pid in enumerate(ranked_ids):
         c = by_id.get(pid)
         if not c:
             continue
-        ranked_products.append(
-            RankedProduct(
-                id=c["id"],
-                title=c.get("title", ""),
-                description=c.get("description", ""),
-                category=c.get("category", ""),
-                price_cents=int(c.get("price_cents", 0)),
-                currency=c.get("currency", "USD"),
-                images=list(c.get("images", []) or []),
-                rank=i + 1,
-            )
-        )
+        ranked_products.append(_ranked_product(c, i + 1))
     if len(ranked_products) != 5:
         # Last-resort: fill from candidate list (still deterministic and catalog-bound).
         used_fallback = True
@@ -946,57 +3653,193 @@ def ai_prompt(request: PromptRequest, _: None = Depends(_require_ai_api_key)) ->
                 break
             if any(p.id == c["id"] for p in ranked_products):
                 continue
-            ranked_products.append(
-                RankedProduct(
-                    id=c["id"],
-                    title=c.get("title", ""),
-                    description=c.get("description", ""),
-                    category=c.get("category", ""),
-                    price_cents=int(c.get("price_cents", 0)),
-                    currency=c.get("currency", "USD"),
-                    images=list(c.get("images", []) or []),
-                    rank=len(ranked_products) + 1,
-                )
-            )
+            ranked_products.append(_ranked_product(c, len(ranked_products) + 1))
 
-    return PromptResponse(
-        prompt=request.prompt,
+    _AI_PROMPT_RESPONSES.inc(fallback_used=str(used_fallback).lower())
+    response = PromptResponse(
+        prompt=prompt,
         products=ranked_products[:5],
         mode=HWEIBO_PROFILE,
         model=GEMINI_MODEL,
         fallback_used=used_fallback,
     )
+    profiling.add_phase("serialize", time.perf_counter() - serialize_started)
+    return response
+
+
+@app.post("/ai/prompts", response_model=PromptResponse)
+async def ai_prompt(
+    request: PromptRequest,
+    seller_token: Optional[str] = Header(default=None, alias="X-Hweibo-Seller-Token"),
+    _: None = Depends(_require_ai_api_key),
+) -> PromptResponse:
+    """
+    Prompt-based search.
+    SRS alignment:
+    - returns exactly 5 ranked products
+    - results come from the platform catalog (not hallucinated names)
+    - graceful fallback if Gemini fails or misses HWEIBO_AI_DEADLINE_SECONDS
+    - protected in real mode to reduce unauthenticated usage
+    - admitted through the AI bulkhead in real mode (429/503 + Retry-After when saturated)
+    """
+    if HWEIBO_PROFILE == ProfileMode.prototype:
+        return _prototype_prompt_response(request.prompt)
+
+    # real mode
+    if engine is None:
+        raise HTTPException(status_code=500, detail="Database is not configured for real mode (missing DATABASE_URL).")
+
+    release = await _admit_ai_request(_verified_seller_id(seller_token))
+    try:
+        # DB work stays synchronous; run it off the event loop.
+        candidates = await _run_ai_io(_load_catalog_candidates, request.prompt)
+        return await _rank_prompt(request.prompt, candidates)
+    finally:
+        release()
+
+
+def _sse_event(event: str, data: str) -> bytes:
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+@app.post("/ai/prompts/stream")
+async def ai_prompt_stream(
+    request: PromptRequest,
+    seller_token: Optional[str] = Header(default=None, alias="X-Hweibo-Seller-Token"),
+    _: None = Depends(_require_ai_api_key),
+) -> StreamingResponse:
+    """
+    /ai/prompts as Server-Sent Events, so the chat UI can render before Gemini answers.
+
+    event: keyword        the keyword top 5 as a PromptResponse (fallback_used=true), sent immediately
+    event: ranked         the Gemini ranking as a PromptResponse (fallback_used=false), replacing it
+    event: kept_fallback  Gemini failed, timed out or returned unusable ids; the keyword list stands
+    """
+    prompt = request.prompt
+    candidates: list[dict] = []
+    release: Callable[[], None] = lambda: None
+    if HWEIBO_PROFILE == ProfileMode.prototype:
+        keyword = _prototype_prompt_response(prompt)
+    else:
+        if engine is None:
+            raise HTTPException(status_code=500, detail="Database is not configured for real mode (missing DATABASE_URL).")
+        release = await _admit_ai_request(_verified_seller_id(seller_token))
+        try:
+            candidates = await _run_ai_io(_load_catalog_candidates, prompt)
+        except BaseException:
+            release()
+            raise
+        keyword = _keyword_prompt_response(prompt, candidates)
+
+    async def events():
+        yield _sse_event("keyword", keyword.model_dump_json())
+        final = await _rank_prompt(prompt, candidates) if candidates else None
+        if final is None or final.fallback_used:
+            yield _sse_event("kept_fallback", json.dumps({"prompt": prompt, "fallback_used": True}))
+        else:
+            yield _sse_event("ranked", final.model_dump_json())
+
+    return _SlotStreamingResponse(
+        events(),
+        release=release,
+        media_type="text/event-stream",
+        # no-transform/X-Accel-Buffering: keep proxies (and nginx) from holding the first event back.
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/ai/prompts:batch", response_model=list[PromptBatchItem])
+async def ai_prompt_batch(
+    request: PromptBatchRequest,
+    response_format: str = Query(default="json", alias="format", pattern="^(json|ndjson)$"),
+    accept: Optional[str] = Header(default=None),
+    seller_token: Optional[str] = Header(default=None, alias="X-Hweibo-Seller-Token"),
+    _: None = Depends(_require_ai_api_key),
+):
+    """
+    Rank many prompts in one call (WhatsApp bot fan-out, merchandising jobs).
+
+    Candidates for all prompts come from one shared catalog read; Gemini calls then run at most
+    HWEIBO_AI_BATCH_CONCURRENCY at a time across every batch in the worker. Each item carries its own status: `ok` (Gemini ranking),
+    `fallback` (keyword order) or `error`. `?format=ndjson` (or Accept: application/x-ndjson)
+    streams one JSON line per prompt as soon as it finishes. A batch takes one AI bulkhead slot.
+    """
+    prompts = request.prompts
+    prototype = HWEIBO_PROFILE == ProfileMode.prototype
+    candidate_lists: list[list[dict]] = []
+    release: Callable[[], None] = lambda: None
+    if not prototype:
+        if engine is None:
+            raise HTTPException(status_code=500, detail="Database is not configured for real mode (missing DATABASE_URL).")
+        release = await _admit_ai_request(_verified_seller_id(seller_token))
+        try:
+            candidate_lists = await _run_ai_io(_load_catalog_candidates_many, prompts)
+        except BaseException:
+            release()
+            raise
+
+    semaphore = _ai_batch_limiter()
+
+    async def rank_one(index: int) -> PromptBatchItem:
+        prompt = prompts[index]
+        try:
+            async with semaphore:
+                response = (
+                    _prototype_prompt_response(prompt) if prototype else await _rank_prompt(prompt, candidate_lists[index])
+                )
+        except Exception as e:
+            logger.warning("Batch prompt failed. index=%d error=%r", index, e)
+            return PromptBatchItem(
+                index=index,
+                status="error",
+                error=type(e).__name__,
+                prompt=prompt,
+                products=[],
+                mode=HWEIBO_PROFILE,
+                model=None if prototype else GEMINI_MODEL,
+                fallback_used=True,
+            )
+        return PromptBatchItem(**dict(response), index=index, status="fallback" if response.fallback_used else "ok")
+
+    if response_format == "ndjson" or "application/x-ndjson" in (accept or ""):
+
+        async def lines():
+            tasks = [asyncio.ensure_future(rank_one(i)) for i in range(len(prompts))]
+            try:
+                for finished in asyncio.as_completed(tasks):
+                    yield (await finished).model_dump_json() + "\n"
+            finally:
+                # Client went away mid-stream: stop the remaining Gemini calls.
+                for task in tasks:
+                    task.cancel()
+
+        return _SlotStreamingResponse(lines(), release=release, media_type="application/x-ndjson")
+
+    try:
+        return await asyncio.gather(*(rank_one(i) for i in range(len(prompts))))
+    finally:
+        release()
 
 
 @app.get("/products")
 def list_products(
+    response: Response,
     limit: int = Query(default=25, ge=1, le=100),
     q: str = Query(default=""),
     category: str = Query(default=""),
     include_metrics: bool = Query(default=True),
+    sort: str = Query(default="recent", pattern=_PRODUCT_SORT_PATTERN),
+    cursor: Optional[str] = Query(default=None),
 ) -> list[dict]:
     # Main catalog endpoint for buyer browse/search and lightweight seller views.
-    if HWEIBO_PROFILE == ProfileMode.prototype or engine is None:
-        raw = _prototype_filter_products(_prototype_catalog(), q=q, category=category)
-        if include_metrics:
-            return [_decorate_product(item) for item in raw[:limit]]
-        return raw[:limit]
-
-    rows = _fetch_products_real(limit=limit, q=q, category=category)
-    if include_metrics:
-        return rows
-    return [
-        {
-            "id": p["id"],
-            "title": p["title"],
-            "description": p["description"],
-            "category": p["category"],
-            "price_cents": p["price_cents"],
-            "currency": p["currency"],
-            "images": p["images"],
-        }
-        for p in rows
-    ]
+    # The body stays a plain list for existing clients; the next page cursor travels in X-Next-Cursor.
+    rows, next_cursor = _list_products_page(
+        limit=limit, q=q, category=category, include_metrics=include_metrics, sort=sort, cursor=cursor
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # A returned Response does not pick up headers set on `response`, so pass them along.
+    return _catalog_response(rows, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
 
 
 @app.get("/seller/products")
@@ -1004,27 +3847,40 @@ def seller_products(
     limit: int = Query(default=50, ge=1, le=100),
     q: str = Query(default=""),
     category: str = Query(default=""),
+    sort: str = Query(default="recent", pattern=_PRODUCT_SORT_PATTERN),
+    cursor: Optional[str] = Query(default=None),
 ) -> dict:
-    products = list_products(limit=limit, q=q, category=category, include_metrics=True)
-    return {
-        "products": products,
-        "feeder_lines": [
-            "Starter feed: search and filter sync with live product catalog.",
-            "Starter feed: product status is derived from stock thresholds.",
-        ],
-    }
+    products, next_cursor = _list_products_page(limit=limit, q=q, category=category, sort=sort, cursor=cursor)
+    return _catalog_response(
+        {
+            "products": products,
+            "next_cursor": next_cursor,
+            "feeder_lines": [
+                "Starter feed: search and filter sync with live product catalog.",
+                "Starter feed: product status is derived from stock thresholds.",
+            ],
+        }
+    )
 
 
 @app.get("/seller/dashboard")
-def seller_dashboard(limit: int = Query(default=50, ge=1, le=100)) -> dict:
-    products = list_products(limit=limit, q="", category="", include_metrics=True)
-    return _build_seller_dashboard_payload(products)
+def seller_dashboard(
+    limit: int = Query(default=50, ge=1, le=100),
+    seller_token: Optional[str] = Header(default=None, alias="X-Hweibo-Seller-Token"),
+) -> dict:
+    # Real mode with a verified seller (server-signed token, never a client-chosen id): that seller's
+    # orders and buyers. Otherwise keep the starter (catalog-derived) view.
+    seller_id = _verified_seller_id(seller_token)
+    if HWEIBO_PROFILE == ProfileMode.real and engine is not None and seller_id is not None:
+        return _catalog_response(_seller_dashboard_real(seller_id))
+    products, _ = _list_products_page(limit=limit)
+    return _catalog_response(_build_seller_dashboard_payload(products))
 
 
 @app.get("/buyer/orders")
 def buyer_orders(limit: int = Query(default=8, ge=1, le=20)) -> dict:
-    products = list_products(limit=max(8, limit), q="", category="", include_metrics=True)
-    return _build_buyer_orders_payload(products, limit=limit)
+    products, _ = _list_products_page(limit=max(8, limit))
+    return _catalog_response(_build_buyer_orders_payload(products, limit=limit))
 
 
 if __name__ == "__main__":
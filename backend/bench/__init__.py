@@ -0,0 +1 @@
+"""Benchmarks for the Hweibo API. Run from backend/, e.g. `python -m bench.encode`."""
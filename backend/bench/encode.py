@@ -0,0 +1,134 @@
+"""
+Encode-time and wire-size benchmark for the catalog/dashboard response paths.
+
+Compares, per endpoint payload:
+  before: FastAPI's default path (response_model validation + jsonable_encoder + stdlib json)
+  after:  CatalogJSONResponse (pre-shaped dicts straight to orjson / compact json)
+and reports body bytes raw, gzip and brotli (when installed), plus compression time.
+`wire_bytes` is what a browser downloads: raw before, the negotiated encoding after.
+
+Usage (from backend/):
+  python -m bench.encode                 # JSON report on stdout
+  BENCH_ITEMS=100 BENCH_REPEAT=200 python -m bench.encode
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("HWEIBO_PROFILE", "prototype")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import APIRoute, serialize_response  # noqa: E402
+
+import app as hweibo_app  # noqa: E402
+
+
+def _catalog(items: int) -> list[dict]:
+    """`items` decorated products shaped like a real /products page (long descriptions included)."""
+    base = hweibo_app._prototype_catalog()
+    vocab = sorted({w for p in base for w in f"{p['title']} {p['description']}".split()})
+    rng = random.Random(42)  # fixed seed: identical payloads across runs
+    out = []
+    for i in range(items):
+        p = dict(base[i % len(base)])
+        p["id"] = i + 1
+        p["title"] = f"{p['title']} #{i + 1}"
+        p["description"] = " ".join(rng.choice(vocab) for _ in range(60))
+        p["price_cents"] = rng.randrange(500, 250_000)
+        out.append(hweibo_app._decorate_product(p))
+    return out
+
+
+def _payloads(items: int) -> dict[str, object]:
+    products = _catalog(items)
+    return {
+        "/products": products,
+        "/seller/products": {"products": products, "next_cursor": None, "feeder_lines": ["Starter feed."]},
+        "/seller/dashboard": hweibo_app._build_seller_dashboard_payload(products[:50]),
+        "/buyer/orders": hweibo_app._build_buyer_orders_payload(products[:8], limit=8),
+    }
+
+
+def _route_field(path: str):
+    for route in hweibo_app.app.routes:
+        if isinstance(route, APIRoute) and route.path == path:
+            return route.response_field
+    return None
+
+
+def _timed(fn, repeat: int) -> tuple[float, object]:
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000, result
+
+
+def _wire(body: bytes, repeat: int) -> dict:
+    gzip_ms, gz = _timed(lambda: gzip.compress(body, compresslevel=hweibo_app._GZIP_LEVEL, mtime=0), repeat)
+    out = {"raw_bytes": len(body), "gzip_bytes": len(gz), "gzip_ms": round(gzip_ms, 3)}
+    if hweibo_app.brotli is not None:
+        br_ms, br = _timed(lambda: hweibo_app.brotli.compress(body, quality=hweibo_app._BROTLI_QUALITY), repeat)
+        out.update({"br_bytes": len(br), "br_ms": round(br_ms, 3)})
+    return out
+
+
+def run(items: int, repeat: int) -> dict:
+    loop = asyncio.new_event_loop()
+    report: dict = {
+        "items": items,
+        "repeat": repeat,
+        "encoder": "orjson" if hweibo_app.orjson is not None else "json",
+        "brotli": hweibo_app.brotli is not None,
+        "endpoints": {},
+    }
+    try:
+        for path, payload in _payloads(items).items():
+            field = _route_field(path)
+
+            def before() -> bytes:
+                content = loop.run_until_complete(serialize_response(field=field, response_content=payload))
+                return JSONResponse(content).body
+
+            def after() -> bytes:
+                return hweibo_app.CatalogJSONResponse(payload).body
+
+            before_ms, before_body = _timed(before, repeat)
+            after_ms, after_body = _timed(after, repeat)
+            assert json.loads(before_body) == json.loads(after_body), f"{path}: encoders disagree"
+            after_wire = _wire(after_body, max(1, repeat // 10))
+            compressed = len(after_body) >= hweibo_app.HWEIBO_COMPRESS_MIN_BYTES > 0
+            report["endpoints"][path] = {
+                "before": {
+                    "encode_ms": round(before_ms, 3),
+                    "wire_bytes": len(before_body),
+                    **_wire(before_body, max(1, repeat // 10)),
+                },
+                "after": {
+                    "encode_ms": round(after_ms, 3),
+                    "wire_bytes": after_wire.get("br_bytes", after_wire["gzip_bytes"]) if compressed else len(after_body),
+                    **after_wire,
+                },
+                "encode_speedup": round(before_ms / after_ms, 1) if after_ms else None,
+            }
+    finally:
+        loop.close()
+    return report
+
+
+def main() -> None:
+    items = int(os.getenv("BENCH_ITEMS", "100"))
+    repeat = int(os.getenv("BENCH_REPEAT", "100"))
+    print(json.dumps(run(items, repeat), indent=2))
+
+
+if __name__ == "__main__":
+    main()
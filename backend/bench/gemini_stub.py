@@ -0,0 +1,92 @@
+"""
+Local stand-in for the `google.genai` SDK used by app.py.
+
+Only the surface the app touches is provided: `Client(api_key=...).aio.models.generate_content`
+and the `types` constructors. Each call sleeps for a configurable latency (plus jitter), fails
+with a configurable probability, and otherwise answers with 5 ids taken from the candidates in
+the request (table or JSON payload), so responses pass the app's catalog-bound checks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+
+class StubGeminiError(RuntimeError):
+    pass
+
+
+@dataclass
+class StubStats:
+    calls: int = 0
+    errors: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_dict(self) -> dict:
+        return {"calls": self.calls, "injected_errors": self.errors}
+
+
+class _Types:
+    """genai.types: every constructor just keeps its keyword arguments."""
+
+    def __getattr__(self, name: str):
+        return lambda *args, **kwargs: SimpleNamespace(**kwargs)
+
+
+def _candidate_ids(text: str) -> list[int]:
+    """Candidate ids from the app's user message (pipe table by default, JSON when configured)."""
+    try:
+        return [c["id"] for c in json.loads(text).get("candidates", [])]
+    except ValueError:
+        # user_prompt line, column header line, then one "id|title|..." row per candidate
+        return [int(line.split("|", 1)[0]) for line in text.splitlines()[2:] if line.split("|", 1)[0].isdigit()]
+
+
+class _Models:
+    def __init__(self, latency_ms: float, jitter_ms: float, error_rate: float, rng: random.Random, stats: StubStats):
+        self._latency_ms = latency_ms
+        self._jitter_ms = jitter_ms
+        self._error_rate = error_rate
+        self._rng = rng
+        self._stats = stats
+
+    async def generate_content(self, model: str, contents, config=None):
+        with self._stats._lock:
+            self._stats.calls += 1
+            delay_ms = max(0.0, self._latency_ms + self._rng.uniform(-self._jitter_ms, self._jitter_ms))
+            fail = self._rng.random() < self._error_rate
+            if fail:
+                self._stats.errors += 1
+        await asyncio.sleep(delay_ms / 1000)
+        if fail:
+            raise StubGeminiError("injected stub error")
+        ids = _candidate_ids(contents[0].parts[0].text)
+        # Reverse keyword order so a successful AI answer is distinguishable from the fallback.
+        return SimpleNamespace(text=json.dumps({"product_ids": list(reversed(ids[:5]))}))
+
+
+class StubGenai:
+    """Drop-in for the `genai` module object."""
+
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 50.0, error_rate: float = 0.0, seed: int = 7):
+        self.stats = StubStats()
+        self.types = _Types()
+        self._models = _Models(latency_ms, jitter_ms, error_rate, random.Random(seed), self.stats)
+
+    def Client(self, api_key: str = "", **_kwargs):  # noqa: N802 (mirrors genai.Client)
+        return SimpleNamespace(aio=SimpleNamespace(models=self._models))
+
+
+def install(app_module, latency_ms: float, jitter_ms: float, error_rate: float, seed: int = 7) -> StubGenai:
+    """Point app.py at the stub (call before the first /ai/prompts request)."""
+    stub = StubGenai(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, seed=seed)
+    app_module.genai = stub
+    app_module._gemini_client_instance = None
+    if not app_module.GEMINI_API_KEY:
+        app_module.GEMINI_API_KEY = "bench-stub"
+    return stub
@@ -0,0 +1,320 @@
+"""
+Load benchmark for the Hweibo API with a local Gemini stand-in.
+
+Boots app.py in-process under uvicorn (prototype profile, or real against DATABASE_URL) with
+`genai` replaced by bench.gemini_stub, drives each endpoint with a closed loop of N concurrent
+clients per concurrency level, and prints a JSON report: p50/p95/p99/mean/max latency (ms),
+RPS, errors (and the keyword-fallback rate for /ai/prompts).
+
+Usage (from backend/):
+  python -m bench.load
+  BENCH_PROFILE=real DATABASE_URL='postgresql://...' python -m bench.load
+  BENCH_OUT=bench/baseline.json python -m bench.load          # store a baseline
+  BENCH_BASELINE=bench/baseline.json python -m bench.load     # compare; exit 1 on regression
+
+Optional:
+  export BENCH_ENDPOINTS=ai_prompts,products,products_search,seller_dashboard,buyer_orders
+  export BENCH_CONCURRENCY=1,8,32
+  export BENCH_DURATION=10              # seconds measured per endpoint and level
+  export BENCH_WARMUP=2                 # seconds discarded before each measurement
+  export BENCH_GEMINI_LATENCY_MS=300    # stub latency, +/- BENCH_GEMINI_JITTER_MS (default 50)
+  export BENCH_GEMINI_ERROR_RATE=0.0    # probability that a stub call raises
+  export BENCH_AI_CACHE=0               # 1 keeps the app's prompt cache on (hides Gemini latency)
+  export BENCH_SELLER_ID=12             # real-mode seller for /seller/dashboard rollups (token signed with BENCH_API_KEY)
+  export BENCH_URL=http://localhost:8000  # measure a running server instead (no stub injected)
+  export BENCH_API_KEY=...              # X-Hweibo-Api-Key for /ai/prompts (default HWEIBO_API_KEY)
+  export BENCH_TOLERANCE=0.10           # allowed relative p95/p99/RPS change before flagging
+  export BENCH_MIN_DELTA_MS=2           # latency changes below this are never flagged
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import importlib
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+
+from bench import gemini_stub
+
+_PROMPTS = [
+    "lightweight laptop for university",
+    "running shoes under 100 dollars",
+    "camera for travel vlogging",
+    "gaming laptop with good cooling",
+    "comfortable everyday sneakers",
+    "gift for a photographer",
+    "laptop for video editing",
+    "durable trainers with laces",
+]
+_QUERIES = ["laptop", "shoes", "camera", "pro", "sport"]
+_ALL_ENDPOINTS = ("ai_prompts", "products", "products_search", "seller_dashboard", "buyer_orders")
+
+
+def _env(name: str, default: str) -> str:
+    value = os.getenv(name, "").strip()
+    return value or default
+
+
+def _seller_token(seller_id: str, api_key: str, ttl_seconds: int = 3600) -> str:
+    # Same format the API verifies (app._seller_token): <seller_id>.<expires_unix>.<hmac-sha256>.
+    payload = f"{int(seller_id)}.{int(time.time()) + ttl_seconds}"
+    return f"{payload}.{hmac.new(api_key.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()}"
+
+
+def _scenarios() -> dict[str, Callable[[int], tuple[str, str, Optional[dict]]]]:
+    return {
+        "ai_prompts": lambda n: ("POST", "/ai/prompts", {"prompt": _PROMPTS[n % len(_PROMPTS)]}),
+        "products": lambda n: ("GET", "/products?limit=25", None),
+        "products_search": lambda n: ("GET", f"/products?limit=25&q={_QUERIES[n % len(_QUERIES)]}", None),
+        "seller_dashboard": lambda n: ("GET", "/seller/dashboard", None),
+        "buyer_orders": lambda n: ("GET", "/buyer/orders", None),
+    }
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies_s: list[float], errors: int, fallbacks: int, elapsed_s: float) -> dict:
+    ms = sorted(x * 1000 for x in latencies_s)
+    total = len(ms)
+    out = {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "rps": round(total / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "mean_ms": round(sum(ms) / total, 2) if total else 0.0,
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+    }
+    if fallbacks >= 0:
+        out["fallback_rate"] = round(fallbacks / max(1, total - errors), 4)
+    return out
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    request: Callable[[int], tuple[str, str, Optional[dict]]],
+    concurrency: int,
+    seconds: float,
+    track_fallback: bool,
+) -> dict:
+    latencies: list[float] = []
+    counts = {"errors": 0, "fallbacks": 0}
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n: int) -> None:
+        while time.perf_counter() < deadline:
+            method, path, body = request(n)
+            n += concurrency
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                ok = 200 <= response.status_code < 300
+                if ok and track_fallback and response.json().get("fallback_used"):
+                    counts["fallbacks"] += 1
+            except (httpx.HTTPError, ValueError):
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                counts["errors"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, counts["errors"], counts["fallbacks"] if track_fallback else -1, elapsed)
+
+
+async def run_load(
+    base_url: str,
+    endpoints: list[str],
+    levels: list[int],
+    duration: float,
+    warmup: float,
+    api_key: str,
+    seller_id: Optional[str],
+) -> dict:
+    scenarios = _scenarios()
+    headers = {"X-Hweibo-Api-Key": api_key}
+    if seller_id and api_key:
+        headers["X-Hweibo-Seller-Token"] = _seller_token(seller_id, api_key)
+    results: dict = {}
+    for name in endpoints:
+        results[name] = {}
+        for concurrency in levels:
+            limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+            async with httpx.AsyncClient(
+                base_url=base_url, limits=limits, timeout=60.0, headers=headers
+            ) as client:
+                if warmup > 0:
+                    await _drive(client, scenarios[name], concurrency, warmup, False)
+                stats = await _drive(client, scenarios[name], concurrency, duration, name == "ai_prompts")
+            results[name][str(concurrency)] = stats
+            print(
+                f"{name:>16} c={concurrency:<3} rps={stats['rps']:<9} p50={stats['p50_ms']:<8} "
+                f"p95={stats['p95_ms']:<8} p99={stats['p99_ms']:<8} errors={stats['errors']}",
+                file=sys.stderr,
+            )
+    return results
+
+
+def compare(current: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list[dict]:
+    """Regressions of `current` vs `baseline` results (same endpoint + concurrency level only)."""
+    regressions: list[dict] = []
+    for name, levels in current.get("results", {}).items():
+        for level, now in levels.items():
+            before = baseline.get("results", {}).get(name, {}).get(level)
+            if not before:
+                continue
+            for metric in ("p95_ms", "p99_ms"):
+                delta = now[metric] - before[metric]
+                if delta > min_delta_ms and now[metric] > before[metric] * (1 + tolerance):
+                    regressions.append({"endpoint": name, "concurrency": int(level), "metric": metric,
+                                        "baseline": before[metric], "current": now[metric]})
+            if now["rps"] < before["rps"] * (1 - tolerance):
+                regressions.append({"endpoint": name, "concurrency": int(level), "metric": "rps",
+                                    "baseline": before["rps"], "current": now["rps"]})
+            if now["error_rate"] > before["error_rate"] + 0.01:
+                regressions.append({"endpoint": name, "concurrency": int(level), "metric": "error_rate",
+                                    "baseline": before["error_rate"], "current": now["error_rate"]})
+    return regressions
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _boot_app(profile: str, ai_cache: bool, stub_opts: dict):
+    """Import app.py with the benchmark env, swap in the Gemini stub and serve it on a free port."""
+    os.environ["HWEIBO_PROFILE"] = profile
+    os.environ.setdefault("HWEIBO_API_KEY", "bench-key")
+    if not ai_cache:
+        os.environ["HWEIBO_AI_CACHE_SIZE"] = "0"
+    hweibo_app = importlib.import_module("app")
+    stub = gemini_stub.install(hweibo_app, **stub_opts)
+
+    import uvicorn
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(hweibo_app.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="bench-uvicorn", daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise SystemExit("App failed to start (see log above).")
+        time.sleep(0.05)
+
+    def stop() -> None:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    return f"http://127.0.0.1:{port}", stub, stop
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def main() -> None:
+    profile = _env("BENCH_PROFILE", "prototype")
+    if profile not in {"prototype", "real"}:
+        raise SystemExit(f"Invalid BENCH_PROFILE: {profile} (expected prototype or real)")
+    if profile == "real" and not os.getenv("DATABASE_URL", "").strip():
+        raise SystemExit("BENCH_PROFILE=real needs DATABASE_URL.")
+    endpoints = [e.strip() for e in _env("BENCH_ENDPOINTS", ",".join(_ALL_ENDPOINTS)).split(",") if e.strip()]
+    unknown = sorted(set(endpoints) - set(_ALL_ENDPOINTS))
+    if unknown:
+        raise SystemExit(f"Unknown BENCH_ENDPOINTS: {', '.join(unknown)}")
+    levels = [max(1, int(c)) for c in _env("BENCH_CONCURRENCY", "1,8,32").split(",") if c.strip()]
+    duration = float(_env("BENCH_DURATION", "10"))
+    warmup = float(_env("BENCH_WARMUP", "2"))
+    stub_opts = {
+        "latency_ms": float(_env("BENCH_GEMINI_LATENCY_MS", "300")),
+        "jitter_ms": float(_env("BENCH_GEMINI_JITTER_MS", "50")),
+        "error_rate": float(_env("BENCH_GEMINI_ERROR_RATE", "0")),
+    }
+    ai_cache = _env("BENCH_AI_CACHE", "0").lower() in {"1", "true", "yes", "y"}
+    external_url = _env("BENCH_URL", "")
+
+    stub, stop = None, None
+    if external_url:
+        base_url = external_url.rstrip("/")
+    else:
+        base_url, stub, stop = _boot_app(profile, ai_cache, stub_opts)
+    api_key = _env("BENCH_API_KEY", os.getenv("HWEIBO_API_KEY", "") or "bench-key")
+
+    report: dict = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "profile": None if external_url else profile,
+            "url": external_url or None,
+            "concurrency": levels,
+            "duration_s": duration,
+            "warmup_s": warmup,
+            "ai_cache": ai_cache,
+            "gemini_stub": None if external_url else stub_opts,
+        },
+    }
+    try:
+        report["results"] = asyncio.run(
+            run_load(base_url, endpoints, levels, duration, warmup, api_key, _env("BENCH_SELLER_ID", "") or None)
+        )
+    finally:
+        if stop is not None:
+            stop()
+    if stub is not None:
+        report["gemini_stub_stats"] = stub.stats.as_dict()
+
+    baseline_path = _env("BENCH_BASELINE", "")
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+        report["baseline"] = {"path": baseline_path, "git_commit": baseline.get("meta", {}).get("git_commit")}
+        report["regressions"] = compare(
+            report, baseline, float(_env("BENCH_TOLERANCE", "0.10")), float(_env("BENCH_MIN_DELTA_MS", "2"))
+        )
+
+    text = json.dumps(report, indent=2)
+    out_path = _env("BENCH_OUT", "")
+    if out_path:
+        Path(out_path).write_text(text + "\n", encoding="utf-8")
+    print(text)
+    if report.get("regressions"):
+        for r in report["regressions"]:
+            print(
+                f"REGRESSION {r['endpoint']} c={r['concurrency']} {r['metric']}: {r['baseline']} -> {r['current']}",
+                file=sys.stderr,
+            )
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Dense catalog embeddings for /ai/prompts candidate retrieval.
+
+Every active product's title, category and description are feature-hashed into a fixed-width
+TF-IDF vector (words, word bigrams and character trigrams, signed hashing), L2-normalized and
+stored as float32 rows next to the matching product ids:
+  backend/embeddings/<version>/vectors.npy   (products x dim, memory-mapped at request time)
+  backend/embeddings/<version>/ids.npy       (product ids, same row order)
+  backend/embeddings/<version>/idf.npy       (per-dimension IDF weights)
+  backend/embeddings/current.json            ({"version", "dim", "products", "built_at"})
+current.json is replaced last, so a running API switches to a new build atomically; it checks
+the file's mtime and reloads on its own.
+
+Nothing is downloaded and no network is used: a prompt is hashed the same way at request time and
+scored against the whole catalog with one matrix-vector product, then argpartition for the top k.
+Character trigrams let "laptops" meet "laptop" and survive small typos.
+
+Requires numpy (`pip install numpy`). Without it (or without a build) the API keeps its keyword
+candidate selection.
+
+Usage:
+  export DATABASE_URL='postgresql://...'
+  python catalog_embeddings.py
+
+Optional:
+  export EMBED_DIM=1024        # vector width (default 512)
+  export EMBED_DIR=/data/emb   # output directory (default: backend/embeddings, or HWEIBO_EMBEDDINGS_DIR)
+  export EMBED_KEEP=2          # previous builds to keep next to the current one
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+
+from sqlmodel import Session, select
+
+try:
+    import numpy as np
+except Exception:  # pragma: no cover
+    np = None
+
+
+DEFAULT_DIM = 512
+# Field weights mirror the keyword index: title > category > description.
+FIELD_WEIGHTS = {"title": 2.0, "category": 1.5, "description": 1.0}
+CURRENT_FILE = "current.json"
+# Cosine below this is noise from hash collisions / shared trigrams, not a match.
+MIN_SCORE = 0.05
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def available() -> bool:
+    return np is not None
+
+
+def default_dir() -> Path:
+    configured = os.getenv("EMBED_DIR") or os.getenv("HWEIBO_EMBEDDINGS_DIR")
+    return Path(configured) if configured else Path(__file__).resolve().parent / "embeddings"
+
+
+def _features(text: str) -> Iterable[str]:
+    words = _WORD_RE.findall(text.lower())
+    for i, word in enumerate(words):
+        yield "w:" + word
+        if i:
+            yield "b:" + words[i - 1] + "_" + word
+        padded = f"<{word}>"
+        for j in range(len(padded) - 2):
+            yield "c:" + padded[j : j + 3]
+
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int) -> tuple[int, float]:
+    # crc32 is stable across processes (str hash() is salted per interpreter).
+    h = zlib.crc32(feature.encode("utf-8"))
+    return (h & 0x7FFFFFFF) % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+def _term_vector(fields: dict[str, str], dim: int) -> "np.ndarray":
+    vec = np.zeros(dim, dtype=np.float32)
+    for field, weight in FIELD_WEIGHTS.items():
+        for feature in _features(fields.get(field, "") or ""):
+            index, sign = _bucket(feature, dim)
+            vec[index] += sign * weight
+    # Sublinear term frequency, sign kept (signed hashing cancels collisions on average).
+    return np.sign(vec) * np.log1p(np.abs(vec))
+
+
+def _normalize_rows(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def encode_products(products: list[dict], dim: int = DEFAULT_DIM) -> tuple["np.ndarray", "np.ndarray"]:
+    """(L2-normalized TF-IDF rows, IDF weights) for product dicts with title/category/description."""
+    tf = np.zeros((len(products), dim), dtype=np.float32)
+    for row, product in enumerate(products):
+        tf[row] = _term_vector(product, dim)
+    df = np.count_nonzero(tf, axis=0)
+    idf = (np.log((1.0 + len(products)) / (1.0 + df)) + 1.0).astype(np.float32)
+    return _normalize_rows(tf * idf), idf
+
+
+class EmbeddingIndex:
+    def __init__(self, vectors: "np.ndarray", ids: "np.ndarray", idf: "np.ndarray", meta: dict) -> None:
+        self.vectors = vectors
+        self.ids = ids
+        self.idf = idf
+        self.meta = meta
+        self.dim = int(vectors.shape[1])
+
+    def __len__(self) -> int:
+        return int(self.ids.shape[0])
+
+    @classmethod
+    def load(cls, root: Path) -> Optional["EmbeddingIndex"]:
+        """Open the current build with the vectors memory-mapped; None when there is none."""
+        if np is None:
+            return None
+        try:
+            meta = json.loads((root / CURRENT_FILE).read_text(encoding="utf-8"))
+            build = root / meta["version"]
+            vectors = np.load(build / "vectors.npy", mmap_mode="r")
+            ids = np.load(build / "ids.npy")
+            idf = np.load(build / "idf.npy")
+        except (OSError, KeyError, ValueError):
+            return None
+        if vectors.ndim != 2 or vectors.shape[0] != ids.shape[0] or vectors.shape[1] != idf.shape[0]:
+            return None
+        return cls(vectors, ids, idf, meta)
+
+    def encode_query(self, prompt: str) -> "np.ndarray":
+        vec = _term_vector({"title": prompt}, self.dim) * self.idf
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def top_k(self, prompt: str, k: int, min_score: float = MIN_SCORE) -> list[tuple[int, float]]:
+        """Best `k` (product_id, cosine) pairs above `min_score`, highest first."""
+        if k <= 0 or len(self) == 0:
+            return []
+        query = self.encode_query(prompt)
+        if not query.any():
+            return []
+        scores = self.vectors @ query
+        k = min(k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(self.ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+
+class EmbeddingStore:
+    """The current EmbeddingIndex under `root`, reopened when a new build replaces current.json."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+        self._lock = threading.Lock()
+        self._index: Optional[EmbeddingIndex] = None
+        self._mtime: Optional[float] = None
+
+    def get(self) -> Optional[EmbeddingIndex]:
+        if np is None:
+            return None
+        try:
+            mtime = (self.root / CURRENT_FILE).stat().st_mtime
+        except OSError:
+            return None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._index = EmbeddingIndex.load(self.root)
+                    self._mtime = mtime
+        return self._index
+
+
+def build(session: Session, root: Path, dim: int = DEFAULT_DIM, keep: int = 2) -> dict:
+    """Encode every active product and publish it as the current build. Returns build metadata."""
+    from app import Product
+
+    if np is None:
+        raise RuntimeError("numpy is not installed")
+    rows = session.exec(
+        select(Product.id, Product.title, Product.category, Product.description)
+        .where(Product.is_active == True)  # noqa: E712
+        .order_by(Product.id)
+    ).all()
+    products = [{"title": t or "", "category": c or "", "description": d or ""} for _, t, c, d in rows]
+    vectors, idf = encode_products(products, dim)
+    ids = np.array([pid for pid, _, _, _ in rows], dtype=np.int64)
+
+    version = "v" + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    build_dir = root / version
+    build_dir.mkdir(parents=True, exist_ok=True)
+    np.save(build_dir / "vectors.npy", vectors.astype(np.float32))
+    np.save(build_dir / "ids.npy", ids)
+    np.save(build_dir / "idf.npy", idf)
+    meta = {
+        "version": version,
+        "dim": dim,
+        "products": int(ids.shape[0]),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+    }
+    tmp = root / f".{CURRENT_FILE}.tmp"
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(tmp, root / CURRENT_FILE)
+
+    builds = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith("v") and p.name != version)
+    for old in builds[: max(0, len(builds) - keep)]:
+        shutil.rmtree(old, ignore_errors=True)
+    return meta
+
+
+def main() -> None:
+    import db_pool
+
+    database_url = os.getenv("DATABASE_URL", "").strip()
+    if not database_url:
+        raise SystemExit("Missing DATABASE_URL.")
+    if not available():
+        raise SystemExit("numpy is not installed (pip install numpy).")
+    dim = int(os.getenv("EMBED_DIM", str(DEFAULT_DIM)) or DEFAULT_DIM)
+    keep = int(os.getenv("EMBED_KEEP", "2") or "2")
+    root = default_dir()
+
+    engine = db_pool.create_engine(database_url)
+    started = time.perf_counter()
+    with Session(engine) as session:
+        meta = build(session, root, dim=dim, keep=keep)
+    size_mb = meta["products"] * dim * 4 / 1e6
+    print("OK: catalog embeddings built")
+    print(f"- products: {meta['products']}")
+    print(f"- dim: {dim} ({size_mb:.1f} MB)")
+    print(f"- path: {root / meta['version']}")
+    print(f"- seconds: {time.perf_counter() - started:.2f}")
+
+
+if __name__ == "__main__":
+    main()
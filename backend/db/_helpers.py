@@ -1,10 +1,9 @@
 from __future__ import annotations
 
 import os
+import sys
 from pathlib import Path
 
-from sqlalchemy import create_engine
-
 
 def normalize_database_url(url: str) -> str:
     if url.startswith("postgres://"):
@@ -35,6 +34,18 @@ def resolve_database_url() -> str:
     return normalize_database_url(assembled)
 
 
+def create_db_engine():
+    # Same engine factory as the API, so pool sizing, pre-ping and statement_timeout
+    # (HWEIBO_DB_* env vars) match the backend. db_pool.py has no FastAPI/app imports;
+    # it lives one level up.
+    backend_dir = str(Path(__file__).resolve().parents[1])
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    import db_pool
+
+    return db_pool.create_engine(resolve_database_url())
+
+
 def read_sql_file(path: Path) -> str:
     text = path.read_text(encoding="utf-8")
     if not text.strip():
@@ -45,7 +56,7 @@ def read_sql_file(path: Path) -> str:
 def execute_sql_script(sql_text: str) -> None:
     # Split on semicolons for simple local scripts.
     # We intentionally keep schema/seeds free of procedural blocks.
-    engine = create_engine(resolve_database_url())
+    engine = create_db_engine()
     statements = [s.strip() for s in sql_text.split(";") if s.strip()]
     with engine.begin() as conn:
         for stmt in statements:
@@ -8,9 +8,9 @@ Usage:
 
 from __future__ import annotations
 
-from sqlalchemy import create_engine, inspect, text
+from sqlalchemy import inspect, text
 
-from _helpers import resolve_database_url
+from _helpers import create_db_engine, resolve_database_url
 
 
 def _count(conn, table: str) -> int:
@@ -19,7 +19,7 @@ def _count(conn, table: str) -> int:
 
 def main() -> int:
     url = resolve_database_url()
-    engine = create_engine(url)
+    engine = create_db_engine()
     print(f"Checking database URL: {url}")
 
     with engine.connect() as conn:
@@ -0,0 +1,156 @@
+"""
+Postgres engine factory shared by the API and the CLI scripts.
+
+Kept free of FastAPI and of app.py's import-time setup, so db/ scripts, seeders and importers
+get the same pool settings without loading the web app. Configured with HWEIBO_DB_* env vars:
+
+  HWEIBO_DB_POOL_SIZE=5              # persistent connections per process
+  HWEIBO_DB_MAX_OVERFLOW=10          # extra connections under burst load
+  HWEIBO_DB_POOL_TIMEOUT=30          # seconds to wait for a free connection
+  HWEIBO_DB_POOL_RECYCLE=1800        # seconds before a connection is replaced; -1 disables
+  HWEIBO_DB_POOL_PRE_PING=1          # test connections on checkout
+  HWEIBO_DB_STATEMENT_TIMEOUT_MS=0   # server-side statement_timeout; 0 = server default
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine as _sa_create_engine
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+def _env(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.getenv(name)
+    if value is None or value.strip() == "":
+        return default
+    return value
+
+
+HWEIBO_DB_POOL_SIZE = int(_env("HWEIBO_DB_POOL_SIZE", "5") or "5")
+HWEIBO_DB_MAX_OVERFLOW = int(_env("HWEIBO_DB_MAX_OVERFLOW", "10") or "10")
+HWEIBO_DB_POOL_TIMEOUT = float(_env("HWEIBO_DB_POOL_TIMEOUT", "30") or "30")
+HWEIBO_DB_POOL_RECYCLE = int(_env("HWEIBO_DB_POOL_RECYCLE", "1800") or "1800")  # seconds; -1 disables
+HWEIBO_DB_POOL_PRE_PING = (_env("HWEIBO_DB_POOL_PRE_PING", "1") or "1").lower() in {"1", "true", "yes", "y"}
+HWEIBO_DB_STATEMENT_TIMEOUT_MS = int(_env("HWEIBO_DB_STATEMENT_TIMEOUT_MS", "0") or "0")  # 0 = server default
+
+
+def normalize_database_url(url: str) -> str:
+    """
+    Accept postgres URLs with or without an explicit driver.
+
+    On Python versions where psycopg2 wheels may not exist (e.g. 3.14),
+    we allow `pg8000` as a pure-Python fallback by rewriting the URL if needed.
+    """
+    if url.startswith("postgres://"):
+        # SQLAlchemy expects postgresql://
+        url = "postgresql://" + url.removeprefix("postgres://")
+
+    # If the user already specified a driver, respect it.
+    if url.startswith("postgresql+"):
+        return url
+
+    # No driver specified (postgresql://...). Choose a usable default.
+    try:
+        import psycopg2  # type: ignore  # noqa: F401
+
+        return "postgresql+psycopg2://" + url.removeprefix("postgresql://")
+    except Exception:
+        return "postgresql+pg8000://" + url.removeprefix("postgresql://")
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each checkout waited.
+
+    The wait includes opening a new connection when the pool grows, which is exactly
+    the cost we want to tell apart from query time under burst load. `timeouts` counts
+    only checkouts that gave up after pool_timeout; failures to open a connection are
+    `connect_errors`.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+        self.connect_errors = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._wait_lock:
+                self.timeouts += 1
+            raise
+        except Exception:
+            with self._wait_lock:
+                self.connect_errors += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._wait_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def create_engine(database_url: str):
+    """
+    Build a Postgres engine with the pool settings from HWEIBO_DB_* env vars.
+
+    Used by the API and by seed_db.py / init_db.py / the importers / db/ helpers, so every
+    process gets pre-ping, recycle and the optional server-side statement_timeout.
+    """
+    db_engine = _sa_create_engine(
+        normalize_database_url(database_url),
+        poolclass=TimedQueuePool,
+        pool_size=max(1, HWEIBO_DB_POOL_SIZE),
+        max_overflow=max(0, HWEIBO_DB_MAX_OVERFLOW),
+        pool_timeout=HWEIBO_DB_POOL_TIMEOUT,
+        pool_recycle=HWEIBO_DB_POOL_RECYCLE,
+        pool_pre_ping=HWEIBO_DB_POOL_PRE_PING,
+    )
+    if HWEIBO_DB_STATEMENT_TIMEOUT_MS > 0:
+
+        @event.listens_for(db_engine, "connect")
+        def _set_statement_timeout(dbapi_connection, _record) -> None:
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"SET statement_timeout = {int(HWEIBO_DB_STATEMENT_TIMEOUT_MS)}")
+            finally:
+                cursor.close()
+            # Commit so the pool's reset-on-return rollback does not undo the SET.
+            dbapi_connection.commit()
+
+    return db_engine
+
+
+def pool_stats(db_engine) -> dict:
+    pool = db_engine.pool
+    stats = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    if isinstance(pool, TimedQueuePool):
+        with pool._wait_lock:
+            stats.update(
+                {
+                    "checkouts": pool.checkouts,
+                    "timeouts": pool.timeouts,
+                    "connect_errors": pool.connect_errors,
+                    "wait_ms_avg": round(1000 * pool.wait_seconds_total / max(1, pool.checkouts), 3),
+                    "wait_ms_max": round(1000 * pool.wait_seconds_max, 3),
+                }
+            )
+    return stats
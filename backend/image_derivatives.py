@@ -0,0 +1,279 @@
+"""
+Thumbnails and modern-format variants for product images.
+
+For every ProductImage the original is decoded once and written at fixed widths
+(see SIZES) as WebP, plus AVIF when the installed Pillow can encode it:
+  backend/product_images/derived/<aa>/<sha256 of original>/<size>.<format>
+
+It also writes `full.<format>`: the original at its own resolution, re-encoded. The static
+image route serves that copy instead of the original to clients whose Accept header allows it.
+
+The result is recorded on ProductImage.variants as a size -> format -> URL map, e.g.
+  {"thumb": {"width": 320, "webp": "/product_images/derived/.../thumb.webp", "avif": "..."}, ...}
+and returned by the API as `image_variants` next to `images`. Variant files are keyed by the
+original's content hash, so re-runs and duplicate uploads are free.
+
+Requires Pillow (`pip install Pillow`; AVIF needs Pillow >= 11.3 or `pillow-avif-plugin`).
+Without it nothing is generated and the API keeps serving the originals.
+
+Usage (standalone, fills in images that have no variants yet):
+  export DATABASE_URL='postgresql://...'
+  python image_derivatives.py
+
+Optional:
+  export DERIVE_WORKERS=8      # encoder threads (default: CPU count)
+  export DERIVE_FORCE=1        # regenerate for every image, not just missing ones
+  export DERIVE_SELLER_ID=12   # only this seller's products
+  export DERIVE_PRUNE=1        # afterwards, delete variant folders no image references any more
+
+seed_db.py (SEED_DERIVATIVES=1) and import_agent_shopper_uploads.py (IMPORT_DERIVATIVES=1)
+run the same pass after they insert images.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import bindparam, update
+from sqlmodel import Session, select
+
+import image_store
+
+try:
+    from PIL import Image, ImageOps
+except Exception:  # pragma: no cover
+    Image = None
+    ImageOps = None
+
+try:
+    import pillow_avif  # noqa: F401  (registers the AVIF codec on older Pillow)
+except Exception:  # pragma: no cover
+    pass
+
+
+# Label -> target width in px, smallest first. Originals are never upscaled.
+SIZES = {"thumb": 320, "card": 640, "large": 1280}
+# Same-resolution re-encode of the original, served through Accept negotiation (not listed in variants).
+FULL = "full"
+_ENCODE_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "avif": {"quality": 55, "speed": 6},
+}
+_CHUNK = 200
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def formats() -> list[str]:
+    if Image is None:
+        return []
+    Image.init()
+    return [fmt for fmt in ("avif", "webp") if fmt.upper() in Image.SAVE]
+
+
+def default_workers() -> int:
+    value = os.getenv("DERIVE_WORKERS", "").strip()
+    return max(1, int(value)) if value else (os.cpu_count() or 4)
+
+
+def source_path(url: str) -> Optional[Path]:
+    """Local file behind a /product_images/... URL (None for anything else)."""
+    if not url.startswith("/product_images/"):
+        return None
+    rel = url.removeprefix("/product_images/")
+    if not rel or ".." in rel.split("/"):
+        return None
+    return image_store.images_root() / rel
+
+
+def _save_atomic(img, dst: Path, fmt: str) -> None:
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        img.save(tmp, format=fmt.upper(), **_ENCODE_OPTIONS.get(fmt, {}))
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _write_full(src: Path, out_dir: Path, fmts: list[str], force: bool) -> None:
+    todo = [fmt for fmt in fmts if force or not (out_dir / f"{FULL}.{fmt}").exists()]
+    if not todo:
+        return
+    with Image.open(src) as im:
+        source_format = (im.format or "").lower()
+        todo = [fmt for fmt in todo if fmt != source_format]
+        if not todo:
+            return
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in {"RGB", "RGBA"}:
+            im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for fmt in todo:
+            _save_atomic(im, out_dir / f"{FULL}.{fmt}", fmt)
+
+
+def generate(src: Path, force: bool = False) -> dict:
+    """
+    Write the variants of `src` (skipping files that already exist unless `force`)
+    and return its size -> format -> URL map. Raises on unreadable images.
+    """
+    fmts = formats()
+    if not fmts:
+        return {}
+    rel_dir = image_store.derived_relpath(image_store.file_digest(src))
+    out_dir = image_store.images_root() / rel_dir
+    widths = sorted(set(SIZES.values()))
+
+    variants: dict = {}
+    pending = {
+        label: [fmt for fmt in fmts if force or not (out_dir / f"{label}.{fmt}").exists()] for label in SIZES
+    }
+    with Image.open(src) as im:
+        # JPEG can decode straight at a reduced scale, which is most of the cost for multi-MB photos.
+        im.draft("RGB", (widths[-1], widths[-1]))
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in {"RGB", "RGBA"}:
+            im = im.convert("RGBA" if "A" in im.getbands() or "transparency" in im.info else "RGB")
+        produced: dict[int, str] = {}
+        for label, width in sorted(SIZES.items(), key=lambda kv: kv[1]):
+            target = min(width, im.width)
+            if target in produced:
+                # Original is narrower than this size: reuse the previous (same-width) variant.
+                variants[label] = dict(variants[produced[target]])
+                continue
+            produced[target] = label
+            height = max(1, round(im.height * target / im.width))
+            entry: dict = {"width": target, "height": height}
+            resized = None
+            for fmt in fmts:
+                dst = out_dir / f"{label}.{fmt}"
+                if fmt in pending[label]:
+                    if resized is None:
+                        resized = im if target == im.width else im.resize((target, height), Image.LANCZOS)
+                        out_dir.mkdir(parents=True, exist_ok=True)
+                    _save_atomic(resized, dst, fmt)
+                entry[fmt] = f"/product_images/{rel_dir}/{label}.{fmt}"
+            variants[label] = entry
+    # Separate decode: the sizes above come from a reduced-scale draft.
+    _write_full(src, out_dir, fmts, force)
+    return variants
+
+
+def _generate_for_url(url: str, force: bool) -> Optional[dict]:
+    """None = source not available locally (retry later); {} = not an image we can decode."""
+    src = source_path(url)
+    if src is None or not src.is_file():
+        return None
+    try:
+        return generate(src, force=force)
+    except Exception as e:
+        print(f"  WARN: no variants for {url}: {e!r}")
+        return {}
+
+
+def derive_missing(
+    session: Session,
+    workers: Optional[int] = None,
+    seller_id: Optional[int] = None,
+    force: bool = False,
+) -> dict:
+    """
+    Generate variants for ProductImage rows that have none (all rows with `force`) across a
+    thread pool, writing ProductImage.variants per chunk. Returns counts.
+    """
+    from app import Product, ProductImage
+
+    counts = {"images": 0, "generated": 0, "unsupported": 0, "missing": 0}
+    if not available():
+        print("Image derivatives skipped: Pillow is not installed.")
+        return counts
+
+    stmt = select(ProductImage.id, ProductImage.url).order_by(ProductImage.id)
+    if not force:
+        stmt = stmt.where(ProductImage.variants.is_(None))
+    if seller_id is not None:
+        stmt = stmt.join(Product, Product.id == ProductImage.product_id).where(Product.seller_id == seller_id)
+    rows = list(session.exec(stmt).all())
+
+    table = ProductImage.__table__
+    set_variants = update(table).where(table.c.id == bindparam("image_id")).values(variants=bindparam("v"))
+    with ThreadPoolExecutor(max_workers=workers or default_workers(), thread_name_prefix="derive") as pool:
+        for start in range(0, len(rows), _CHUNK):
+            chunk = rows[start : start + _CHUNK]
+            results = pool.map(lambda row: _generate_for_url(row[1], force), chunk)
+            params = []
+            for (image_id, _), variants in zip(chunk, results):
+                counts["images"] += 1
+                if variants is None:
+                    counts["missing"] += 1
+                    continue
+                counts["generated" if variants else "unsupported"] += 1
+                params.append({"image_id": image_id, "v": variants})
+            if params:
+                session.connection().execute(set_variants, params)
+            session.commit()
+    return counts
+
+
+def prune_unreferenced(session: Session) -> int:
+    """Delete derived/<aa>/<digest> folders that no ProductImage.variants points at."""
+    from app import ProductImage
+
+    prefix = f"/product_images/{image_store.DERIVED_DIR}/"
+    referenced: set[str] = set()
+    for variants in session.exec(select(ProductImage.variants).where(ProductImage.variants.is_not(None))):
+        for entry in (variants or {}).values():
+            for value in entry.values():
+                if isinstance(value, str) and value.startswith(prefix):
+                    referenced.add(value.removeprefix("/product_images/").rsplit("/", 1)[0])
+
+    removed = 0
+    root = image_store.images_root() / image_store.DERIVED_DIR
+    for shard in root.glob("*") if root.exists() else []:
+        for folder in shard.iterdir():
+            if folder.is_dir() and f"{image_store.DERIVED_DIR}/{shard.name}/{folder.name}" not in referenced:
+                shutil.rmtree(folder, ignore_errors=True)
+                removed += 1
+    return removed
+
+
+def print_counts(counts: dict, elapsed: float) -> None:
+    print(
+        f"- variants: images={counts['images']} generated={counts['generated']} "
+        f"unsupported={counts['unsupported']} missing_source={counts['missing']} "
+        f"formats={','.join(formats()) or 'none'} elapsed_s={elapsed:.2f}"
+    )
+
+
+def main() -> None:
+    import db_pool
+
+    database_url = os.getenv("DATABASE_URL", "").strip()
+    if not database_url:
+        raise SystemExit("Missing DATABASE_URL.")
+    if not available():
+        raise SystemExit("Pillow is not installed (pip install Pillow).")
+    force = os.getenv("DERIVE_FORCE", "0").strip().lower() in {"1", "true", "yes", "y"}
+    prune = os.getenv("DERIVE_PRUNE", "0").strip().lower() in {"1", "true", "yes", "y"}
+    seller = os.getenv("DERIVE_SELLER_ID", "").strip()
+
+    engine = db_pool.create_engine(database_url)
+    started = time.perf_counter()
+    with Session(engine) as session:
+        counts = derive_missing(session, seller_id=int(seller) if seller else None, force=force)
+        print("OK: image variants up to date")
+        print_counts(counts, time.perf_counter() - started)
+        if prune:
+            print(f"- pruned_folders: {prune_unreferenced(session)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Content-addressed product image store.
+
+Layout (under backend/product_images):
+  blobs/<aa>/<bb>/<sha256>.<ext>
+URL stored in ProductImage.url:
+  /product_images/blobs/<aa>/<bb>/<sha256>.<ext>
+
+Identical bytes map to one file no matter which seller uploaded them or under which slug,
+and a blob URL never changes content, so it can be cached forever. Blobs are reference
+counted through ProductImage rows: callers delete a blob only once no row points at it.
+
+Selected with HWEIBO_IMAGE_STORE=blobs (default `paths` keeps the path-derived URLs).
+
+Resized/re-encoded variants (image_derivatives.py) live next to the blobs, keyed by the
+source's content hash:
+  derived/<aa>/<sha256>/<size>.<format>
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+BLOB_DIR = "blobs"
+BLOB_URL_PREFIX = f"/product_images/{BLOB_DIR}/"
+DERIVED_DIR = "derived"
+
+
+def images_root() -> Path:
+    return Path(__file__).resolve().parent / "product_images"
+
+
+def use_blob_store() -> bool:
+    return (os.getenv("HWEIBO_IMAGE_STORE", "paths").strip().lower() or "paths") == "blobs"
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def blob_relpath(digest: str, suffix: str) -> str:
+    # Two levels of 256-way sharding keeps directories small at millions of blobs.
+    return f"{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{suffix.lower()}"
+
+
+def derived_relpath(digest: str) -> str:
+    return f"{DERIVED_DIR}/{digest[:2]}/{digest}"
+
+
+def is_blob_url(url: str) -> bool:
+    return url.startswith(BLOB_URL_PREFIX)
+
+
+def blob_path(url: str) -> Optional[Path]:
+    if not is_blob_url(url):
+        return None
+    rel = url.removeprefix("/product_images/")
+    if ".." in rel.split("/"):
+        return None
+    return images_root() / rel
+
+
+def blob_target(src: Path) -> tuple[str, Path]:
+    """Hash `src` and return (url, absolute blob path) it belongs at."""
+    rel = blob_relpath(file_digest(src), src.suffix)
+    return f"/product_images/{rel}", images_root() / rel
+
+
+def store_blob(src: Path) -> tuple[str, bool]:
+    """
+    Copy `src` into the store. Returns (url, created); created is False when the same
+    content was already stored (deduplicated).
+    """
+    url, dst = blob_target(src)
+    if dst.exists():
+        return url, False
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+    return url, True
+
+
+def delete_blobs(urls: list[str], ref_counts: dict[str, int]) -> int:
+    """
+    Delete the blobs among `urls` whose reference count is zero, with their derived variants.
+    Returns how many blobs were removed.
+    """
+    removed = 0
+    for url in sorted(set(urls)):
+        path = blob_path(url)
+        if path is None or ref_counts.get(url, 0) > 0:
+            continue
+        try:
+            path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(images_root() / derived_relpath(path.stem), ignore_errors=True)
+    return removed
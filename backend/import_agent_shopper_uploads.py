@@ -8,6 +8,8 @@ Target layout (Hweibo):
   backend/product_images/sellers/<seller_id>/<Category>/<product-slug>/<filename>
   URL stored in DB:
     /product_images/sellers/<seller_id>/<Category>/<product-slug>/<filename>
+  or, with HWEIBO_IMAGE_STORE=blobs, the deduplicated content-addressed store (see image_store.py):
+    /product_images/blobs/<aa>/<bb>/<sha256>.<ext>
 
 Usage:
   export DATABASE_URL='postgresql://...'
@@ -16,21 +18,46 @@ Usage:
 Optional:
   export IMPORT_SELLER_EMAIL='seller@hweibo.local'
   export IMPORT_SELLER_PASSWORD_HASH='demo'
-  export IMPORT_RESET=1    # deletes previously imported products for that seller under /product_images/sellers/<seller_id>/*
+  export IMPORT_RESET=1    # deletes the products this importer created for that seller (see _imported_product_ids)
+  export IMPORT_BATCH=1    # set-based mode: preload titles, multi-row INSERT ... RETURNING, commit per chunk
+  export IMPORT_BATCH_SIZE=500
+  export IMPORT_COPY_WORKERS=8           # image files are placed by a thread pool while DB inserts continue (0 = inline)
+  export IMPORT_LINK_MODE=copy           # copy | hardlink | reflink | auto (falls back to copy across filesystems)
+  export IMPORT_VERIFY_HASH=0            # 1 = compare content hashes (not just size+mtime) before skipping a file
+  export IMPORT_SYNC=1                   # incremental: diff against a manifest and apply only added/changed/removed products
+  export IMPORT_WATCH=1                  # with IMPORT_SYNC: keep running and apply changes as they appear
+  export IMPORT_WATCH_INTERVAL=2         # seconds between polls when the optional `watchfiles` package is not installed
+  export IMPORT_MANIFEST=/path/to.json   # default: backend/.import_state/agent_shopper_seller_<seller_id>.json
+  export IMPORT_DERIVATIVES=1            # then generate thumbnails/WebP/AVIF for new images (see image_derivatives.py)
 """
 
 from __future__ import annotations
 
+import errno
+import json
 import os
 import re
 import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
-from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy import delete, func, insert, or_
+from sqlmodel import Session, SQLModel, select
 
-from app import Product, ProductImage, SellerProfile, User, UserRole, _normalize_database_url
+import db_pool
+import image_derivatives
+import image_store
+from app import Product, ProductImage, SellerProfile, User, UserRole
+
+try:
+    # Optional: inotify/FSEvents-backed change notifications for IMPORT_WATCH.
+    from watchfiles import watch as _watch_changes  # type: ignore
+except Exception:  # pragma: no cover
+    _watch_changes = None
 
 
 def _env(name: str, default: Optional[str] = None) -> Optional[str]:
@@ -96,6 +123,199 @@ def _target_images_root() -> Path:
     return Path(__file__).resolve().parent / "product_images"
 
 
+def _iter_product_dirs(src_root: Path):
+    """
+    Yield (category, product_dir) in a stable order.
+
+    Each category is first yielded once with product_dir=None so callers can count it.
+    """
+    for cat_dir in sorted([p for p in src_root.iterdir() if p.is_dir()]):
+        yield cat_dir.name, None
+        for prod_dir in sorted([p for p in cat_dir.iterdir() if p.is_dir()]):
+            yield cat_dir.name, prod_dir
+
+
+def _new_product(seller_id: int, category: str, title: str) -> dict:
+    return {
+        "seller_id": seller_id,
+        "title": title,
+        "description": f"{title} in category {category}.",
+        "category": category,
+        "price_cents": _guess_price_cents(category, title),
+        "currency": "USD",
+        "is_active": True,
+    }
+
+
+_FICLONE = 0x40049409  # Linux ioctl: share extents between files (btrfs, xfs, ...)
+
+
+def _is_unchanged(src: Path, dst: Path, verify_hash: bool) -> bool:
+    try:
+        d = dst.stat()
+    except FileNotFoundError:
+        return False
+    st = src.stat()
+    if (st.st_dev, st.st_ino) == (d.st_dev, d.st_ino):
+        return True  # already hardlinked
+    if st.st_size != d.st_size:
+        return False
+    if verify_hash:
+        return image_store.file_digest(src) == image_store.file_digest(dst)
+    # copy2/copystat preserve mtime, so size+mtime identifies an unchanged copy.
+    return st.st_mtime_ns == d.st_mtime_ns
+
+
+def _reflink(src: Path, dst: Path) -> None:
+    import fcntl
+
+    with src.open("rb") as fsrc, dst.open("wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            dst.unlink(missing_ok=True)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _place_file(src: Path, dst: Path, link_mode: str, verify_hash: bool) -> str:
+    """Put `src` at `dst` (atomically via a temp name). Returns "skipped", "linked" or "copied"."""
+    if _is_unchanged(src, dst, verify_hash):
+        return "skipped"
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    attempts = {"auto": ("reflink", "hardlink"), "reflink": ("reflink",), "hardlink": ("hardlink",)}.get(link_mode, ())
+    for attempt in attempts:
+        try:
+            if attempt == "reflink":
+                _reflink(src, tmp)
+            else:
+                os.link(src, tmp)
+            os.replace(tmp, dst)
+            return "linked"
+        except OSError as e:
+            # Cross-device, unsupported filesystem, etc.: fall through to the next strategy.
+            tmp.unlink(missing_ok=True)
+            if e.errno not in {errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EPERM, errno.EMLINK}:
+                raise
+    shutil.copy2(src, tmp)
+    os.replace(tmp, dst)
+    return "copied"
+
+
+class _FileStage:
+    """
+    Bounded thread pool that places image files while the DB stage keeps preparing rows.
+
+    Every submission returns a future for the image URL; callers resolve them (see _resolved)
+    before committing the rows that reference the files. At most `workers * 32` files are
+    queued at once, so memory stays flat on huge trees. With workers=0 files are placed
+    inline (the old serial behaviour).
+    """
+
+    def __init__(self, workers: int, link_mode: str, verify_hash: bool) -> None:
+        self._link_mode = link_mode
+        self._verify_hash = verify_hash
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="img-copy") if workers > 0 else None
+        self._slots = threading.BoundedSemaphore(max(1, workers) * 32)
+        self._lock = threading.Lock()
+        self.counts = {"copied": 0, "linked": 0, "skipped": 0, "deduplicated": 0, "failed": 0}
+        self.errors: list[str] = []
+        # Destination paths placed (or already up to date) in this run; see _finish_reset.
+        self.placed: set[Path] = set()
+
+    def _run(self, src: Path, dst: Path, url: str) -> Optional[str]:
+        try:
+            outcome = _place_file(src, dst, self._link_mode, self._verify_hash)
+        except Exception as e:
+            with self._lock:
+                self.counts["failed"] += 1
+                self.errors.append(f"{src} -> {dst}: {e!r}")
+            return None
+        with self._lock:
+            self.counts[outcome] += 1
+            self.placed.add(dst)
+        return url
+
+    def submit(self, src: Path, dst: Path, url: str) -> Future:
+        """Place `src` at `dst`; the future resolves to `url` once the file is there (None on failure)."""
+        if self._pool is None:
+            done: Future = Future()
+            done.set_result(self._run(src, dst, url))
+            return done
+        self._slots.acquire()
+        future = self._pool.submit(self._run, src, dst, url)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _run_blob(self, src: Path) -> Optional[str]:
+        try:
+            url, dst = image_store.blob_target(src)
+            if dst.exists():
+                outcome = "deduplicated"
+            else:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                # A hardlinked blob would change if the upload were edited in place; only CoW reflinks are safe.
+                mode = "reflink" if self._link_mode in {"reflink", "auto"} else "copy"
+                outcome = _place_file(src, dst, mode, False)
+        except Exception as e:
+            with self._lock:
+                self.counts["failed"] += 1
+                self.errors.append(f"{src} -> blob store: {e!r}")
+            return None
+        with self._lock:
+            self.counts[outcome] += 1
+        return url
+
+    def submit_blob(self, src: Path) -> Future:
+        """Hash + store `src` in the blob store; the future resolves to its URL (None on failure)."""
+        if self._pool is None:
+            done: Future = Future()
+            done.set_result(self._run_blob(src))
+            return done
+        self._slots.acquire()
+        future = self._pool.submit(self._run_blob, src)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+
+def _stage_product_images(files: _FileStage, seller_id: int, category: str, prod_dir: Path) -> list[tuple[Future, int]]:
+    """
+    Queue images for backend/product_images/sellers/<seller_id>/<Category>/<slug>/... (or the blob store).
+
+    Returns (url future, sort_order) per image, in display order. Resolve them with _resolved
+    before committing image rows, so no row ever points at a file that is not there yet.
+    """
+    image_files = [p for p in prod_dir.iterdir() if p.is_file()]
+    image_files.sort(key=lambda p: (_sort_order_from_filename(p.name), p.name))
+    if image_store.use_blob_store():
+        return [(files.submit_blob(img), _sort_order_from_filename(img.name)) for img in image_files]
+
+    dst_dir = _target_images_root() / "sellers" / str(seller_id) / category / prod_dir.name
+    dst_dir.mkdir(parents=True, exist_ok=True)
+
+    out: list[tuple[Future, int]] = []
+    for img in image_files:
+        dst = dst_dir / img.name
+        rel = dst.relative_to(_target_images_root()).as_posix()
+        out.append((files.submit(img, dst, f"/product_images/{rel}"), _sort_order_from_filename(img.name)))
+    return out
+
+
+def _resolved(images: list[tuple[Future, int]]) -> list[tuple[str, int]]:
+    """Wait until the images are placed; ones that failed are dropped (and reported by _FileStage)."""
+    out: list[tuple[str, int]] = []
+    for future, sort_order in images:
+        url = future.result()
+        if url:
+            out.append((url, sort_order))
+    return out
+
+
 def _ensure_seller(session: Session, email: str, password_hash: str) -> User:
     existing = session.exec(select(User).where(User.email == email)).first()
     if existing:
@@ -158,12 +378,70 @@ def _ensure_store_profile(
     session.commit()
 
 
-def _delete_imported_for_seller(session: Session, seller_id: int) -> None:
-    # Delete DB rows first, then files. Keep it scoped to this import namespace.
-    # We consider imported images those whose URL starts with /product_images/sellers/<seller_id>/
+def _blob_ref_counts(session: Session, urls: list[str]) -> dict[str, int]:
+    blob_urls = sorted({u for u in urls if image_store.is_blob_url(u)})
+    if not blob_urls:
+        return {}
+    rows = session.exec(
+        select(ProductImage.url, func.count()).where(ProductImage.url.in_(blob_urls)).group_by(ProductImage.url)
+    ).all()
+    return {url: int(n) for url, n in rows}
+
+
+def _release_blobs(session: Session, urls: list[str]) -> int:
+    """Delete blobs among `urls` that no ProductImage row references any more (call after commit)."""
+    return image_store.delete_blobs([u for u in urls if image_store.is_blob_url(u)], _blob_ref_counts(session, urls))
+
+
+def _ledger_path(seller_id: int) -> Path:
+    manifest = _manifest_path(seller_id)
+    return manifest.with_name(manifest.stem + ".imported.json")
+
+
+def _imported_product_ids(seller_id: int) -> set[int]:
+    """Ids this importer created for the seller: the full-import ledger plus the sync manifest."""
+    ids: set[int] = set()
+    try:
+        ids.update(int(pid) for pid in json.loads(_ledger_path(seller_id).read_text(encoding="utf-8"))["product_ids"])
+    except (OSError, ValueError, KeyError):
+        pass
+    manifest_path = _manifest_path(seller_id)
+    if manifest_path.exists():
+        products = _load_manifest(manifest_path, seller_id)["products"].values()
+        ids.update(int(p["product_id"]) for p in products if p.get("product_id") is not None)
+    return ids
+
+
+def _record_imported_ids(seller_id: int, product_ids: list[int]) -> None:
+    """Add created product ids to the seller's ledger (what IMPORT_RESET may delete)."""
+    if not product_ids:
+        return
+    path = _ledger_path(seller_id)
+    try:
+        known = set(json.loads(path.read_text(encoding="utf-8"))["product_ids"])
+    except (OSError, ValueError, KeyError):
+        known = set()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"seller_id": seller_id, "product_ids": sorted(known | set(product_ids))}), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _delete_imported_for_seller(session: Session, seller_id: int, keep_files: bool = False) -> list[str]:
+    # Delete DB rows first, then files. Keep it scoped to what this importer created: products in
+    # its ledger/manifest, plus (for imports that predate the ledger) images under
+    # /product_images/sellers/<seller_id>/. Blob URLs alone prove nothing: seed_db.py stores the
+    # demo catalog as blobs under the same seller.
     prefix = f"/product_images/sellers/{seller_id}/"
-    imgs = session.exec(select(ProductImage).where(ProductImage.url.startswith(prefix))).all()
-    product_ids = sorted({img.product_id for img in imgs})
+    recorded = sorted(_imported_product_ids(seller_id))
+    imgs = session.exec(
+        select(ProductImage)
+        .join(Product, Product.id == ProductImage.product_id)
+        .where(Product.seller_id == seller_id)
+        .where(or_(ProductImage.url.startswith(prefix), ProductImage.product_id.in_(recorded)))
+    ).all()
+    product_ids = sorted({img.product_id for img in imgs} | set(recorded))
+    urls = [img.url for img in imgs]
     for img in imgs:
         session.delete(img)
     session.commit()
@@ -176,10 +454,340 @@ def _delete_imported_for_seller(session: Session, seller_id: int) -> None:
                 session.delete(p)
         session.commit()
 
-    # Remove files on disk.
+    _ledger_path(seller_id).unlink(missing_ok=True)
+    if keep_files:
+        # A re-import follows: it skips files that are already in place, then _finish_reset
+        # removes what it did not place.
+        return urls
+
+    # Remove files on disk. Blobs shared with other products/sellers stay until their last reference goes.
+    _release_blobs(session, urls)
     target_dir = _target_images_root() / "sellers" / str(seller_id)
     if target_dir.exists():
         shutil.rmtree(target_dir)
+    return urls
+
+
+def _finish_reset(session: Session, files: _FileStage, seller_id: int, old_urls: list[str]) -> None:
+    """After a reset + re-import: drop old files and blobs that the re-import did not reuse."""
+    _release_blobs(session, old_urls)
+    target_dir = _target_images_root() / "sellers" / str(seller_id)
+    if not target_dir.exists():
+        return
+    for path in sorted(target_dir.rglob("*"), reverse=True):
+        if path.is_file() and path not in files.placed:
+            path.unlink(missing_ok=True)
+        elif path.is_dir() and not any(path.iterdir()):
+            path.rmdir()
+
+
+def _import_rows(session: Session, files: _FileStage, seller_id: int, src_root: Path, stats: dict) -> None:
+    # Original one-product-at-a-time path (a title lookup and one commit per product).
+    created: list[int] = []
+    try:
+        for category, prod_dir in _iter_product_dirs(src_root):
+            if prod_dir is None:
+                stats["categories"] += 1
+                continue
+            title = _slug_to_title(prod_dir.name)
+
+            existing = session.exec(
+                select(Product).where(Product.seller_id == seller_id).where(Product.title == title)
+            ).first()
+            if existing:
+                stats["products_skipped"] += 1
+                continue
+
+            product = Product(**_new_product(seller_id, category, title))
+            session.add(product)
+            session.flush()  # assigns the id; nothing is visible before the commit below
+
+            # Product and image rows commit together, once the files are in place.
+            for url, sort_order in _resolved(_stage_product_images(files, seller_id, category, prod_dir)):
+                session.add(ProductImage(product_id=product.id, url=url, alt_text=title, sort_order=sort_order))
+                stats["images_copied"] += 1
+
+            session.commit()
+            created.append(int(product.id or 0))
+            stats["products_created"] += 1
+    finally:
+        _record_imported_ids(seller_id, created)
+
+
+def _flush_batch(session: Session, pending: list[tuple[dict, list[tuple[Future, int]]]], stats: dict) -> None:
+    if not pending:
+        return
+    conn = session.connection()
+    # One multi-row INSERT ... RETURNING per chunk; ids come back in parameter order.
+    ids = conn.execute(
+        insert(Product.__table__).returning(Product.__table__.c.id, sort_by_parameter_order=True),
+        [row for row, _ in pending],
+    ).scalars().all()
+    image_rows = [
+        {"product_id": pid, "url": url, "alt_text": row["title"], "sort_order": sort_order}
+        for pid, (row, images) in zip(ids, pending)
+        for url, sort_order in _resolved(images)
+    ]
+    if image_rows:
+        conn.execute(insert(ProductImage.__table__), image_rows)
+    session.commit()
+    _record_imported_ids(int(pending[0][0]["seller_id"]), [int(pid) for pid in ids])
+    stats["products_created"] += len(pending)
+    stats["images_copied"] += len(image_rows)
+    pending.clear()
+
+
+def _import_batched(
+    session: Session, files: _FileStage, seller_id: int, src_root: Path, stats: dict, batch_size: int
+) -> None:
+    """
+    Set-based import: one query for the seller's existing titles, then multi-row inserts
+    committed every `batch_size` products.
+    """
+    existing_titles = set(session.exec(select(Product.title).where(Product.seller_id == seller_id)).all())
+    pending: list[tuple[dict, list[tuple[Future, int]]]] = []
+    for category, prod_dir in _iter_product_dirs(src_root):
+        if prod_dir is None:
+            stats["categories"] += 1
+            continue
+        title = _slug_to_title(prod_dir.name)
+        if title in existing_titles:
+            stats["products_skipped"] += 1
+            continue
+        existing_titles.add(title)
+
+        pending.append((_new_product(seller_id, category, title), _stage_product_images(files, seller_id, category, prod_dir)))
+        if len(pending) >= batch_size:
+            _flush_batch(session, pending, stats)
+            print(f"... {stats['products_created']} products, {stats['images_copied']} images")
+    _flush_batch(session, pending, stats)
+
+
+# ----------------------------
+# Incremental sync (IMPORT_SYNC)
+# ----------------------------
+
+_MANIFEST_VERSION = 1
+
+
+def _manifest_path(seller_id: int) -> Path:
+    override = _env("IMPORT_MANIFEST")
+    if override:
+        return Path(override)
+    # Outside product_images/, so the manifest is never served by the static mount.
+    return Path(__file__).resolve().parent / ".import_state" / f"agent_shopper_seller_{seller_id}.json"
+
+
+def _load_manifest(path: Path, seller_id: int) -> dict:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"version": _MANIFEST_VERSION, "seller_id": seller_id, "products": {}}
+    if data.get("version") != _MANIFEST_VERSION or data.get("seller_id") != seller_id:
+        raise SystemExit(f"Manifest {path} does not belong to seller {seller_id}; remove it or set IMPORT_MANIFEST.")
+    return data
+
+
+def _save_manifest(path: Path, manifest: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _scan_tree(src_root: Path) -> dict[str, dict]:
+    """Stat every product directory and file: {"<Category>/<slug>": {category, dir, mtime_ns, files}}."""
+    out: dict[str, dict] = {}
+    for category, prod_dir in _iter_product_dirs(src_root):
+        if prod_dir is None:
+            continue
+        files = {}
+        for f in prod_dir.iterdir():
+            if f.is_file():
+                st = f.stat()
+                files[f.name] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        out[f"{category}/{prod_dir.name}"] = {
+            "category": category,
+            "dir": prod_dir,
+            "mtime_ns": prod_dir.stat().st_mtime_ns,
+            "files": files,
+        }
+    return out
+
+
+def _diff_product_files(old_files: dict, new_files: dict, prod_dir: Path) -> tuple[dict, bool]:
+    """
+    Compare one product's files against the manifest.
+
+    Files whose size+mtime match are trusted; otherwise the content hash decides, so a
+    touched-but-identical file only refreshes the manifest. Returns (new manifest files, changed?).
+    """
+    merged: dict[str, dict] = {}
+    changed = set(old_files) != set(new_files)
+    for name, meta in new_files.items():
+        old = old_files.get(name)
+        if old and old.get("size") == meta["size"] and old.get("mtime_ns") == meta["mtime_ns"]:
+            merged[name] = dict(old)
+            continue
+        digest = image_store.file_digest(prod_dir / name)
+        merged[name] = {**meta, "sha256": digest}
+        if not old or old.get("sha256") != digest:
+            changed = True
+    return merged, changed
+
+
+def _sync_once(engine, files: _FileStage, seller_id: int, src_root: Path, manifest_path: Path) -> dict:
+    """
+    Apply the difference between the upload tree and the manifest.
+
+    New/changed image files are placed first, then all DB changes are committed in one
+    transaction, then files of removed products/images are deleted, then the manifest is
+    saved. Untouched products are never queried or rewritten.
+    """
+    manifest = _load_manifest(manifest_path, seller_id)
+    known: dict[str, dict] = manifest["products"]
+    scanned = _scan_tree(src_root)
+    counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+
+    with Session(engine) as session:
+        # One query tells us which manifest ids still exist and lets us adopt products
+        # imported before the manifest existed (matched by title, like the full import).
+        by_title = {t: pid for pid, t in session.exec(select(Product.id, Product.title).where(Product.seller_id == seller_id)).all()}
+        live_ids = set(by_title.values())
+
+        to_insert: list[tuple[str, dict, list[tuple[Future, int]]]] = []
+        to_reimage: list[tuple[str, int, list[tuple[Future, int]]]] = []
+        stale_files: list[Path] = []
+        next_known: dict[str, dict] = {}
+
+        for key, entry in scanned.items():
+            prod_dir: Path = entry["dir"]
+            title = _slug_to_title(prod_dir.name)
+            old = known.get(key)
+            product_id = old.get("product_id") if old else None
+            if product_id not in live_ids:
+                product_id = by_title.get(title)
+                old = None  # unknown or adopted: (re)write its image rows
+            merged, changed = _diff_product_files((old or {}).get("files", {}), entry["files"], prod_dir)
+            next_known[key] = {"product_id": product_id, "title": title, "mtime_ns": entry["mtime_ns"], "files": merged}
+            if old is not None and not changed:
+                counts["unchanged"] += 1
+                continue
+
+            images = _stage_product_images(files, seller_id, entry["category"], prod_dir)
+            if old is not None and not image_store.use_blob_store():
+                dst_dir = _target_images_root() / "sellers" / str(seller_id) / entry["category"] / prod_dir.name
+                stale_files.extend(dst_dir / name for name in old.get("files", {}) if name not in merged)
+            if product_id is None:
+                to_insert.append((key, _new_product(seller_id, entry["category"], title), images))
+                counts["added"] += 1
+            else:
+                to_reimage.append((key, int(product_id), images))
+                counts["changed"] += 1
+
+        removed = {k: v for k, v in known.items() if k not in scanned}
+        counts["removed"] = len(removed)
+
+        # Files must be in place before the rows that reference them become visible.
+        files.close()
+        if files.errors:
+            raise SystemExit(f"{len(files.errors)} image file(s) could not be placed; sync not applied.")
+
+        conn = session.connection()
+        remove_ids = [int(v["product_id"]) for v in removed.values() if v.get("product_id") in live_ids]
+        reimage_ids = [pid for _, pid, _ in to_reimage]
+        old_urls: list[str] = []
+        if remove_ids or reimage_ids:
+            old_urls = list(
+                session.exec(select(ProductImage.url).where(ProductImage.product_id.in_(remove_ids + reimage_ids))).all()
+            )
+            conn.execute(delete(ProductImage.__table__).where(ProductImage.__table__.c.product_id.in_(remove_ids + reimage_ids)))
+        if remove_ids:
+            conn.execute(
+                delete(Product.__table__)
+                .where(Product.__table__.c.id.in_(remove_ids))
+                .where(Product.__table__.c.seller_id == seller_id)
+            )
+        if to_insert:
+            ids = conn.execute(
+                insert(Product.__table__).returning(Product.__table__.c.id, sort_by_parameter_order=True),
+                [row for _, row, _ in to_insert],
+            ).scalars().all()
+            for (key, _, _), pid in zip(to_insert, ids):
+                next_known[key]["product_id"] = int(pid)
+        image_rows = [
+            {"product_id": next_known[key]["product_id"], "url": url, "alt_text": next_known[key]["title"], "sort_order": order}
+            for key, _, images in to_insert
+            for url, order in _resolved(images)
+        ] + [
+            {"product_id": pid, "url": url, "alt_text": next_known[key]["title"], "sort_order": order}
+            for key, pid, images in to_reimage
+            for url, order in _resolved(images)
+        ]
+        if image_rows:
+            conn.execute(insert(ProductImage.__table__), image_rows)
+        session.commit()
+        _release_blobs(session, old_urls)
+
+    for key in removed:
+        category, _, slug = key.partition("/")
+        shutil.rmtree(_target_images_root() / "sellers" / str(seller_id) / category / slug, ignore_errors=True)
+    for path in stale_files:
+        path.unlink(missing_ok=True)
+
+    manifest["products"] = next_known
+    _save_manifest(manifest_path, manifest)
+    return counts
+
+
+def _print_sync(counts: dict, files: _FileStage, elapsed: float) -> None:
+    print(
+        f"sync: added={counts['added']} changed={counts['changed']} removed={counts['removed']} "
+        f"unchanged={counts['unchanged']} files_placed={files.counts['copied'] + files.counts['linked']} "
+        f"elapsed_s={elapsed:.2f}"
+    )
+
+
+def _derive_for_seller(engine, seller_id: int) -> None:
+    started = time.perf_counter()
+    with Session(engine) as session:
+        counts = image_derivatives.derive_missing(session, seller_id=seller_id)
+    image_derivatives.print_counts(counts, time.perf_counter() - started)
+
+
+def _run_sync(
+    engine, seller_id: int, src_root: Path, file_opts: tuple[int, str, bool], watch: bool, derive: bool = False
+) -> None:
+    manifest_path = _manifest_path(seller_id)
+
+    def _once() -> dict:
+        started = time.perf_counter()
+        files = _FileStage(*file_opts)
+        try:
+            counts = _sync_once(engine, files, seller_id, src_root, manifest_path)
+        finally:
+            files.close()
+        _print_sync(counts, files, time.perf_counter() - started)
+        if derive:
+            _derive_for_seller(engine, seller_id)
+        return counts
+
+    _once()
+    if not watch:
+        return
+
+    print(f"Watching {src_root} for changes (Ctrl+C to stop)...")
+    try:
+        if _watch_changes is not None:
+            for _ in _watch_changes(src_root):
+                _once()
+        else:
+            interval = max(0.2, float(_env("IMPORT_WATCH_INTERVAL", "2") or "2"))
+            while True:
+                time.sleep(interval)
+                _once()
+    except KeyboardInterrupt:
+        print("Stopped watching.")
 
 
 def main() -> None:
@@ -190,6 +798,18 @@ def main() -> None:
     seller_email = _env("IMPORT_SELLER_EMAIL", "seller@hweibo.local") or "seller@hweibo.local"
     seller_password_hash = _env("IMPORT_SELLER_PASSWORD_HASH", "demo") or "demo"
     do_reset = (_env("IMPORT_RESET", "0") or "0").lower() in {"1", "true", "yes", "y"}
+    do_batch = (_env("IMPORT_BATCH", "0") or "0").lower() in {"1", "true", "yes", "y"}
+    batch_size = max(1, int(_env("IMPORT_BATCH_SIZE", "500") or "500"))
+    copy_workers = max(0, int(_env("IMPORT_COPY_WORKERS", "8") or "8"))
+    link_mode = (_env("IMPORT_LINK_MODE", "copy") or "copy").lower()
+    verify_hash = (_env("IMPORT_VERIFY_HASH", "0") or "0").lower() in {"1", "true", "yes", "y"}
+    if link_mode not in {"copy", "hardlink", "reflink", "auto"}:
+        raise SystemExit(f"Invalid IMPORT_LINK_MODE: {link_mode} (expected copy, hardlink, reflink or auto)")
+    do_sync = (_env("IMPORT_SYNC", "0") or "0").lower() in {"1", "true", "yes", "y"}
+    do_watch = (_env("IMPORT_WATCH", "0") or "0").lower() in {"1", "true", "yes", "y"}
+    if do_watch and not do_sync:
+        raise SystemExit("IMPORT_WATCH=1 requires IMPORT_SYNC=1.")
+    do_derive = (_env("IMPORT_DERIVATIVES", "0") or "0").lower() in {"1", "true", "yes", "y"}
     store_name = _env("IMPORT_STORE_NAME", "Hweibo Store") or "Hweibo Store"
     store_description = _env("IMPORT_STORE_DESCRIPTION", "Imported catalog store.") or "Imported catalog store."
     store_country_code = _env("IMPORT_STORE_COUNTRY_CODE", "TZ") or "TZ"
@@ -201,7 +821,7 @@ def main() -> None:
     if not src_root.exists():
         raise SystemExit(f"Source uploads not found: {src_root}")
 
-    engine = create_engine(_normalize_database_url(database_url))
+    engine = db_pool.create_engine(database_url)
     SQLModel.metadata.create_all(engine)
 
     stats = {"categories": 0, "products_created": 0, "products_skipped": 0, "images_copied": 0}
@@ -218,61 +838,32 @@ def main() -> None:
             store_city=store_city,
             store_address=store_address,
         )
+        reset_urls: Optional[list[str]] = None
         if do_reset:
-            _delete_imported_for_seller(session, int(seller.id or 0))
-
-        for cat_dir in sorted([p for p in src_root.iterdir() if p.is_dir()]):
-            category = cat_dir.name
-            stats["categories"] += 1
-
-            for prod_dir in sorted([p for p in cat_dir.iterdir() if p.is_dir()]):
-                slug = prod_dir.name
-                title = _slug_to_title(slug)
-
-                existing = session.exec(
-                    select(Product).where(Product.seller_id == seller.id).where(Product.title == title)
-                ).first()
-                if existing:
-                    stats["products_skipped"] += 1
-                    continue
-
-                product = Product(
-                    seller_id=seller.id,
-                    title=title,
-                    description=f"{title} in category {category}.",
-                    category=category,
-                    price_cents=_guess_price_cents(category, title),
-                    currency="USD",
-                    is_active=True,
-                )
-                session.add(product)
-                session.commit()
-                session.refresh(product)
-
-                # Copy images into backend/product_images/sellers/<seller_id>/<Category>/<slug>/...
-                dst_dir = _target_images_root() / "sellers" / str(seller.id) / category / slug
-                dst_dir.mkdir(parents=True, exist_ok=True)
-
-                image_files = [p for p in prod_dir.iterdir() if p.is_file()]
-                image_files.sort(key=lambda p: (_sort_order_from_filename(p.name), p.name))
-
-                for img in image_files:
-                    dst = dst_dir / img.name
-                    shutil.copy2(img, dst)
-                    rel = dst.relative_to(_target_images_root()).as_posix()
-                    url = f"/product_images/{rel}"
-                    session.add(
-                        ProductImage(
-                            product_id=product.id,
-                            url=url,
-                            alt_text=title,
-                            sort_order=_sort_order_from_filename(img.name),
-                        )
-                    )
-                    stats["images_copied"] += 1
-
-                session.commit()
-                stats["products_created"] += 1
+            # Full imports reuse the files already on disk; sync starts from a clean tree.
+            reset_urls = _delete_imported_for_seller(session, int(seller.id or 0), keep_files=not do_sync)
+            _manifest_path(int(seller.id or 0)).unlink(missing_ok=True)
+
+        seller_id = int(seller.id or 0)
+        if do_sync:
+            _run_sync(
+                engine, seller_id, src_root, (copy_workers, link_mode, verify_hash), watch=do_watch, derive=do_derive
+            )
+            return
+
+        started = time.perf_counter()
+        files = _FileStage(copy_workers, link_mode, verify_hash)
+        try:
+            if do_batch:
+                _import_batched(session, files, seller_id, src_root, stats, batch_size)
+            else:
+                _import_rows(session, files, seller_id, src_root, stats)
+        finally:
+            # DB work is done; wait for the remaining file placements.
+            files.close()
+        if reset_urls is not None:
+            _finish_reset(session, files, seller_id, reset_urls)
+        elapsed = max(time.perf_counter() - started, 1e-9)
 
     s = ImportStats(**stats)
     print("OK: import complete")
@@ -280,6 +871,20 @@ def main() -> None:
     print(f"- products_created: {s.products_created}")
     print(f"- products_skipped: {s.products_skipped}")
     print(f"- images_copied: {s.images_copied}")
+    print(f"- elapsed_s: {elapsed:.2f}")
+    print(f"- products_per_s: {s.products_created / elapsed:.1f}")
+    print(f"- images_per_s: {s.images_copied / elapsed:.1f}")
+    print(
+        f"- files: copied={files.counts['copied']} linked={files.counts['linked']} "
+        f"skipped_unchanged={files.counts['skipped']} deduplicated={files.counts['deduplicated']} "
+        f"failed={files.counts['failed']}"
+    )
+    if files.errors:
+        for line in files.errors[:20]:
+            print(f"  ERROR: {line}")
+        raise SystemExit(f"{len(files.errors)} image file(s) could not be placed.")
+    if do_derive:
+        _derive_for_seller(engine, seller_id)
 
 
 if __name__ == "__main__":
@@ -16,10 +16,11 @@ import os
 import sys
 
 from sqlalchemy import inspect
-from sqlmodel import SQLModel, create_engine
+from sqlmodel import SQLModel
 
 # Import defines the SQLModel tables/metadata.
 import app as hweibo_app  # noqa: F401
+import db_pool
 
 
 def main() -> int:
@@ -28,12 +29,14 @@ def main() -> int:
         print("ERROR: DATABASE_URL is not set.", file=sys.stderr)
         return 2
 
-    engine = create_engine(hweibo_app._normalize_database_url(db_url))
+    engine = db_pool.create_engine(db_url)
     SQLModel.metadata.create_all(engine)
+    fts = hweibo_app._ensure_product_search_vector(engine)
 
     insp = inspect(engine)
     tables = insp.get_table_names()
     print(f"OK: connected and ensured tables exist. table_count={len(tables)}")
+    print(f"product full-text search: {'enabled' if fts else 'unavailable (ILIKE fallback)'}")
     for t in sorted(tables):
         print(f"- {t}")
     return 0
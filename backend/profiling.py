@@ -0,0 +1,142 @@
+"""
+Per-request phase timings (for the Server-Timing header) and an opt-in stack sampling profiler.
+
+Phase timings live in a ContextVar holding a mutable `PhaseTimings`, so time recorded in
+threadpool workers (run_in_threadpool copies the context) and in child tasks lands on the
+request that started the work. Outside a request every helper is a no-op.
+
+The sampler walks `sys._current_frames()` on a background thread and counts collapsed stacks
+("thread;outer;...;inner N" lines), the input format of flamegraph.pl, speedscope and inferno.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+class PhaseTimings:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # phase name -> [seconds, count], in first-recorded order
+        self._phases: dict[str, list[float]] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._phases.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header_value(self, total_seconds: Optional[float] = None) -> str:
+        """Server-Timing value, e.g. `db;dur=4.2;desc="3 calls", ai;dur=812.0, total;dur=830.5`."""
+        with self._lock:
+            items = [(name, secs, int(count)) for name, (secs, count) in self._phases.items()]
+        parts = []
+        for name, secs, count in items:
+            part = f"{name};dur={secs * 1000:.1f}"
+            if count > 1:
+                part += f';desc="{count} calls"'
+            parts.append(part)
+        if total_seconds is not None:
+            parts.append(f"total;dur={total_seconds * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current: ContextVar[Optional[PhaseTimings]] = ContextVar("hweibo_phase_timings", default=None)
+
+
+def begin_request() -> tuple[PhaseTimings, object]:
+    timings = PhaseTimings()
+    return timings, _current.set(timings)
+
+
+def end_request(token) -> None:
+    _current.reset(token)
+
+
+def add_phase(name: str, seconds: float) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - started)
+
+
+# ----------------------------
+# Sampling profiler
+# ----------------------------
+# One capture at a time: samples cover every thread, so overlapping captures would double-count.
+_capture_lock = threading.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Count every thread's Python stack each `interval_seconds` until stopped."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = max(0.001, interval_seconds)
+        self.samples = 0
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="hweibo-profiler", daemon=True)
+
+    @classmethod
+    def try_start(cls, interval_seconds: float) -> Optional["StackSampler"]:
+        """Start a sampler, or return None if another capture is running."""
+        if not _capture_lock.acquire(blocking=False):
+            return None
+        sampler = cls(interval_seconds)
+        sampler._thread.start()
+        return sampler
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        names: dict[int, str] = {}
+        while not self._stop.wait(self.interval_seconds):
+            frames = sys._current_frames()
+            if any(ident not in names for ident in frames):
+                names = {t.ident: t.name for t in threading.enumerate() if t.ident is not None}
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        _capture_lock.release()
+
+    def write(self, path: Path, max_files: int = 0) -> None:
+        """Write collapsed stacks to `path` atomically, then keep only the newest `max_files` profiles."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text("".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()), encoding="utf-8")
+        os.replace(tmp, path)
+        if max_files > 0:
+            profiles = sorted(path.parent.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+            for old in profiles[:-max_files]:
+                old.unlink(missing_ok=True)
@@ -10,6 +10,8 @@ export async function POST(req: Request) {
 
     const backendBase = (process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000").replace(/\/+$/, "");
     const apiKey = (process.env.HWEIBO_API_KEY || "").trim();
+    // No seller identity is forwarded from the browser: plan-tier priority needs a seller token
+    // signed server-side with HWEIBO_API_KEY (X-Hweibo-Seller-Token, see backend _seller_token).
 
     const upstream = await fetch(`${backendBase}/ai/prompts`, {
       method: "POST",
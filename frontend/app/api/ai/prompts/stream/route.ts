@@ -0,0 +1,48 @@
+import { NextResponse } from "next/server";
+
+export async function POST(req: Request) {
+  try {
+    const body = await req.json();
+    const prompt = String(body?.prompt || "").trim();
+    if (!prompt) {
+      return NextResponse.json({ error: "prompt_required" }, { status: 400 });
+    }
+
+    const backendBase = (process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000").replace(/\/+$/, "");
+    const apiKey = (process.env.HWEIBO_API_KEY || "").trim();
+    // No seller identity is forwarded from the browser: plan-tier priority needs a seller token
+    // signed server-side with HWEIBO_API_KEY (X-Hweibo-Seller-Token, see backend _seller_token).
+
+    const upstream = await fetch(`${backendBase}/ai/prompts/stream`, {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+        Accept: "text/event-stream",
+        ...(apiKey ? { "X-Hweibo-Api-Key": apiKey } : {}),
+      },
+      body: JSON.stringify({ prompt }),
+    });
+
+    if (!upstream.ok || !upstream.body) {
+      const text = await upstream.text();
+      return new NextResponse(text, {
+        status: upstream.status,
+        headers: {
+          "Content-Type": upstream.headers.get("content-type") || "application/json",
+        },
+      });
+    }
+
+    // Pass the event stream through unbuffered so the keyword results reach the browser first.
+    return new Response(upstream.body, {
+      status: upstream.status,
+      headers: {
+        "Content-Type": "text/event-stream; charset=utf-8",
+        "Cache-Control": "no-cache, no-transform",
+        "X-Accel-Buffering": "no",
+      },
+    });
+  } catch {
+    return NextResponse.json({ error: "server_error" }, { status: 500 });
+  }
+}
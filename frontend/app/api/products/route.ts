@@ -11,11 +11,14 @@ export async function GET(req: NextRequest) {
     });
 
     const text = await upstream.text();
+    const headers: Record<string, string> = {
+      "Content-Type": upstream.headers.get("content-type") || "application/json",
+    };
+    const nextCursor = upstream.headers.get("x-next-cursor");
+    if (nextCursor) headers["X-Next-Cursor"] = nextCursor;
     return new NextResponse(text, {
       status: upstream.status,
-      headers: {
-        "Content-Type": upstream.headers.get("content-type") || "application/json",
-      },
+      headers,
     });
   } catch {
     return NextResponse.json({ error: "server_error" }, { status: 500 });
@@ -1,11 +1,16 @@
 import { NextResponse } from "next/server";
 
+import { sellerToken } from "@/lib/seller-token";
+
 export async function GET() {
   try {
     const backendBase = (process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:8000").replace(/\/+$/, "");
+    // Without a signed seller the backend serves the starter (catalog-derived) dashboard.
+    const token = sellerToken();
     const upstream = await fetch(`${backendBase}/seller/dashboard`, {
       method: "GET",
       cache: "no-store",
+      headers: token ? { "X-Hweibo-Seller-Token": token } : {},
     });
 
     const text = await upstream.text();
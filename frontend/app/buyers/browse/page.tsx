@@ -124,6 +124,8 @@ export default function ExplorePage() {
   const [activeCategory, setActiveCategory] = useState("All");
   const [selectedProduct, setSelectedProduct] = useState<UiProduct | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [feederLines, setFeederLines] = useState<string[]>([
     "Starter feed: loading live catalog from backend.",
   ]);
@@ -139,6 +141,7 @@ export default function ExplorePage() {
         if (!mounted) return;
         if (Array.isArray(data) && data.length > 0) {
           setProducts(data.map(mapApiProduct));
+          setNextCursor(res.headers.get("x-next-cursor"));
           setFeederLines([
             "Starter feed: live products loaded.",
             "Starter feed: category filters are generated from backend data.",
@@ -159,6 +162,26 @@ export default function ExplorePage() {
     };
   }, []);
 
+  const loadMore = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    try {
+      setIsLoadingMore(true);
+      const params = new URLSearchParams({ limit: "60", include_metrics: "true", cursor: nextCursor });
+      const res = await fetch(`/api/products?${params.toString()}`, { cache: "no-store" });
+      if (!res.ok) throw new Error(`products_${res.status}`);
+      const data = (await res.json()) as ApiProduct[];
+      if (Array.isArray(data)) {
+        setProducts((prev) => [...prev, ...data.map(mapApiProduct)]);
+      }
+      setNextCursor(res.headers.get("x-next-cursor"));
+    } catch {
+      const line = "Starter feed: could not load more products, try again.";
+      setFeederLines((prev) => (prev.includes(line) ? prev : [...prev, line]));
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const categories = useMemo(() => {
     const unique = Array.from(new Set(products.map((p) => p.category).filter(Boolean))).sort();
     return ["All", ...unique];
@@ -306,6 +329,19 @@ export default function ExplorePage() {
             ))}
           </div>
         )}
+
+        {!isLoading && nextCursor ? (
+          <div className="mt-10 flex justify-center">
+            <Button
+              variant="outline"
+              onClick={() => void loadMore()}
+              disabled={isLoadingMore}
+              className="rounded-full border-zinc-200 px-8"
+            >
+              {isLoadingMore ? "Loading..." : "Load more"}
+            </Button>
+          </div>
+        ) : null}
       </main>
     </div>
   );
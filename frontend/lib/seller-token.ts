@@ -0,0 +1,13 @@
+import { createHmac } from "crypto";
+
+// Server-side only (API routes): signs the seller the backend should trust, with HWEIBO_API_KEY,
+// in the format backend/app.py `_verified_seller_id` checks: <seller_id>.<expires_unix>.<hmac-sha256 hex>.
+// The seller comes from server config (HWEIBO_SELLER_ID), never from the browser.
+export function sellerToken(ttlSeconds = 300): string | null {
+  const apiKey = (process.env.HWEIBO_API_KEY || "").trim();
+  const sellerId = (process.env.HWEIBO_SELLER_ID || "").trim();
+  if (!apiKey || !/^\d+$/.test(sellerId)) return null;
+  const payload = `${sellerId}.${Math.floor(Date.now() / 1000) + ttlSeconds}`;
+  const signature = createHmac("sha256", apiKey).update(payload).digest("hex");
+  return `${payload}.${signature}`;
+}